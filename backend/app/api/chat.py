@@ -1,20 +1,163 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import json
 
 from app.core.startup import GlobalState
 from app.utils.embedder import embed_text
-from app.utils.prompt import construct_prompt, generate_system_prompt
+from app.utils.llm_worker import QueueFullError
+from app.utils.recipe_filters import parse_recipe_filters
+from app.utils.prompt import assemble_prompt, BASE_SYSTEM_PROMPT
+from app.utils.response_cache import response_cache_keys
+from app.utils.sessions import FOLLOW_UP_INTENTS
+from app.utils.recipe_navigator import answer_from_recipe, choose_active_recipe
+from app.utils.metrics import METRICS, CHAT_REQUESTS, INTENTS, RESPONSE_CACHE, FAST_PATH, request_trace, timed
 
 router = APIRouter()
 
+# How often a client waiting for the next event (e.g. while queued) is checked for a disconnect
+DISCONNECT_POLL_SECONDS = 1.0
+
 class ChatRequest(BaseModel):
     chat_history: List[Dict[str, str]]
+    active_recipe: Optional[int] = None   # faiss_index of the recipe being cooked, as in the last "done" event
+    step: Optional[int] = None            # its step last shown (1-based), as in the last "done" event
+
+def fast_path_answer(message: str, active_recipe: Optional[int], step: Optional[int]) -> Optional[dict]:
+    """
+    Answer step navigation and fact questions (calories, time, ingredients...)
+    about the active recipe from its stored metadata, with no embedding,
+    retrieval or generation. None when the message needs the full pipeline.
+    """
+    if active_recipe is None:
+        return None
+    with request_trace() as trace, timed("fast_path"):
+        intent = GlobalState.intent_detector.detect_intent(message)["intent"]
+        answer = answer_from_recipe(
+            message.lower(), intent, lambda: GlobalState.faiss_handler.get_recipe_by_faiss_index(active_recipe), step
+        )
+    if answer is not None:
+        FAST_PATH.inc(1, answer["kind"])
+        answer["timings"] = trace
+    return answer
+
+def analyze_message(message: str, last_recipes: List[dict] = None) -> dict:
+    """
+    Embed, classify and retrieve for one user message, timing each stage in
+    the active request trace. Follow-up intents (sessions.FOLLOW_UP_INTENTS)
+    reuse `last_recipes`, when given, instead of searching again.
+    """
+    # Embed the query, then detect intent (retrieval intent and prompt addons from
+    # one lowercased copy); the embedding router reuses the vector, so no extra model call
+    with timed("embed"):
+        query_embedding = embed_text(
+            message,
+            GlobalState.embedding_model,
+            cache=GlobalState.embedding_cache,
+            batcher=GlobalState.embedding_batcher
+        )
+    with timed("intent"):
+        classification = GlobalState.intent_detector.detect_intent(message, query_embedding)
+    intent = classification["intent"]
+    INTENTS.inc(1, intent, classification["intent_source"])
+
+    if last_recipes and intent in FOLLOW_UP_INTENTS:
+        recipes = last_recipes
+    else:
+        # Retrieve relevant recipes (documents/snippets) using FAISS, restricted
+        # to recipes meeting any stated diet/time/calorie/rating constraint
+        with timed("retrieval"):
+            recipes = GlobalState.faiss_handler.search_by_intent(
+                query_embedding, intent, top_k=3, filters=parse_recipe_filters(message), query_text=message
+            )
+    return {"query_embedding": query_embedding, "intent": intent, "classification": classification, "recipes": recipes}
+
+def build_chat_prompt(latest_user_message: str, chat_history: List[Dict[str, str]],
+                      active_recipe: int = None, step: int = None) -> dict:
+    """
+    Intent detection, embedding, retrieval and prompt assembly (CPU-bound, runs in the threadpool).
+    Returns the prompt, its prefill token counts per section, the per-stage timings, the
+    response cache keys and the active recipe afterwards; on a cache hit the prompt is not
+    assembled and `cached` holds the answer.
+    """
+    result = {"prompt": None, "prompt_tokens": {}, "cached": None, "cache_keys": None}
+    with request_trace() as trace:
+        result["timings"] = trace
+        analysis = analyze_message(latest_user_message)
+        query_embedding, intent = analysis["query_embedding"], analysis["intent"]
+        classification, retrieved_recipes = analysis["classification"], analysis["recipes"]
+        result["active_recipe"] = choose_active_recipe(
+            latest_user_message.lower(), intent, retrieved_recipes, active_recipe
+        )
+        result["step"] = step if result["active_recipe"] == active_recipe else None
+
+        # Answers depend only on what goes into the prompt, so an identical (or
+        # near-identical) query over the same recipes and turns can be replayed
+        cache = GlobalState.response_cache
+        if cache is not None:
+            with timed("response_cache"):
+                history = chat_history[:-1] if chat_history[-1].get("content") == latest_user_message else chat_history
+                result["cache_keys"] = response_cache_keys(
+                    latest_user_message, intent, classification["addons"],
+                    [recipe["faiss_index"] for recipe in retrieved_recipes], history
+                )
+                result["cached"] = cache.get(*result["cache_keys"], embedding=query_embedding)
+            if result["cached"] is not None:
+                RESPONSE_CACHE.inc(1, result["cached"]["match"])
+                return result
+            result["query_embedding"] = query_embedding
+
+        # Construct system and user prompts; the static system prompt is kept
+        # apart from the per-turn instructions so it stays a cacheable prefix
+        with timed("prompt"):
+            result["prompt"], result["prompt_tokens"] = assemble_prompt(
+                system_prompt=BASE_SYSTEM_PROMPT.strip(),
+                instructions=classification["instructions"],
+                retrieved_recipes=retrieved_recipes,
+                chat_history=chat_history,
+                latest_user_message=latest_user_message,
+                intent=intent,
+                tokenizer=GlobalState.llm_pool.tokenizer,
+                budget=GlobalState.config.get("prompt")
+            )
+    return result
+
+async def replay_answer(chunks: List[str], done: dict):
+    """A ready answer as the same (kind, payload) events a generation streams."""
+    for chunk in chunks:
+        yield "token", chunk
+    yield "done", done
+
+async def until_disconnected(events: AsyncIterator[Tuple[str, object]], http_request: Request):
+    """
+    Pass (kind, payload) events through while the client is connected. A
+    disconnect is otherwise only noticed at the next write, so while no event
+    arrives (queued, or a long prefill) the connection is polled every
+    DISCONNECT_POLL_SECONDS; the iteration then just ends, leaving the caller
+    to cancel the generation.
+    """
+    iterator = events.__aiter__()
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(iterator.__anext__())
+            while not (await asyncio.wait({pending}, timeout=DISCONNECT_POLL_SECONDS))[0]:
+                if await http_request.is_disconnected():
+                    return
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
 
 @router.post("/", response_class=StreamingResponse)
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     try:
         # Validate chat history
         if not request.chat_history:
@@ -27,35 +170,81 @@ def chat(request: ChatRequest):
 
         latest_user_message = latest_user_messages[-1]
 
-        # Detect intent and get embedding
-        intent = GlobalState.intent_detector.detect_intent(latest_user_message)
-        query_embedding = embed_text(latest_user_message, GlobalState.embedding_model)
-
-        # Retrieve relevant recipes (documents/snippets) using FAISS
-        retrieved_recipes = GlobalState.faiss_handler.search_by_intent(
-            query_embedding, intent, top_k=3
-        )
+        # Step and fact questions about the recipe being cooked skip retrieval and the LLM
+        fast = await run_in_threadpool(fast_path_answer, latest_user_message, request.active_recipe, request.step)
+        if fast is not None:
+            built = {"prompt_tokens": {}, "timings": fast["timings"], "active_recipe": request.active_recipe,
+                     "step": fast["step"], "cached": None}
+        else:
+            built = await run_in_threadpool(
+                build_chat_prompt, latest_user_message, request.chat_history, request.active_recipe, request.step
+            )
+        prompt_tokens = built["prompt_tokens"]
 
-        # Construct system and user prompts
-        system_prompt = generate_system_prompt(latest_user_message)
+        def submit():
+            return GlobalState.llm_pool.submit(
+                built["prompt"], prompt_tokens=prompt_tokens.get("total"), prefix_tokens=prompt_tokens.get("prefix", 0)
+            )
 
-        prompt = construct_prompt(
-            system_prompt=system_prompt,
-            retrieved_chunks=retrieved_recipes,
-            chat_history=request.chat_history,
-            latest_user_message=latest_user_message
-        )
+        # Replay a cached answer, join an identical generation already running,
+        # or queue a new one for the next free LLM slot
+        cache = GlobalState.response_cache
+        job = flight = None
+        try:
+            if fast is not None:
+                payload = {"completion_tokens": 0, "fast_path": fast["kind"]}
+                cache_result, position, events = None, 0, replay_answer([fast["text"]], payload)
+            elif built["cached"] is not None:
+                cached = built["cached"]
+                payload = {"completion_tokens": cached["done"].get("completion_tokens", 0)}
+                cache_result, position, events = cached["match"], 0, replay_answer(cached["chunks"], payload)
+            elif cache is not None:
+                flight, joined = cache.coalesce(*built["cache_keys"], built["query_embedding"], submit)
+                cache_result = "coalesced" if joined else "miss"
+                RESPONSE_CACHE.inc(1, cache_result)
+                position, events = flight.position, flight.stream()
+            else:
+                job = submit()
+                cache_result, position, events = None, job.position, job.stream()
+        except QueueFullError as e:
+            CHAT_REQUESTS.inc(1, "rejected")
+            raise HTTPException(status_code=503, detail=str(e))
 
-        # Stream tokens from LLM
-        def token_generator():
+        # Stream tokens from LLM; a client that goes away stops its generation
+        # (a coalesced one once no other request is reading it)
+        async def token_generator():
+            finished = False
             try:
-                for token in GlobalState.llm_runner.stream_response(prompt):
-                    yield json.dumps({"type": "token", "content": token}) + "\n"
-                yield json.dumps({"type": "done"}) + "\n"
-            except Exception as e:
-                yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+                yield json.dumps({"type": "queued", "position": position}) + "\n"
+                async for kind, payload in until_disconnected(events, http_request):
+                    if kind == "token":
+                        yield json.dumps({"type": "token", "content": payload}) + "\n"
+                    elif kind == "done":
+                        finished = True
+                        CHAT_REQUESTS.inc(1, "ok")
+                        done = {"type": "done", **payload, "prompt_tokens": prompt_tokens,
+                                "active_recipe": built["active_recipe"], "step": built["step"]}
+                        if cache_result is not None:
+                            done["cache"] = cache_result
+                        if METRICS.request_timings:
+                            done["timings"] = built["timings"]
+                        yield json.dumps(done) + "\n"
+                    else:
+                        finished = True
+                        CHAT_REQUESTS.inc(1, "error")
+                        yield json.dumps({"type": "error", "message": payload}) + "\n"
+            finally:
+                if not finished:
+                    CHAT_REQUESTS.inc(1, "disconnected")
+                    if job is not None:
+                        job.cancel("disconnect")
+                    elif flight is not None:
+                        flight.leave()
 
         return StreamingResponse(token_generator(), media_type="text/plain")
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        CHAT_REQUESTS.inc(1, "error")
+        raise HTTPException(status_code=500, detail=str(e))
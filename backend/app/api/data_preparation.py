@@ -1,28 +1,129 @@
 from fastapi import APIRouter, HTTPException
-from backend.app.utils.recipe_preprocessor import load_recipe_data, clean_recipe_data
+from pydantic import BaseModel
+from typing import Any, Dict, List
+from app.utils.recipe_preprocessor import load_recipe_data, clean_recipe_data, get_preprocessing_workers
 from app.utils.embedder import generate_recipe_embeddings
-from app.utils.faiss_handler import build_recipe_faiss_indexes
+from app.utils.faiss_handler import build_recipe_faiss_indexes, save_store_indexes, EMBEDDING_COLUMNS
+from app.utils.recipe_store import RecipeStore
+from app.utils.ingestion import stream_ingest_recipes
+from app.utils.recipe_updates import (
+    corpus_write_lock, prepare_recipe_rows, resolve_faiss_ids, apply_recipe_updates, publish_corpus_version
+)
 from app.utils.config_loader import load_config
+from app.core.startup import GlobalState, reload_faiss_handler, refresh_faiss_handler, set_faiss_handler
 
 router = APIRouter()
 config = load_config()
 
+class RecipeUpsertRequest(BaseModel):
+    recipes: List[Dict[str, Any]]
+
+class RecipeDeleteRequest(BaseModel):
+    recipe_ids: List[int] = []
+    faiss_indexes: List[int] = []
+
 @router.post("/initialize-recipes")
-def initialize_recipes():
+def initialize_recipes(streaming: bool = False):
+    try:
+        with corpus_write_lock(config):
+            if streaming:
+                # Chunked, resumable ingestion straight into the indexes and recipe store
+                stats = stream_ingest_recipes(config, embedding_model=GlobalState.embedding_model)
+            else:
+                df = load_recipe_data(config["paths"]["recipe_data"])
+                if df.empty:
+                    raise HTTPException(status_code=500, detail="Failed to load data.")
+
+                df = clean_recipe_data(df, workers=get_preprocessing_workers(config))
+                # FAISS ids are row positions, so the metadata must carry the same ids
+                df = df.reset_index(drop=True)
+                df["faiss_index"] = df.index
+                # Contiguous .npy matrices instead of list columns; reuse the server's model if loaded
+                embeddings, embedding_stats = generate_recipe_embeddings(
+                    df, config,
+                    embedding_model=GlobalState.embedding_model,
+                    output_dir=config["paths"].get("embeddings_dir")
+                )
+                stats = {"embedding": embedding_stats}
+
+                df.to_csv(config["paths"]["cleaned_data_csv"], index=False)
+                df.to_pickle(config["paths"]["cleaned_data_pkl"])
+
+                build_recipe_faiss_indexes(df, embeddings, config)
+
+                # Memory-mappable metadata store without the embedding columns
+                store_dir = config["paths"].get("recipe_store_dir")
+                if store_dir:
+                    store = RecipeStore.from_dataframe(df, drop_columns=EMBEDDING_COLUMNS.values())
+                    store.save(store_dir)
+                    save_store_indexes(store, store_dir)
+
+            # Pick up the rebuilt corpus without a restart, here and in the other workers
+            publish_corpus_version(config)
+            if GlobalState.faiss_handler is not None:
+                reload_faiss_handler()
+
+        return {"status": "success", "message": "Data prepared and indexed.", **stats}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/recipes")
+def upsert_recipes(request: RecipeUpsertRequest):
+    """
+    Add or replace recipes given in the raw CSV format. Recipes whose RecipeId
+    already exists are replaced in place; only these rows are embedded.
+    """
+    if not request.recipes:
+        raise HTTPException(status_code=400, detail="No recipes given")
     try:
-        df = load_recipe_data(config["paths"]["recipe_data"])
-        if df.empty:
-            raise HTTPException(status_code=500, detail="Failed to load data.")
+        with corpus_write_lock(config):
+            # Start from the latest corpus on disk, which another worker may have changed
+            refresh_faiss_handler()
+            handler = GlobalState.faiss_handler
+            df, embeddings, rejected = prepare_recipe_rows(request.recipes, handler.store, config, GlobalState.embedding_model)
+            if df.empty:
+                raise HTTPException(status_code=400, detail="No valid recipes after cleaning")
 
-        df = clean_recipe_data(df)
-        df = generate_recipe_embeddings(df, config)
+            updated_ids = df["faiss_index"].to_numpy()
+            replaced = int((handler.store.positions(updated_ids) >= 0).sum())
 
-        df.to_csv(config["paths"]["cleaned_data_csv"], index=False)
-        df.to_pickle(config["paths"]["cleaned_data_pkl"])
+            # Readers keep using the old handler until this single reference swap
+            new_handler = apply_recipe_updates(handler, df, embeddings)
+            set_faiss_handler(new_handler, publish_corpus_version(config))
 
-        build_recipe_faiss_indexes(df, config)
+        return {
+            "status": "success",
+            "inserted": len(df) - replaced,
+            "replaced": replaced,
+            "rejected": rejected,
+            "faiss_indexes": updated_ids.tolist()
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/recipes")
+def delete_recipes(request: RecipeDeleteRequest):
+    """Remove recipes by source RecipeId and/or faiss_index."""
+    try:
+        with corpus_write_lock(config):
+            refresh_faiss_handler()
+            handler = GlobalState.faiss_handler
+            delete_ids = resolve_faiss_ids(handler.store, request.recipe_ids, request.faiss_indexes)
+            if len(delete_ids):
+                new_handler = apply_recipe_updates(handler, delete_ids=delete_ids)
+                set_faiss_handler(new_handler, publish_corpus_version(config))
 
-        return {"status": "success", "message": "Data prepared and indexed."}
+        return {"status": "success", "deleted": len(delete_ids), "faiss_indexes": delete_ids.tolist()}
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
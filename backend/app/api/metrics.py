@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import METRICS
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the pipeline metrics."""
+    return PlainTextResponse(METRICS.expose(), media_type="text/plain; version=0.0.4")
+
+@router.get("/metrics/summary")
+def metrics_summary():
+    """The same metrics as JSON, with p50/p95/p99 per stage."""
+    return METRICS.snapshot()
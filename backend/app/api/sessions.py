@@ -0,0 +1,158 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from typing import Optional
+import json
+
+from app.core.startup import GlobalState
+from app.api.chat import analyze_message, fast_path_answer, until_disconnected
+from app.utils.llm_worker import QueueFullError
+from app.utils.prompt import BASE_SYSTEM_PROMPT
+from app.utils.sessions import ChatSession, SessionStore
+from app.utils.metrics import METRICS, CHAT_REQUESTS, request_trace, timed
+
+router = APIRouter()
+
+class SessionMessage(BaseModel):
+    content: str
+
+class ActiveRecipe(BaseModel):
+    faiss_index: int
+    step: Optional[int] = None
+
+def get_session_store() -> SessionStore:
+    if GlobalState.sessions is None:
+        raise HTTPException(status_code=404, detail="Sessions are disabled")
+    return GlobalState.sessions
+
+def get_session(session_id: str) -> ChatSession:
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return session
+
+def build_session_turn(session: ChatSession, message: str) -> dict:
+    """
+    Retrieval and prompt for the next turn of a session (runs in the threadpool).
+    Only the new segment of the prompt is unseen by the session's model state.
+    """
+    with request_trace() as trace:
+        analysis = analyze_message(message, last_recipes=session.recipes)
+        with timed("prompt"):
+            turn = session.prepare_turn(
+                message,
+                intent=analysis["intent"],
+                instructions=analysis["classification"]["instructions"],
+                recipes=analysis["recipes"],
+                tokenizer=GlobalState.llm_pool.tokenizer,
+                budget=GlobalState.config.get("prompt")
+            )
+        # A compacted transcript no longer extends the saved state
+        turn["state"] = None if turn["prompt_tokens"]["compacted"] else GlobalState.sessions.load_state(session)
+    turn["timings"] = trace
+    return turn
+
+def commit_session_turn(session: ChatSession, turn: dict, reply: str, state):
+    session.commit_turn(turn, reply, GlobalState.llm_pool.tokenizer)
+    GlobalState.sessions.save_state(session, state)
+
+@router.post("/")
+def create_session():
+    """Start a conversation; send its turns to /sessions/{session_id}/messages."""
+    session = get_session_store().create(BASE_SYSTEM_PROMPT.strip(), GlobalState.llm_pool.tokenizer)
+    return {"session_id": session.session_id}
+
+@router.post("/{session_id}/recipe")
+def set_active_recipe(session_id: str, request: ActiveRecipe):
+    """Choose the recipe being cooked, e.g. when the user picks one of the suggestions."""
+    session = get_session(session_id)
+    if GlobalState.faiss_handler.get_recipe_by_faiss_index(request.faiss_index) is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    session.active_recipe, session.step = request.faiss_index, request.step
+    return {"active_recipe": session.active_recipe, "step": session.step}
+
+@router.get("/{session_id}")
+def read_session(session_id: str):
+    return get_session(session_id).summary()
+
+@router.delete("/{session_id}")
+def delete_session(session_id: str):
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"status": "success"}
+
+@router.post("/{session_id}/messages", response_class=StreamingResponse)
+async def send_message(session_id: str, request: SessionMessage, http_request: Request):
+    """
+    Append a user message and stream the reply in the /chat NDJSON format.
+    The history stays on the server, so only the new message is sent and,
+    with the session's saved model state, only its tokens are prefilled.
+    Step and fact questions about the active recipe are answered directly.
+    If the client disconnects, generation stops and the turn is not kept.
+    """
+    session = get_session(session_id)
+    if not request.content.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    if session.busy:
+        raise HTTPException(status_code=409, detail="The previous message of this session is still being answered")
+
+    session.busy = True
+    try:
+        # Step and fact questions about the recipe being cooked skip retrieval and the LLM
+        fast = await run_in_threadpool(fast_path_answer, request.content, session.active_recipe, session.step)
+        if fast is None:
+            turn = await run_in_threadpool(build_session_turn, session, request.content)
+            job = GlobalState.llm_pool.submit(
+                turn["prompt"], prompt_tokens=turn["prompt_tokens"]["total"], state=turn.pop("state"), keep_state=True,
+                prefix_tokens=turn["prompt_tokens"]["prefix"]
+            )
+    except QueueFullError as e:
+        session.busy = False
+        CHAT_REQUESTS.inc(1, "rejected")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        session.busy = False
+        CHAT_REQUESTS.inc(1, "error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if fast is not None:
+        session.record_exchange(request.content, fast["text"], GlobalState.llm_pool.tokenizer, step=fast["step"])
+        session.busy = False
+        CHAT_REQUESTS.inc(1, "ok")
+        done = {
+            "type": "done", "completion_tokens": 0, "fast_path": fast["kind"], "session_id": session_id,
+            "active_recipe": session.active_recipe, "step": session.step
+        }
+        if METRICS.request_timings:
+            done["timings"] = fast["timings"]
+        lines = [{"type": "queued", "position": 0}, {"type": "token", "content": fast["text"]}, done]
+        return StreamingResponse(iter([json.dumps(line) + "\n" for line in lines]), media_type="text/plain")
+
+    async def token_generator():
+        finished = False
+        try:
+            yield json.dumps({"type": "queued", "position": job.position}) + "\n"
+            async for kind, payload in until_disconnected(job.stream(), http_request):
+                if kind == "token":
+                    yield json.dumps({"type": "token", "content": payload}) + "\n"
+                elif kind == "done":
+                    finished = True
+                    await run_in_threadpool(commit_session_turn, session, turn, job.stats.get("text", ""), job.state)
+                    CHAT_REQUESTS.inc(1, "ok")
+                    done = {"type": "done", **payload, "session_id": session_id, "prompt_tokens": turn["prompt_tokens"],
+                            "active_recipe": session.active_recipe, "step": session.step}
+                    if METRICS.request_timings:
+                        done["timings"] = turn["timings"]
+                    yield json.dumps(done) + "\n"
+                else:
+                    finished = True
+                    CHAT_REQUESTS.inc(1, "error")
+                    yield json.dumps({"type": "error", "message": payload}) + "\n"
+        finally:
+            if not finished:
+                CHAT_REQUESTS.inc(1, "disconnected")
+                job.cancel("disconnect")
+            session.busy = False
+
+    return StreamingResponse(token_generator(), media_type="text/plain")
@@ -1,33 +1,174 @@
+import os
+import threading
 from app.utils.config_loader import load_config
 from app.utils.embedder import load_embedding_model
+from app.utils.embedding_cache import build_query_embedding_cache
+from app.utils.embedding_batcher import build_embedding_batcher
 from app.utils.helper import load_dataframe
-from app.utils.faiss_handler import FAISSHandler
+from app.utils.faiss_handler import FAISSHandler, EMBEDDING_COLUMNS
+from app.utils.recipe_store import RecipeStore, MANIFEST_FILE
+from app.utils.recipe_updates import corpus_lock, corpus_version
 from app.utils.intent_detector import IntentDetector
-from app.utils.llm_model import LLMRunner
+from app.utils.intent_router import build_intent_router
+from app.utils.llm_worker import build_llm_pool
+from app.utils.response_cache import build_response_cache
+from app.utils.sessions import build_session_store
+from app.utils.metrics import METRICS, configure_metrics
 
 class GlobalState:
     config = None
     embedding_model = None
-    df = None
+    embedding_cache = None
+    embedding_batcher = None
+    recipe_store = None
     faiss_handler = None
+    corpus_version = None
     intent_detector = None
-    llm_runner = None
+    llm_pool = None
+    response_cache = None
+    sessions = None
+
+def load_recipe_store(config) -> RecipeStore:
+    """
+    Load the memory-mapped recipe store, falling back to the cleaned pickle
+    for data prepared before the store existed.
+    """
+    store_dir = config["paths"].get("recipe_store_dir")
+    if store_dir and os.path.exists(os.path.join(store_dir, MANIFEST_FILE)):
+        return RecipeStore.load(store_dir, mmap=True)
+
+    print("[INFO] Recipe store not found, loading cleaned pickle instead")
+    df = load_dataframe(config["paths"]["cleaned_data_pkl"])
+    return RecipeStore.from_dataframe(df, drop_columns=EMBEDDING_COLUMNS.values())
+
+# One reload per process at a time; requests keep serving the current handler meanwhile
+RELOAD_LOCK = threading.Lock()
+
+def set_faiss_handler(handler: FAISSHandler, version=None):
+    """
+    Swap in a handler over a changed corpus, recording the corpus `version`
+    it was loaded at. Cached answers may quote recipes that changed, so the
+    response cache is emptied as well.
+    """
+    GlobalState.faiss_handler = handler
+    GlobalState.corpus_version = version
+    GlobalState.recipe_store = handler.store
+    if GlobalState.response_cache is not None:
+        GlobalState.response_cache.clear()
+
+def reload_faiss_handler():
+    """
+    Hot-swap the handler with freshly loaded indexes and store, e.g. after the
+    corpus was rebuilt. Requests already holding the old handler finish on it.
+    """
+    # Read the version first: a change published while loading triggers another reload
+    version = corpus_version(GlobalState.config)
+    store = load_recipe_store(GlobalState.config)
+    executor = GlobalState.faiss_handler.executor if GlobalState.faiss_handler else None
+    set_faiss_handler(FAISSHandler(GlobalState.config, store, executor=executor), version)
+
+def corpus_changed() -> bool:
+    """Whether another worker published a corpus change since this one loaded (one stat call)."""
+    return GlobalState.faiss_handler is not None and corpus_version(GlobalState.config) != GlobalState.corpus_version
+
+def refresh_faiss_handler():
+    """
+    Reload the handler now if the corpus changed on disk. Only for writers
+    holding the corpus write lock: background reloads wait for it to be
+    released, so they cannot run at the same time.
+    """
+    if corpus_changed():
+        print("[INFO] Recipe corpus changed on disk, reloading indexes and recipe store")
+        reload_faiss_handler()
+
+def refresh_faiss_handler_in_background():
+    """
+    Start reloading a corpus another worker changed on a background thread
+    and return at once; requests are served by the current handler until
+    the new one is swapped in. One stat call when nothing changed.
+    """
+    if not corpus_changed() or not RELOAD_LOCK.acquire(blocking=False):
+        return
+
+    def reload():
+        try:
+            # Shared lock: waits for a writer still replacing the files
+            with corpus_lock(GlobalState.config, shared=True):
+                if corpus_changed():
+                    print("[INFO] Recipe corpus changed on disk, reloading indexes and recipe store")
+                    reload_faiss_handler()
+        except Exception as e:
+            print(f"[INFO] Reloading the recipe corpus failed, keeping the current one: {e}")
+        finally:
+            RELOAD_LOCK.release()
+
+    threading.Thread(target=reload, name="corpus-reload", daemon=True).start()
 
 def init_dependencies():
     if GlobalState.config is None:
         GlobalState.config = load_config()
+        configure_metrics(GlobalState.config)
 
     if GlobalState.embedding_model is None:
         GlobalState.embedding_model = load_embedding_model(GlobalState.config)
 
-    if GlobalState.df is None:
-        GlobalState.df = load_dataframe(GlobalState.config["paths"]["cleaned_data_pkl"])
+    if GlobalState.embedding_cache is None:
+        GlobalState.embedding_cache = build_query_embedding_cache(GlobalState.config)
+
+    if GlobalState.embedding_batcher is None:
+        GlobalState.embedding_batcher = build_embedding_batcher(GlobalState.config, GlobalState.embedding_model)
+
+    if GlobalState.recipe_store is None:
+        GlobalState.corpus_version = corpus_version(GlobalState.config)
+        GlobalState.recipe_store = load_recipe_store(GlobalState.config)
 
     if GlobalState.faiss_handler is None:
-        GlobalState.faiss_handler = FAISSHandler(GlobalState.config, GlobalState.df)
+        GlobalState.faiss_handler = FAISSHandler(GlobalState.config, GlobalState.recipe_store)
 
     if GlobalState.intent_detector is None:
-        GlobalState.intent_detector = IntentDetector()
+        GlobalState.intent_detector = IntentDetector(
+            router=build_intent_router(GlobalState.config, GlobalState.embedding_model)
+        )
+
+    if GlobalState.llm_pool is None:
+        GlobalState.llm_pool = build_llm_pool(GlobalState.config)
+
+    if GlobalState.response_cache is None:
+        GlobalState.response_cache = build_response_cache(GlobalState.config)
+
+    if GlobalState.sessions is None:
+        GlobalState.sessions = build_session_store(GlobalState.config)
+
+    register_metric_gauges()
+
+def _cache_hit_rate(cache):
+    if cache is None:
+        return None
+    return cache.stats()["hit_rate"]
 
-    if GlobalState.llm_runner is None:
-        GlobalState.llm_runner = LLMRunner()
\ No newline at end of file
+def register_metric_gauges():
+    """Cache hit rates and queue depth, read from the live objects at scrape time."""
+    METRICS.gauge(
+        "chefmate_query_embedding_cache_hit_rate", "Query embedding cache hit rate (memory + disk)",
+        lambda: _cache_hit_rate(GlobalState.embedding_cache)
+    )
+    METRICS.gauge(
+        "chefmate_llm_prompt_cache_hit_rate", "llama.cpp KV prompt cache hit rate (ram cache only)",
+        lambda: GlobalState.llm_pool.tokenizer.prompt_cache_hit_rate() if GlobalState.llm_pool else None
+    )
+    METRICS.gauge(
+        "chefmate_response_cache_hit_rate", "/chat answer cache hit rate (exact + similar)",
+        lambda: _cache_hit_rate(GlobalState.response_cache)
+    )
+    METRICS.gauge(
+        "chefmate_sessions", "Live server-side chat sessions",
+        lambda: GlobalState.sessions.stats()["sessions"] if GlobalState.sessions else None
+    )
+    METRICS.gauge(
+        "chefmate_session_state_mb", "llama.cpp session states held in memory, in MB",
+        lambda: GlobalState.sessions.stats()["state_mb"] if GlobalState.sessions else None
+    )
+    METRICS.gauge(
+        "chefmate_llm_admitted_requests", "Generations running or waiting for an LLM slot",
+        lambda: GlobalState.llm_pool.admitted if GlobalState.llm_pool else None
+    )
@@ -1,6 +1,12 @@
 from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+from typing import Dict, Tuple
+import os
+import time
 import numpy as np
+import pandas as pd
+from app.utils.embedding_cache import EmbeddingCache, SQLiteEmbeddingStore, embedding_key, build_corpus_embedding_store
+from app.utils.embedding_batcher import EmbeddingBatcher
+from app.utils.faiss_handler import EMBEDDING_COLUMNS
 
 def load_embedding_model(config):
     """
@@ -9,43 +15,155 @@ def load_embedding_model(config):
     model_name = config["embedding"]["model_name"]
     return SentenceTransformer(model_name)
 
-def embed_text(text: str, model: SentenceTransformer) -> list:
+def embed_text(text: str, model: SentenceTransformer, cache: EmbeddingCache = None,
+               batcher: EmbeddingBatcher = None) -> list:
     """
     Embed a single string input using the SentenceTransformer model.
+    When a cache is given, repeated queries skip the forward pass; when a
+    batcher is given, the forward pass is shared with concurrent requests.
     Returns a list (embedding vector).
     """
-    embedding = model.encode([text], show_progress_bar=False)
-    return embedding[0].tolist()
+    if cache is not None:
+        cached = cache.get(text)
+        if cached is not None:
+            return cached.tolist()
 
-def embed_texts(texts: list[str], model: SentenceTransformer, batch_size: int = 32) -> list[list[float]]:
+    if batcher is not None:
+        embedding = batcher.embed(text)
+    else:
+        embedding = model.encode([text], show_progress_bar=False)[0]
+    if cache is not None:
+        cache.put(text, embedding)
+    return embedding.tolist()
+
+DEFAULT_CORPUS_EMBEDDING_CONFIG = {
+    "storage_dtype": "float32",   # float32 | float16 for the stored embedding matrices
+    "encode_workers": 1           # >1 encodes with a pool of model processes (encode_multi_process)
+}
+
+# Below this many unique texts per process, the pool start-up is not worth it
+MIN_TEXTS_PER_ENCODE_WORKER = 10000
+
+def get_corpus_embedding_config(config) -> dict:
+    corpus_config = {k: v for k, v in config["embedding"].items() if k in DEFAULT_CORPUS_EMBEDDING_CONFIG}
+    return {**DEFAULT_CORPUS_EMBEDDING_CONFIG, **corpus_config}
+
+def encode_unique_texts(texts: list, model: SentenceTransformer, batch_size: int, workers: int = 1) -> np.ndarray:
     """
-    Embed a list of texts in batches using the SentenceTransformer model.
-    Returns a list of embedding vectors.
+    Encode already-deduplicated texts, shortest first so each batch pads to a
+    similar length. Returns a float32 matrix in the input order.
     """
-    embeddings = []
-    for i in tqdm(range(0, len(texts), batch_size)):
-        batch = texts[i:i + batch_size]
-        batch_embeddings = model.encode(batch, show_progress_bar=False)
-        embeddings.extend(batch_embeddings)
-    return [emb.tolist() for emb in embeddings]
+    order = np.argsort([len(text) for text in texts], kind="stable")
+    sorted_texts = [texts[i] for i in order]
+
+    if workers > 1:
+        pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+        try:
+            encoded = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size)
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        encoded = model.encode(sorted_texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
 
-def generate_recipe_embeddings(df, config):
+    embeddings = np.empty_like(encoded, dtype=np.float32)
+    embeddings[order] = encoded
+    return embeddings
+
+def encode_with_store(texts: list, model: SentenceTransformer, batch_size: int, workers: int = 1,
+                      store: SQLiteEmbeddingStore = None, model_name: str = "") -> Tuple[np.ndarray, int]:
     """
-    Generate embeddings for recipe data columns (ingredients, title, etc.)
-    and add them as new columns to the DataFrame.
+    encode_unique_texts behind a content-addressed store: texts whose
+    (model, normalized text) hash is already stored are read back, only the
+    misses go through the model and are then stored. Returns the matrix and
+    the number of texts served from the store.
     """
-    embedding_model = load_embedding_model(config)
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32), 0
+    if store is None:
+        return encode_unique_texts(texts, model, batch_size, workers), 0
+
+    keys = [embedding_key(text, model_name) for text in texts]
+    stored = store.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in stored]
+
+    encoded = None
+    if missing:
+        encoded = encode_unique_texts([texts[i] for i in missing], model, batch_size, workers)
+        store.put_many({keys[i]: vector for i, vector in zip(missing, encoded)})
+
+    dim = encoded.shape[1] if encoded is not None else len(next(iter(stored.values())))
+    embeddings = np.empty((len(texts), dim), dtype=np.float32)
+    if missing:
+        embeddings[missing] = encoded
+    hit_positions = [i for i, key in enumerate(keys) if key in stored]
+    if hit_positions:
+        embeddings[hit_positions] = np.stack([stored[keys[i]] for i in hit_positions])
+    return embeddings, len(hit_positions)
+
+def generate_recipe_embeddings(df, config, embedding_model: SentenceTransformer = None,
+                               output_dir: str = None) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    Embed the recipe text columns (ingredients, title, etc.) into one
+    contiguous matrix per embedding column, row-aligned with `df`.
+
+    Identical texts are encoded once, and texts already in the corpus
+    embedding store (`embedding.corpus_cache`) are not encoded at all.
+    With `output_dir`, each matrix is written to `<embedding column>.npy`
+    and returned memory-mapped; otherwise it stays in memory. Pass
+    `embedding_model` to reuse an already loaded model. Returns the
+    matrices and per-column stats.
+    """
+    if embedding_model is None:
+        embedding_model = load_embedding_model(config)
     batch_size = config["embedding"]["batch_size"]
+    corpus_config = get_corpus_embedding_config(config)
+    dtype = np.dtype(corpus_config["storage_dtype"])
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    store = build_corpus_embedding_store(config)
+    model_name = config["embedding"]["model_name"]
+
+    embeddings, stats = {}, {}
+    for text_col, embed_col in EMBEDDING_COLUMNS.items():
+        texts = df[text_col].fillna("").astype(str)
+        codes, unique_texts = pd.factorize(texts, sort=False)
+        unique_texts = unique_texts.tolist()
+        workers = min(corpus_config["encode_workers"], len(unique_texts) // MIN_TEXTS_PER_ENCODE_WORKER)
+
+        start = time.perf_counter()
+        unique_embeddings, cache_hits = encode_with_store(
+            unique_texts, embedding_model, batch_size, workers=max(1, workers), store=store, model_name=model_name
+        )
+        elapsed = time.perf_counter() - start
+
+        shape = (len(texts), unique_embeddings.shape[1])
+        if output_dir:
+            path = os.path.join(output_dir, f"{embed_col}.npy")
+            matrix = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        else:
+            path = None
+            matrix = np.empty(shape, dtype=dtype)
+        # Scatter the unique vectors back to rows in slices to bound the temporary copies
+        for row in range(0, len(codes), 65536):
+            matrix[row:row + 65536] = unique_embeddings[codes[row:row + 65536]]
 
-    columns_to_embed = {
-        "ingredients_cleaned": "ingredients_embedding",
-        "ingredients_with_quantities": "ingredients_with_quantities_embedding",
-        "name": "title_embedding"
-    }
+        if output_dir:
+            matrix.flush()
+            del matrix
+            matrix = np.load(path, mmap_mode="r")
 
-    for text_col, embed_col in columns_to_embed.items():
-        print(f"Embedding column: {text_col}")
-        texts = df[text_col].fillna("").astype(str).tolist()
-        df[embed_col] = embed_texts(texts, embedding_model, batch_size)
+        embeddings[embed_col] = matrix
+        stats[embed_col] = {
+            "rows": len(texts),
+            "unique_texts": len(unique_texts),
+            "cache_hits": cache_hits,
+            "encode_seconds": round(elapsed, 2),
+            "texts_per_second": round(len(unique_texts) / elapsed, 1) if elapsed > 0 else None,
+            "dtype": dtype.name,
+            "bytes": os.path.getsize(path) if path else int(matrix.nbytes)
+        }
+        print(f"[INFO] Embedded {text_col}: {stats[embed_col]}")
 
-    return df
+    if store is not None:
+        store.close()
+    return embeddings, stats
@@ -0,0 +1,91 @@
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from sentence_transformers import SentenceTransformer
+
+DEFAULT_BATCHING_CONFIG = {
+    "enabled": True,
+    "max_batch_size": 32,
+    "max_wait_ms": 2.0
+}
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent embed requests for up to `max_wait_ms` (or until
+    `max_batch_size` texts are waiting) and encodes them in a single
+    `model.encode` call on a background thread.
+    """
+
+    def __init__(self, model: SentenceTransformer, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, text: str) -> Future:
+        future = Future()
+        self.requests.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed one text, blocking until its batch has been encoded."""
+        return self.submit(text).result()
+
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+    def _collect_batch(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self.requests.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self.requests.get()
+            if first is None:
+                return
+
+            batch = self._collect_batch(first)
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+
+def build_embedding_batcher(config, model: SentenceTransformer):
+    """Create the request batcher from `embedding.batching` in the config, or None if disabled."""
+    batching_config = {**DEFAULT_BATCHING_CONFIG, **(config["embedding"].get("batching") or {})}
+    if not batching_config["enabled"]:
+        return None
+    return EmbeddingBatcher(
+        model,
+        max_batch_size=batching_config["max_batch_size"],
+        max_wait_ms=batching_config["max_wait_ms"]
+    )
@@ -0,0 +1,180 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+DEFAULT_QUERY_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 10000,
+    "ttl_seconds": None,   # None = entries never expire
+    "disk_path": None      # sqlite file shared across workers, e.g. data/cache/query_embeddings.sqlite
+}
+
+DEFAULT_CORPUS_CACHE_CONFIG = {
+    "enabled": True,
+    "path": "data/cache/corpus_embeddings.sqlite"   # content-addressed recipe text embeddings
+}
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different queries share an entry."""
+    return " ".join(text.lower().split())
+
+def embedding_key(text: str, model_name: str) -> str:
+    """Content hash of the model name plus the normalized text."""
+    return hashlib.sha1(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class SQLiteEmbeddingStore:
+    """
+    On-disk key -> float32 vector table. WAL mode lets several uvicorn
+    workers read and write the same file concurrently.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get_many(self, keys: Iterable[str], min_created: float = 0.0, with_created: bool = False) -> Dict[str, object]:
+        """Stored vectors by key; with `with_created`, (vector, created) pairs so callers can keep the original age."""
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            # Stay well below sqlite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vector, created FROM embeddings WHERE key IN ({placeholders}) AND created >= ?",
+                    (*batch, min_created)
+                ).fetchall()
+                for key, blob, created in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = (vector, created) if with_created else vector
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+
+    def get(self, key: str, min_created: float = 0.0, with_created: bool = False):
+        return self.get_many([key], min_created, with_created).get(key)
+
+    def put(self, key: str, vector: np.ndarray):
+        self.put_many({key: vector})
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with optional TTL, keyed on the
+    normalized text plus model name. An optional sqlite store sits behind the
+    in-process LRU so workers can share embeddings.
+    """
+
+    def __init__(self, model_name: str, max_entries: int = 10000, ttl_seconds: Optional[float] = None,
+                 disk_path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.disk = SQLiteEmbeddingStore(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, vector: np.ndarray, created: float):
+        with self.lock:
+            self.entries[key] = (vector, created)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = embedding_key(text, self.model_name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[key]
+
+        if self.disk is not None:
+            min_created = time.time() - self.ttl_seconds if self.ttl_seconds is not None else 0.0
+            stored = self.disk.get(key, min_created, with_created=True)
+            if stored is not None:
+                # Keep the stored age, so a disk hit does not restart the TTL
+                vector, created = stored
+                self._remember(key, vector, created)
+                with self.lock:
+                    self.disk_hits += 1
+                return vector
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, text: str, vector: np.ndarray):
+        key = embedding_key(text, self.model_name)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._remember(key, vector, time.time())
+        if self.disk is not None:
+            self.disk.put(key, vector)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+
+def build_query_embedding_cache(config) -> Optional[EmbeddingCache]:
+    """Create the query embedding cache from `embedding.query_cache` in the config."""
+    cache_config = {**DEFAULT_QUERY_CACHE_CONFIG, **(config["embedding"].get("query_cache") or {})}
+    if not cache_config["enabled"]:
+        return None
+    return EmbeddingCache(
+        model_name=config["embedding"]["model_name"],
+        max_entries=cache_config["max_entries"],
+        ttl_seconds=cache_config["ttl_seconds"],
+        disk_path=cache_config["disk_path"]
+    )
+
+
+def build_corpus_embedding_store(config) -> Optional[SQLiteEmbeddingStore]:
+    """
+    Open the content-addressed store consulted before embedding recipe texts
+    (`embedding.corpus_cache`), so re-ingesting unchanged recipes skips the model.
+    """
+    cache_config = {**DEFAULT_CORPUS_CACHE_CONFIG, **(config["embedding"].get("corpus_cache") or {})}
+    if not cache_config["enabled"]:
+        return None
+    return SQLiteEmbeddingStore(cache_config["path"])
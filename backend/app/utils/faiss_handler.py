@@ -1,43 +1,294 @@
 import os
+import json
+import time
 import numpy as np
 import faiss
-import pickle
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.recipe_store import RecipeStore
+from app.utils.ingredient_index import IngredientIndex
+from app.utils.recipe_filters import RecipeAttributeIndex, IDFilter
+from app.utils.metrics import timed
 
-def build_recipe_faiss_indexes(df, config):
-    columns_to_embed = {
-        "ingredients_cleaned": "ingredients_embedding",
-        "ingredients_with_quantities": "ingredients_with_quantities_embedding",
-        "name": "title_embedding"
-    }
+MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+# IVF inverted lists can only be memory-mapped through a plain file reader
+IVF_MMAP_IO_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+
+# Text column -> embedding column, one FAISS index per embedding column
+EMBEDDING_COLUMNS = {
+    "ingredients_cleaned": "ingredients_embedding",
+    "ingredients_with_quantities": "ingredients_with_quantities_embedding",
+    "name": "title_embedding"
+}
+
+DEFAULT_RETRIEVAL_CONFIG = {
+    "fusion": "rrf",      # rrf | weighted | distance
+    "rrf_k": 60,
+    "weights": {},        # per source column, e.g. {"name": 0.5}; defaults to 1.0
+    "parallel": True,
+    "lexical": True,              # fuse ingredient_search with the inverted ingredient index
+    "lexical_candidates": 50      # hits taken from each side before fusion
+}
+
+DEFAULT_FAISS_CONFIG = {
+    "index_type": "flat",     # flat | ivf_flat | ivf_pq | hnsw | opq_ivf_pq
+    "nlist": 4096,            # IVF coarse centroids
+    "pq_m": 48,               # PQ sub-quantizers (must divide the embedding dimension)
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "train_sample": 100000,   # vectors sampled for training IVF/PQ/OPQ
+    "nprobe": 16,             # IVF search-time probes
+    "ef_search": 64,          # HNSW search-time beam width
+    "recall_report": True,
+    "recall_k": 10,
+    "recall_queries": 200,
+    "mmap": True              # memory-map index files read-only at load time
+}
+
+def get_faiss_config(config) -> dict:
+    return {**DEFAULT_FAISS_CONFIG, **config.get("faiss", {})}
+
+def _index_factory_string(num_vectors: int, faiss_config: dict) -> str:
+    index_type = faiss_config["index_type"]
+    # FAISS wants roughly 39 training points per centroid
+    nlist = max(1, min(faiss_config["nlist"], num_vectors // 39))
+    m, nbits = faiss_config["pq_m"], faiss_config["pq_nbits"]
+
+    # Flat and HNSW are wrapped in an IDMap2 so vectors are addressed by recipe
+    # id (faiss_index); IVF indexes store ids natively
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IVF{nlist},PQ{m}x{nbits}"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{faiss_config['hnsw_m']},Flat"
+    if index_type == "opq_ivf_pq":
+        return f"OPQ{m},IVF{nlist},PQ{m}x{nbits}"
+    raise ValueError(f"Unknown FAISS index type '{index_type}'")
+
+def set_search_params(index, nprobe: int = None, ef_search: int = None):
+    """Apply search-time knobs to an index; knobs the index does not have are ignored."""
+    params = faiss.ParameterSpace()
+    for name, value in (("nprobe", nprobe), ("efSearch", ef_search)):
+        if value is None:
+            continue
+        try:
+            params.set_index_parameter(index, name, value)
+        except RuntimeError:
+            pass
+
+def training_sample_positions(num_vectors: int, faiss_config: dict) -> np.ndarray:
+    """Sorted positions of the vectors a trainable index is trained on (the same sample for every build path)."""
+    sample_size = min(num_vectors, faiss_config["train_sample"])
+    return np.sort(np.random.default_rng(0).choice(num_vectors, sample_size, replace=False))
+
+def index_needs_training(dim: int, num_vectors: int, faiss_config: dict) -> bool:
+    """Whether the configured index type must be trained (IVF, PQ, OPQ) before vectors are added."""
+    return not faiss.index_factory(dim, _index_factory_string(num_vectors, faiss_config), faiss.METRIC_L2).is_trained
+
+def new_faiss_index(training_embeddings: np.ndarray, faiss_config: dict, num_vectors: int = None):
+    """
+    Create an empty index of the configured type, trained on a sampled subset
+    if it needs training. `num_vectors` is the corpus size the index is sized
+    for (IVF nlist); by default the number of training vectors.
+    """
+    num_training, dim = training_embeddings.shape
+    factory_string = _index_factory_string(num_vectors or num_training, faiss_config)
+    index = faiss.index_factory(dim, factory_string, faiss.METRIC_L2)
+
+    if not index.is_trained:
+        sample = training_sample_positions(num_training, faiss_config)
+        print(f"Training {factory_string} on {len(sample)} sampled vectors")
+        index.train(training_embeddings[sample])
+
+    set_search_params(index, faiss_config["nprobe"], faiss_config["ef_search"])
+    return index
+
+def create_faiss_index(embeddings: np.ndarray, faiss_config: dict, ids: np.ndarray = None):
+    """
+    Create, train (on a sampled subset) and fill an index of the configured type.
+    Vectors are stored under `ids` (the recipes' faiss_index), defaulting to their positions.
+    """
+    index = new_faiss_index(embeddings, faiss_config)
+    if ids is None:
+        ids = np.arange(len(embeddings))
+    index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+    return index
+
+def to_id_addressed(index):
+    """
+    Return an index that supports add_with_ids. Indexes built before ids were
+    stored explicitly (a bare Flat with ids == positions) are rebuilt as
+    IDMap2,Flat; other legacy types need a full rebuild.
+    """
+    bare = faiss.downcast_index(index)
+    if isinstance(bare, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexIVF, faiss.IndexPreTransform)):
+        return index
+    if isinstance(bare, faiss.IndexFlat):
+        rebuilt = faiss.IndexIDMap2(faiss.IndexFlatL2(bare.d))
+        rebuilt.add_with_ids(bare.reconstruct_n(0, bare.ntotal), np.arange(bare.ntotal, dtype=np.int64))
+        return rebuilt
+    raise ValueError(f"{type(bare).__name__} index has no stored ids; rebuild it with /data/initialize-recipes")
+
+def evaluate_index_recall(index, embeddings: np.ndarray, faiss_config: dict, ids: np.ndarray = None) -> list:
+    """
+    Measure recall@k and per-query latency of an index against exact (Flat) search,
+    sweeping the search-time knob of the index type.
+    """
+    k = faiss_config["recall_k"]
+    num_queries = min(faiss_config["recall_queries"], len(embeddings))
+    sample = np.random.default_rng(1).choice(len(embeddings), num_queries, replace=False)
+    queries = embeddings[np.sort(sample)]
+    _, ground_truth = faiss.knn(queries, embeddings, k)
+    if ids is not None:
+        ground_truth = np.asarray(ids)[ground_truth]
+
+    index_type = faiss_config["index_type"]
+    if index_type in ("ivf_flat", "ivf_pq", "opq_ivf_pq"):
+        nlist = faiss.extract_index_ivf(index).nlist
+        sweep = [("nprobe", v) for v in (1, 2, 4, 8, 16, 32, 64, 128, 256) if v <= nlist]
+    elif index_type == "hnsw":
+        sweep = [("efSearch", v) for v in (16, 32, 64, 128, 256, 512)]
+    else:
+        sweep = [(None, None)]
+
+    report = []
+    for name, value in sweep:
+        if name:
+            faiss.ParameterSpace().set_index_parameter(index, name, value)
+        start = time.perf_counter()
+        found = np.vstack([index.search(queries[i:i + 1], k)[1] for i in range(num_queries)])
+        latency_ms = (time.perf_counter() - start) / num_queries * 1000
+
+        hits = sum(len(np.intersect1d(found[i], ground_truth[i])) for i in range(num_queries))
+        report.append({
+            "param": name,
+            "value": value,
+            f"recall@{k}": hits / (num_queries * k),
+            "latency_ms": latency_ms
+        })
+
+    set_search_params(index, faiss_config["nprobe"], faiss_config["ef_search"])
+    return report
+
+def build_recipe_faiss_indexes(df, embeddings: dict, config):
+    """Build, report on and save one index per embedding matrix (rows aligned with `df`)."""
+    columns_to_embed = EMBEDDING_COLUMNS
 
     index_dir = config["paths"]["faiss_index_dir"]
     os.makedirs(index_dir, exist_ok=True)
+    faiss_config = get_faiss_config(config)
 
     for _, embed_col in columns_to_embed.items():
-        print(f"Building FAISS index for: {embed_col}")
-        embeddings = np.array(df[embed_col].tolist()).astype('float32')
-        dim = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dim)
-        index.add(embeddings)
+        print(f"Building FAISS index ({faiss_config['index_type']}) for: {embed_col}")
+        # float16-stored matrices are widened once here; FAISS adds float32
+        column_embeddings = np.ascontiguousarray(embeddings[embed_col], dtype=np.float32)
+        ids = df["faiss_index"].to_numpy(dtype=np.int64)
+        index = create_faiss_index(column_embeddings, faiss_config, ids=ids)
+
+        if faiss_config["recall_report"]:
+            report = evaluate_index_recall(index, column_embeddings, faiss_config, ids=ids)
+            report_path = os.path.join(index_dir, f"{embed_col}.recall.json")
+            with open(report_path, "w") as f:
+                json.dump(report, f, indent=2)
+            for row in report:
+                print(f"  {row}")
+            print(f"Saved recall report to: {report_path}")
 
         index_path = os.path.join(index_dir, f"{embed_col}.index")
         faiss.write_index(index, index_path)
         print(f"Saved FAISS index to: {index_path}")
-        
+
+def save_store_indexes(store: RecipeStore, directory: str, attributes: RecipeAttributeIndex = None,
+                       ingredients: IngredientIndex = None):
+    """
+    Save the attribute and ingredient indexes with the store saved in
+    `directory`, so loading it memory-maps them instead of decoding the
+    columns in every worker. Indexes already built over `store` are reused.
+    """
+    if attributes is None:
+        attributes = RecipeAttributeIndex(store)
+    attributes.save(directory)
+    if ingredients is None:
+        ingredients = IngredientIndex(store)
+    ingredients.save(directory)
+
+def _normalize_distances(distances: np.ndarray) -> np.ndarray:
+    """Min-max normalize L2 distances of one index into similarities in [0, 1]."""
+    if len(distances) == 0:
+        return distances
+    low, high = distances.min(), distances.max()
+    if high == low:
+        return np.ones_like(distances)
+    return 1.0 - (distances - low) / (high - low)
+
+def fuse_search_results(results: dict, method: str = "rrf", weights: dict = None, rrf_k: int = 60) -> list:
+    """
+    Combine per-index search results into one ranking deduplicated by FAISS index.
+
+    `results` maps a source name to its (distances, indices) row. Returns
+    (faiss_index, score) pairs sorted best first.
+    """
+    weights = weights or {}
+    scores = {}
+    for name, (distances, indices) in results.items():
+        valid = indices != -1
+        distances, indices = distances[valid], indices[valid]
+        weight = weights.get(name, 1.0)
+
+        if method == "rrf":
+            contributions = weight / (rrf_k + np.arange(1, len(indices) + 1))
+        elif method == "weighted":
+            contributions = weight * _normalize_distances(distances)
+        elif method == "distance":
+            # Raw L2 merge: keep each recipe's best distance, negated so higher is better
+            for dist, idx in zip(distances.tolist(), indices.tolist()):
+                scores[idx] = max(scores.get(idx, -np.inf), -dist)
+            continue
+        else:
+            raise ValueError(f"Unknown fusion method '{method}'")
+
+        for idx, score in zip(indices.tolist(), contributions.tolist()):
+            scores[idx] = scores.get(idx, 0.0) + score
+
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
 class FAISSHandler:
-    def __init__(self, config, df):
+    def __init__(self, config, recipes, indexes: dict = None, executor: ThreadPoolExecutor = None):
         self.config = config
-        self.df = df.set_index("faiss_index")
         self.index_dir = config["paths"]["faiss_index_dir"]
 
-        self.embedding_columns = {
-            "ingredients_cleaned": "ingredients_embedding",
-            "ingredients_with_quantities": "ingredients_with_quantities_embedding",
-            "name": "title_embedding"
-        }
+        self.embedding_columns = EMBEDDING_COLUMNS
+
+        # Columnar metadata aligned with FAISS ids; embedding columns are not kept
+        if isinstance(recipes, RecipeStore):
+            self.store = recipes
+        else:
+            self.store = RecipeStore.from_dataframe(recipes, drop_columns=self.embedding_columns.values())
 
+        # Attribute indexes (time, calories, rating, category, keywords) for filtered search
+        self.attributes = RecipeAttributeIndex(self.store)
+
+        self.retrieval_config = {**DEFAULT_RETRIEVAL_CONFIG, **config.get("retrieval", {})}
+
+        # Inverted ingredient index for coverage ranking of "I have ..." queries
+        self.ingredients = IngredientIndex(self.store) if self.retrieval_config["lexical"] else None
+        self.faiss_config = get_faiss_config(config)
+
+        # Indexes are loaded from disk unless a ready set is handed over (see with_updates)
         self.indexes = {}
-        self.load_indexes()
+        self.mmapped = False
+        if indexes is None:
+            self.load_indexes()
+        else:
+            self.indexes = indexes
+        self.set_search_params(self.faiss_config["nprobe"], self.faiss_config["ef_search"])
+
+        # FAISS releases the GIL during search, so the per-index searches can overlap
+        self.executor = executor
+        if self.executor is None and self.retrieval_config["parallel"] and len(self.indexes) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.indexes), thread_name_prefix="faiss-search")
 
         self.result_columns = [
             "name", "ingredients_cleaned", "ingredients_with_quantities",
@@ -46,37 +297,140 @@ class FAISSHandler:
         ]
         
     def load_indexes(self):
+        # Memory-mapped indexes are shared through the page cache across workers
+        self.mmapped = self.faiss_config["mmap"]
         for _, embed_col in self.embedding_columns.items():
-            index_path = os.path.join(self.index_dir, f"{embed_col}.index")
+            index_path = self._index_path(embed_col)
             if not os.path.exists(index_path):
                 raise FileNotFoundError(f"Index not found at {index_path}")
-            self.indexes[embed_col] = faiss.read_index(index_path)
+            if not self.mmapped:
+                self.indexes[embed_col] = faiss.read_index(index_path)
+                continue
+            try:
+                self.indexes[embed_col] = faiss.read_index(index_path, MMAP_IO_FLAGS)
+            except RuntimeError:
+                self.indexes[embed_col] = faiss.read_index(index_path, IVF_MMAP_IO_FLAGS)
+
+    def _index_path(self, embed_col: str) -> str:
+        return os.path.join(self.index_dir, f"{embed_col}.index")
+
+    def _writable_copy(self, embed_col: str):
+        """In-memory copy of an index that can be modified without affecting in-flight searches."""
+        if self.mmapped:
+            # Memory-mapped inverted lists cannot be cloned; the file holds the same contents
+            index = faiss.read_index(self._index_path(embed_col))
+        else:
+            index = faiss.clone_index(self.indexes[embed_col])
+        index = to_id_addressed(index)
+        set_search_params(index, self.faiss_config["nprobe"], self.faiss_config["ef_search"])
+        return index
+
+    def with_updates(self, upserts=None, embeddings: dict = None, delete_ids=()) -> "FAISSHandler":
+        """
+        Copy-on-write update: returns a new handler with the `upserts` rows
+        (a cleaned DataFrame carrying `faiss_index`, with their `embeddings`
+        matrices) added or replaced and `delete_ids` removed. This handler is left untouched, so
+        searches in flight keep running against it until it is swapped out.
+        """
+        if upserts is None or upserts.empty:
+            upserts = None
+            upsert_ids = np.empty(0, dtype=np.int64)
+        else:
+            upsert_ids = upserts["faiss_index"].to_numpy(dtype=np.int64)
+        stale_ids = np.union1d(upsert_ids, np.asarray(list(delete_ids), dtype=np.int64))
+        # Only ids already in the corpus need removing; pure inserts work on every index type
+        stale_ids = stale_ids[self.store.positions(stale_ids) >= 0]
+
+        indexes = {}
+        for embed_col in self.indexes:
+            index = self._writable_copy(embed_col)
+            if len(stale_ids):
+                try:
+                    index.remove_ids(stale_ids)
+                except RuntimeError:
+                    raise ValueError(
+                        f"The {self.faiss_config['index_type']} index cannot remove vectors; "
+                        "rebuild it with /data/initialize-recipes"
+                    )
+            if len(upsert_ids):
+                index.add_with_ids(np.ascontiguousarray(embeddings[embed_col], dtype=np.float32), upsert_ids)
+            indexes[embed_col] = index
+
+        if upserts is None:
+            upsert_rows = RecipeStore(upsert_ids, {})
+        else:
+            upsert_rows = RecipeStore.from_dataframe(upserts, drop_columns=self.embedding_columns.values())
+        store = self.store.with_updates(upsert_rows, stale_ids)
+        return FAISSHandler(self.config, store, indexes=indexes, executor=self.executor)
+
+    def save_indexes(self):
+        """Atomically replace the index files with this handler's indexes."""
+        for embed_col, index in self.indexes.items():
+            index_path = self._index_path(embed_col)
+            faiss.write_index(index, index_path + ".tmp")
+            os.replace(index_path + ".tmp", index_path)
+
+    def set_search_params(self, nprobe: int = None, ef_search: int = None):
+        """Set IVF `nprobe` / HNSW `efSearch` on every loaded index."""
+        for index in self.indexes.values():
+            set_search_params(index, nprobe, ef_search)
+
+    def _get_metadata_by_indices(self, indices, minimal: bool = False) -> list:
+        """
+        Returns recipe data for a batch of FAISS indexes with optional minimal output.
+        Entries for indexes missing from the store are None.
+        """
+        indices = [int(idx) for idx in indices]
+        with timed("metadata"):
+            rows = self.store.take(indices)
+
+        results = []
+        for idx, row in zip(indices, rows):
+            if row is None:
+                results.append(None)
+            elif minimal:
+                results.append({
+                    "faiss_index": idx,
+                    "name": row["name"],
+                    "ingredients_with_quantities": row["ingredients_with_quantities"],
+                    "recipe_instructions": row.get("recipe_instructions", ""),
+                    "category": row.get("recipe_category", ""),
+                    "calories": row.get("calories", ""),
+                    "total_time": row.get("total_time", ""),
+                    "rating": row.get("aggregated_rating", None),
+                    "images": row.get("images", [])
+                })
+            else:
+                results.append({"faiss_index": idx, **row})
+        return results
 
     def _get_metadata_by_index(self, idx: int, minimal: bool = False):
         """Returns recipe data by FAISS index with optional minimal output."""
-        if idx not in self.df.index:
+        return self._get_metadata_by_indices([idx], minimal=minimal)[0]
+
+    def id_filter(self, filters: dict = None):
+        """IDFilter for the recipes matching `filters` (see parse_recipe_filters), or None if nothing is filtered."""
+        if not filters:
             return None
+        eligible = self.attributes.eligible_ids(filters)
+        return None if eligible is None else IDFilter(eligible)
 
-        row = self.df.loc[idx]
-        if minimal:
-            return {
-                "faiss_index": idx,
-                "name": row["name"],
-                "ingredients_with_quantities": row["ingredients_with_quantities"],
-                "recipe_instructions": row.get("recipe_instructions", ""),
-                "category": row.get("recipe_category", ""),
-                "calories": row.get("calories", ""),
-                "total_time": row.get("total_time", ""),
-                "rating": row.get("aggregated_rating", None),
-                "images": row.get("images", [])
-            }
-        else:
-            # Return full recipe without embedding columns
-            full_row = row.drop(list(self.embedding_columns.values()), errors='ignore')
-            return {"faiss_index": idx, **full_row.to_dict()}
+    def _search(self, index, query_vector: np.ndarray, top_k: int, id_filter: IDFilter = None):
+        if id_filter is None:
+            return index.search(query_vector, top_k)
+        return index.search(query_vector, top_k, params=id_filter.params_for(index))
 
-    def search_by_intent(self, query_embedding: np.ndarray, intent: str, top_k: int = 5):
+    def search_by_intent(self, query_embedding: np.ndarray, intent: str, top_k: int = 5, filters: dict = None,
+                         query_text: str = None):
+        """
+        Route the query to the index for its intent. With `filters`, only
+        recipes satisfying them are searched (no results if none do).
+        Ingredient searches with `query_text` are hybrid (see hybrid_ingredient_search).
+        """
         query_vector = np.array([query_embedding]).astype("float32")
+        id_filter = self.id_filter(filters)
+        if id_filter is not None and len(id_filter) == 0:
+            return []
 
         if intent == "ingredient_search":
             target_key = "ingredients_cleaned"
@@ -85,7 +439,7 @@ class FAISSHandler:
         elif intent == "recipe_generation":
             target_key = "ingredients_with_quantities"
         else:
-            return self.default_search(query_embedding, top_k)
+            return self.default_search(query_embedding, top_k, id_filter=id_filter)
 
         embed_col = self.embedding_columns[target_key]
         index = self.indexes.get(embed_col)
@@ -93,34 +447,73 @@ class FAISSHandler:
         if index is None:
             raise ValueError(f"No index for intent '{intent}'")
 
-        distances, indices = index.search(query_vector, top_k)
-        results = []
+        if target_key == "ingredients_cleaned" and query_text and self.ingredients is not None:
+            return self.hybrid_ingredient_search(query_vector, query_text, index, top_k, id_filter)
 
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx == -1:
-                continue
-            metadata = self._get_metadata_by_index(idx, minimal=True)
-            if metadata:
-                results.append((dist, metadata))
+        distances, indices = self._search(index, query_vector, top_k, id_filter)
+        hits = [(dist, idx) for dist, idx in zip(distances[0], indices[0]) if idx != -1]
+        metadata = self._get_metadata_by_indices([idx for _, idx in hits], minimal=True)
 
+        results = [(dist, meta) for (dist, _), meta in zip(hits, metadata) if meta]
         results = sorted(results, key=lambda x: x[0])
         return [r[1] for r in results[:top_k]]
 
-    def default_search(self, query_embedding: np.ndarray, top_k: int = 5):
+    def hybrid_ingredient_search(self, query_vector: np.ndarray, query_text: str, index, top_k: int,
+                                 id_filter: IDFilter = None):
+        """
+        Reciprocal-rank fusion of the ingredient embedding search with the
+        inverted index's coverage ranking (source "ingredient_overlap" in
+        `retrieval.weights`). Falls back to the vector ranking alone when no
+        ingredient in the message is known to the index.
+        """
+        candidates = max(top_k, self.retrieval_config["lexical_candidates"])
+        distances, indices = self._search(index, query_vector, candidates, id_filter)
+        results = {"ingredients_cleaned": (distances[0], indices[0])}
+
+        lexical_ids, coverage = self.ingredients.search(
+            query_text, candidates, allowed_ids=None if id_filter is None else id_filter.ids
+        )
+        if len(lexical_ids):
+            results["ingredient_overlap"] = (1.0 - coverage, lexical_ids)
+
+        fused = fuse_search_results(
+            results, method="rrf", weights=self.retrieval_config["weights"], rrf_k=self.retrieval_config["rrf_k"]
+        )
+        metadata = self._get_metadata_by_indices([idx for idx, _ in fused[:top_k]], minimal=True)
+        return [meta for meta in metadata if meta]
+
+    def _search_indexes(self, query_vector: np.ndarray, top_k: int, id_filter: IDFilter = None) -> dict:
+        """Search every configured index, keyed by source column."""
+        sources = {
+            text_col: self.indexes[embed_col]
+            for text_col, embed_col in self.embedding_columns.items()
+            if embed_col in self.indexes
+        }
+        if self.executor is None:
+            searches = {name: self._search(index, query_vector, top_k, id_filter) for name, index in sources.items()}
+        else:
+            futures = {
+                name: self.executor.submit(self._search, index, query_vector, top_k, id_filter)
+                for name, index in sources.items()
+            }
+            searches = {name: future.result() for name, future in futures.items()}
+        return {name: (distances[0], indices[0]) for name, (distances, indices) in searches.items()}
+
+    def default_search(self, query_embedding: np.ndarray, top_k: int = 5, id_filter: IDFilter = None):
         query_vector = np.array([query_embedding]).astype("float32")
 
-        all_results = []
-        for embed_col, index in self.indexes.items():
-            distances, indices = index.search(query_vector, top_k)
-            for dist, idx in zip(distances[0], indices[0]):
-                if idx == -1:
-                    continue
-                metadata = self._get_metadata_by_index(idx, minimal=True)
-                if metadata:
-                    all_results.append((dist, metadata))
-
-        all_results = sorted(all_results, key=lambda x: x[0])
-        return [r[1] for r in all_results[:top_k]]
+        results = self._search_indexes(query_vector, top_k, id_filter)
+        fused = fuse_search_results(
+            results,
+            method=self.retrieval_config["fusion"],
+            weights=self.retrieval_config["weights"],
+            rrf_k=self.retrieval_config["rrf_k"]
+        )
+
+        # Deduplicated before any metadata is gathered
+        top_indices = [idx for idx, _ in fused[:top_k]]
+        metadata = self._get_metadata_by_indices(top_indices, minimal=True)
+        return [meta for meta in metadata if meta]
 
     def get_recipe_by_faiss_index(self, faiss_index: int):
         return self._get_metadata_by_index(faiss_index, minimal=False)
@@ -1,8 +1,12 @@
 import pandas as pd
+import numpy as np
 import os
 import re
 from typing import List, Union
 
+R_LIST_ITEM_PATTERN = r'"(.*?)"'
+ISO_DURATION_PATTERN = r"^(PT)(?:(\d+)H)?(?:(\d+)M)?"
+
 def to_snake_case(s: str) -> str:
     """Convert CamelCase or PascalCase to snake_case."""
     return re.sub(r'(?<!^)(?=[A-Z])', '_', s).lower()
@@ -63,6 +67,28 @@ def parse_iso_duration(duration):
 
     return f"{hours:02d}:{minutes:02d}"
 
+
+def parse_r_list_series(series: pd.Series) -> List[List[str]]:
+    """
+    Vectorized parse_r_list_string over a whole column.
+    Non-string values (NaN, numbers) become empty lists, as in the scalar version.
+    """
+    # Stringified numbers contain no quotes, so they still parse to []
+    items = series.astype("string").str.findall(R_LIST_ITEM_PATTERN)
+    return [value if isinstance(value, list) else [] for value in items]
+
+
+def parse_iso_duration_series(series: pd.Series) -> pd.Series:
+    """Vectorized parse_iso_duration: "PT2H15M" -> "02:15", None when unparseable."""
+    parts = series.astype("string").str.strip().str.extract(ISO_DURATION_PATTERN)
+    matched = parts[0].notna().to_numpy()
+
+    def two_digits(group: pd.Series) -> pd.Series:
+        return group.fillna("0").astype("int64").astype(str).str.zfill(2)
+
+    formatted = (two_digits(parts[1]) + ":" + two_digits(parts[2])).to_numpy(dtype=object)
+    return pd.Series(np.where(matched, formatted, None), index=series.index, dtype=object)
+
 def load_dataframe(pickle_path: str) -> pd.DataFrame:
     """
     Load DataFrame from a pickle file.
@@ -0,0 +1,211 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+import faiss
+
+from app.utils.recipe_preprocessor import clean_recipe_data, get_preprocessing_workers
+from app.utils.embedder import load_embedding_model, generate_recipe_embeddings
+from app.utils.faiss_handler import (
+    EMBEDDING_COLUMNS, get_faiss_config, index_needs_training, new_faiss_index, save_store_indexes,
+    training_sample_positions
+)
+from app.utils.recipe_store import RecipeStore, RecipeStoreWriter
+
+DEFAULT_INGEST_CONFIG = {
+    "chunk_size": 20000,        # CSV rows read per chunk
+    "checkpoint_every": 10,     # chunks between checkpoints
+    "work_dir": "data/ingest"   # staging area for the chunk vectors, store and checkpoint
+}
+
+STATE_FILE = "checkpoint.json"
+CHECKPOINT_VERSION = 2  # 2: per-chunk vector files instead of full index snapshots
+
+
+class StreamingIngestor:
+    """
+    Chunked recipe ingestion: each CSV chunk is cleaned and embedded; its
+    rows are appended to the recipe store and its vectors saved to
+    `work_dir`, so only one chunk is held in memory and a checkpoint only
+    commits the progress file. An interrupted run resumes after the last
+    checkpoint.
+
+    The FAISS indexes are built once every chunk is in, one column at a
+    time: trainable types (IVF, PQ, OPQ) are sized for the whole corpus and
+    trained on the same sample of it as the batch build, taken in a pass
+    over the saved vectors. Each index is held in memory while it is built
+    (about rows x dim x 4 bytes for flat types). Store and indexes are
+    staged and only moved into place once all of them are written.
+    """
+
+    def __init__(self, config, embedding_model=None):
+        self.config = config
+        self.store_target = config["paths"].get("recipe_store_dir")
+        if not self.store_target:
+            raise ValueError("Streaming ingestion needs paths.recipe_store_dir for the recipe metadata")
+        self.ingest_config = {**DEFAULT_INGEST_CONFIG, **(config.get("ingest") or {})}
+        self.faiss_config = get_faiss_config(config)
+        self.work_dir = self.ingest_config["work_dir"]
+        self.store_dir = os.path.join(self.work_dir, "recipe_store")
+        self.state_path = os.path.join(self.work_dir, STATE_FILE)
+        self.chunk_dir = os.path.join(self.work_dir, "vectors")
+
+        self.state = self._load_state()
+        self.writer = RecipeStoreWriter(
+            self.store_dir,
+            state=self.state.get("store"),
+            drop_columns=EMBEDDING_COLUMNS.values()
+        )
+        # Reuse the server's model when given instead of loading a second copy
+        self.embedding_model = embedding_model if embedding_model is not None else load_embedding_model(config)
+        self.workers = get_preprocessing_workers(config)
+
+    def _load_state(self) -> dict:
+        source = self.config["paths"]["recipe_data"]
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if (state.get("version") == CHECKPOINT_VERSION and state["source"] == source
+                    and state["chunk_size"] == self.ingest_config["chunk_size"]):
+                print(f"[INFO] Resuming ingestion after {state['chunks_done']} chunks ({state['rows_read']} CSV rows)")
+                return state
+            print("[INFO] Checkpoint belongs to a different source, chunk size or format, starting over")
+
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir, exist_ok=True)
+        return {
+            "version": CHECKPOINT_VERSION,
+            "source": source,
+            "chunk_size": self.ingest_config["chunk_size"],
+            "chunks_done": 0,
+            "rows_read": 0,
+            "rows_written": 0,
+            "store": None
+        }
+
+    def _chunk_path(self, chunk_number: int) -> str:
+        return os.path.join(self.chunk_dir, f"{chunk_number:08d}.npz")
+
+    def _chunk_paths(self) -> list:
+        """Vector files of the ingested chunks, in corpus order (files past the checkpoint are ignored)."""
+        if not os.path.isdir(self.chunk_dir):
+            return []
+        names = sorted(name for name in os.listdir(self.chunk_dir) if int(name.split(".")[0]) < self.state["chunks_done"])
+        return [os.path.join(self.chunk_dir, name) for name in names]
+
+    def _training_vectors(self, embed_col: str, positions: np.ndarray) -> np.ndarray:
+        """Gather the vectors at corpus `positions` (sorted) from the chunk files."""
+        parts, offset = [], 0
+        for path in self._chunk_paths():
+            with np.load(path) as chunk:
+                vectors = chunk[embed_col]
+            selected = positions[(positions >= offset) & (positions < offset + len(vectors))]
+            parts.append(vectors[selected - offset])
+            offset += len(vectors)
+        return np.concatenate(parts)
+
+    def _build_index(self, embed_col: str):
+        """Train (when needed) and fill one index from the saved chunk vectors."""
+        total = self.state["rows_written"]
+        paths = self._chunk_paths()
+        with np.load(paths[0]) as chunk:
+            dim = chunk[embed_col].shape[1]
+
+        if index_needs_training(dim, total, self.faiss_config):
+            training = self._training_vectors(embed_col, training_sample_positions(total, self.faiss_config))
+        else:
+            training = np.empty((0, dim), dtype=np.float32)
+        index = new_faiss_index(training, self.faiss_config, num_vectors=total)
+
+        for path in paths:
+            with np.load(path) as chunk:
+                index.add_with_ids(chunk[embed_col], chunk["ids"])
+        return index
+
+    def _checkpoint(self):
+        """Commit the progress file; the chunk vectors and store rows it covers are already on disk."""
+        self.state.update(store=self.writer.state())
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.state_path)
+        print(f"[INFO] Checkpoint: {self.state['rows_read']} rows read, {self.state['rows_written']} kept")
+
+    def _ingest_chunk(self, chunk: pd.DataFrame):
+        rows_read = len(chunk)
+        df = clean_recipe_data(chunk, workers=self.workers)
+        if not df.empty:
+            df = df.reset_index(drop=True)
+            df["faiss_index"] = self.state["rows_written"] + np.arange(len(df))
+            chunk_embeddings, _ = generate_recipe_embeddings(df, self.config, embedding_model=self.embedding_model)
+
+            ids = df["faiss_index"].to_numpy(dtype=np.int64)
+            embeddings = {
+                embed_col: np.ascontiguousarray(chunk_embeddings[embed_col], dtype=np.float32)
+                for embed_col in EMBEDDING_COLUMNS.values()
+            }
+            os.makedirs(self.chunk_dir, exist_ok=True)
+            np.savez(self._chunk_path(self.state["chunks_done"]), ids=ids, **embeddings)
+
+            self.writer.append(df)
+            self.state["rows_written"] += len(df)
+
+        self.state["rows_read"] += rows_read
+        self.state["chunks_done"] += 1
+
+    def _publish(self):
+        """
+        Build every index next to its final path first, then move the store
+        and the indexes into place back to back; a failure while building
+        leaves the served corpus untouched.
+        """
+        self.writer.finalize()
+        save_store_indexes(RecipeStore.load(self.store_dir), self.store_dir)
+        index_dir = self.config["paths"]["faiss_index_dir"]
+        os.makedirs(index_dir, exist_ok=True)
+        staged = []
+        for embed_col in EMBEDDING_COLUMNS.values():
+            print(f"[INFO] Building FAISS index ({self.faiss_config['index_type']}) for: {embed_col}")
+            final_path = os.path.join(index_dir, f"{embed_col}.index")
+            index = self._build_index(embed_col)
+            faiss.write_index(index, final_path + ".tmp")
+            staged.append(final_path)
+            del index
+
+        old_store = self.store_target + ".old"
+        shutil.rmtree(old_store, ignore_errors=True)
+        if os.path.exists(self.store_target):
+            os.replace(self.store_target, old_store)
+        os.makedirs(os.path.dirname(os.path.abspath(self.store_target)), exist_ok=True)
+        shutil.move(self.store_dir, self.store_target)
+        for final_path in staged:
+            os.replace(final_path + ".tmp", final_path)
+        shutil.rmtree(old_store, ignore_errors=True)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run(self) -> dict:
+        reader = pd.read_csv(self.config["paths"]["recipe_data"], chunksize=self.ingest_config["chunk_size"])
+
+        chunks_since_checkpoint = 0
+        for chunk_number, chunk in enumerate(reader):
+            # Chunks before the checkpoint are only parsed, which is cheap next to
+            # embedding; counting records (not lines) is safe with multi-line fields
+            if chunk_number < self.state["chunks_done"]:
+                continue
+            self._ingest_chunk(chunk)
+            chunks_since_checkpoint += 1
+            if chunks_since_checkpoint >= self.ingest_config["checkpoint_every"]:
+                self._checkpoint()
+                chunks_since_checkpoint = 0
+
+        if not self.state["rows_written"]:
+            raise ValueError("No recipes left after cleaning.")
+
+        self._publish()
+        return {"rows_read": self.state["rows_read"], "rows_indexed": self.state["rows_written"]}
+
+
+def stream_ingest_recipes(config, embedding_model=None) -> dict:
+    """Run (or resume) a chunked ingestion of `paths.recipe_data`, reusing `embedding_model` if given."""
+    return StreamingIngestor(config, embedding_model).run()
@@ -0,0 +1,263 @@
+import re
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+
+from app.utils.helper import parse_user_ingredients
+from app.utils.recipe_store import RecipeStore, load_derived, save_derived
+
+TOKEN_PATTERN = r"[a-z]+"
+
+# A term in at least 1/32 of the recipes is cheaper as a bitmap than as an int32 posting list
+DENSE_FRACTION = 1 / 32
+
+# Words around an ingredient list that are never ingredients themselves
+QUERY_STOPWORDS = {
+    "i", "ive", "have", "got", "some", "a", "an", "the", "and", "or", "with", "without", "using", "use",
+    "what", "can", "could", "make", "cook", "do", "my", "in", "of", "for", "me", "to", "left", "leftover",
+    "leftovers", "fridge", "pantry", "recipe", "recipes", "dish", "something", "idea", "ideas", "want",
+    "would", "like", "only", "just", "also", "plus", "few", "bit", "please", "any", "that", "uses",
+}
+
+
+# Light plural folding so "tomatoes"/"tomato" and "eggs"/"egg" share a term
+PLURAL_RULES = [(re.compile(r"ies$"), "y"), (re.compile(r"oes$"), "o"), (re.compile(r"(?<=[^s])s$"), "")]
+
+
+def normalize_tokens(tokens: pd.Series) -> pd.Series:
+    """PLURAL_RULES over a Series of corpus tokens."""
+    for pattern, replacement in PLURAL_RULES:
+        tokens = tokens.str.replace(pattern, replacement, regex=True)
+    return tokens
+
+
+def normalize_token(token: str) -> str:
+    """PLURAL_RULES for a single query word."""
+    for pattern, replacement in PLURAL_RULES:
+        token = pattern.sub(replacement, token)
+    return token
+
+
+def _to_words(mask: np.ndarray, num_words: int) -> np.ndarray:
+    """Boolean row mask -> little-endian uint64 bitmap (bit i of word w is row 64 * w + i)."""
+    packed = np.zeros(num_words * 8, dtype=np.uint8)
+    bits = np.packbits(mask, bitorder="little")
+    packed[:len(bits)] = bits
+    return packed.view(np.uint64)
+
+
+def _test_bits(words: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    return ((words[rows >> 6] >> (rows & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+
+def _first_rows(words: np.ndarray, limit: int) -> np.ndarray:
+    """Positions of the first `limit` set bits, unpacking only the words that hold them."""
+    nonzero = np.flatnonzero(words)
+    cutoff = np.searchsorted(np.cumsum(np.bitwise_count(words[nonzero])), limit) + 1
+    nonzero = nonzero[:cutoff]
+    bits = np.unpackbits(words[nonzero].view(np.uint8), bitorder="little").reshape(-1, 64)
+    word_slots, offsets = np.nonzero(bits)
+    return (nonzero[word_slots] * 64 + offsets)[:limit]
+
+
+class IngredientIndex:
+    """
+    In-memory inverted index from ingredient term to the recipes using it,
+    built from `ingredients_cleaned`.
+
+    Containers are chosen per term, roaring style: rare terms keep a sorted
+    int32 posting list (CSR: one array for all terms plus offsets), frequent
+    ones ("salt", "butter") a uint64 bitmap, so neither costs more than
+    N / 8 bytes. Recipes are renumbered by ascending ingredient count, which
+    makes the lowest row number in a coverage level also the tightest match:
+    ranking is a matter of taking the first set bits.
+
+    Built from the store's ingredients, unless `save` stored the arrays
+    with it: a store loaded from disk then memory-maps them instead.
+    """
+
+    ARRAYS = ("offsets", "postings", "dense_slots", "bitmaps", "row_ids", "store_to_row")
+
+    def __init__(self, store: RecipeStore):
+        self.ids = store.ids
+        self.num_rows = len(store)
+        self.num_words = (self.num_rows + 63) // 64
+        saved = load_derived(store, "ingredients")
+        if saved is not None:
+            meta, arrays = saved
+            for name in self.ARRAYS:
+                setattr(self, name, arrays[name])
+            self.vocabulary = {term: term_id for term_id, term in enumerate(meta["terms"])}
+            return
+
+        self.vocabulary = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.dense_slots = np.zeros(0, dtype=np.int32)
+        self.bitmaps = np.zeros((0, self.num_words), dtype=np.uint64)
+        self.row_ids = store.ids
+        self.store_to_row = np.arange(self.num_rows)
+
+        values = store.column("ingredients_cleaned")
+        if values is None or self.num_rows == 0:
+            return
+
+        ingredients = pd.Series(list(values), dtype=object).explode().dropna()
+        store_positions = ingredients.index.to_numpy(dtype=np.int64)
+        ingredient_counts = np.bincount(store_positions, minlength=self.num_rows)
+
+        # Internal row numbers: fewest ingredients first
+        order = np.argsort(ingredient_counts, kind="stable")
+        self.row_ids = store.ids[order]
+        self.store_to_row = np.empty(self.num_rows, dtype=np.int64)
+        self.store_to_row[order] = np.arange(self.num_rows)
+
+        # Tokenize each distinct ingredient string once, then expand to occurrences
+        ingredient_codes, distinct = pd.factorize(ingredients.astype(str))
+        tokens = pd.Series(distinct, dtype="string").str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+        if tokens.empty:
+            return
+        term_codes, terms = pd.factorize(normalize_tokens(tokens.astype("string")))
+        token_owner = tokens.index.to_numpy(dtype=np.int64)
+        tokens_per_ingredient = np.bincount(token_owner, minlength=len(distinct))
+        token_starts = np.concatenate([[0], np.cumsum(tokens_per_ingredient)[:-1]])
+
+        repeats = tokens_per_ingredient[ingredient_codes]
+        occurrence_rows = np.repeat(self.store_to_row[store_positions], repeats)
+        within = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        occurrence_terms = term_codes[np.repeat(token_starts[ingredient_codes], repeats) + within].astype(np.int64)
+
+        # One entry per (term, recipe), sorted by term then row
+        pairs = np.unique(occurrence_terms * self.num_rows + occurrence_rows)
+        pair_terms, pair_rows = pairs // self.num_rows, pairs % self.num_rows
+        frequencies = np.bincount(pair_terms, minlength=len(terms))
+
+        dense_terms = np.flatnonzero(frequencies >= max(1, self.num_rows * DENSE_FRACTION))
+        self.dense_slots = np.full(len(terms), -1, dtype=np.int32)
+        self.dense_slots[dense_terms] = np.arange(len(dense_terms))
+        self.bitmaps = np.zeros((len(dense_terms), self.num_words), dtype=np.uint64)
+        starts = np.concatenate([[0], np.cumsum(frequencies)])
+        for slot, term in enumerate(dense_terms):
+            mask = np.zeros(self.num_rows, dtype=bool)
+            mask[pair_rows[starts[term]:starts[term + 1]]] = True
+            self.bitmaps[slot] = _to_words(mask, self.num_words)
+
+        sparse = self.dense_slots[pair_terms] < 0
+        self.postings = pair_rows[sparse].astype(np.int32)
+        self.offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.where(self.dense_slots < 0, frequencies, 0), out=self.offsets[1:])
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+
+    def save(self, directory: str):
+        """Save the arrays with the store in `directory` (the one they were built from) for loads to memory-map."""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        save_derived(directory, "ingredients", self.ids, arrays, {"terms": list(self.vocabulary)})
+
+    def __len__(self) -> int:
+        return len(self.vocabulary)
+
+    def query_terms(self, text: str) -> List[Tuple[int, ...]]:
+        """
+        Split a message such as "I have chicken, rice and garlic" into
+        ingredients (via parse_user_ingredients) and map each to its known
+        term ids; words outside the vocabulary are dropped.
+        """
+        text = re.sub(r"\band\b|\bor\b|[;&/\n+]", ",", text.lower())
+        query = []
+        for item in parse_user_ingredients(text):
+            terms = [normalize_token(w) for w in re.findall(TOKEN_PATTERN, item) if w not in QUERY_STOPWORDS]
+            term_ids = tuple(sorted({self.vocabulary[t] for t in terms if t in self.vocabulary}))
+            if term_ids and term_ids not in query:
+                query.append(term_ids)
+        return query
+
+    def _ingredient_rows(self, term_ids: Tuple[int, ...]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Recipes containing every term of one ingredient, as (rows, None) when
+        any term is sparse, or (None, bitmap) when all of them are dense.
+        """
+        slots = [self.dense_slots[t] for t in term_ids if self.dense_slots[t] >= 0]
+        postings = sorted((self.postings[self.offsets[t]:self.offsets[t + 1]]
+                           for t in term_ids if self.dense_slots[t] < 0), key=len)
+        if not postings:
+            return None, np.bitwise_and.reduce(self.bitmaps[slots], axis=0)
+
+        rows = postings[0]
+        for posting in postings[1:]:
+            rows = np.intersect1d(rows, posting, assume_unique=True)
+        for slot in slots:
+            rows = rows[_test_bits(self.bitmaps[slot], rows)]
+        return rows, None
+
+    def _is_allowed(self, rows: np.ndarray, allowed_ids: Optional[np.ndarray]) -> np.ndarray:
+        if allowed_ids is None:
+            return np.ones(len(rows), dtype=bool)
+        ids = self.row_ids[rows]
+        slots = np.minimum(np.searchsorted(allowed_ids, ids), len(allowed_ids) - 1)
+        return allowed_ids[slots] == ids if len(allowed_ids) else np.zeros(len(rows), dtype=bool)
+
+    def search(self, text: str, top_k: int = 50, allowed_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank recipes by coverage of the user's ingredients: the share of them
+        the recipe uses, ties broken by the recipe needing fewer ingredients
+        overall. `allowed_ids` (sorted FAISS ids) restricts the candidates;
+        it is checked on extracted rows only, so a filter adds no O(N) pass.
+        Returns FAISS ids and coverage in [0, 1], best first.
+        """
+        query = self.query_terms(text)
+        if not query:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        sparse, dense = [], []
+        for term_ids in query:
+            rows, words = self._ingredient_rows(term_ids)
+            (dense if rows is None else sparse).append(words if rows is None else rows)
+
+        # Dense coverage as a bit-sliced counter: planes[j] holds bit j of each recipe's count
+        planes = []
+        for words in dense:
+            carry = words
+            for j, plane in enumerate(planes):
+                planes[j], carry = plane ^ carry, plane & carry
+            if carry.any():
+                planes.append(carry)
+
+        # Sparse candidates get exact counts, including their dense matches
+        sparse_rows = np.zeros(0, dtype=np.int64)
+        sparse_dense_counts = sparse_totals = np.zeros(0, dtype=np.int64)
+        if sparse:
+            sparse_rows, sparse_totals = np.unique(np.concatenate(sparse), return_counts=True)
+            sparse_dense_counts = sum((_test_bits(w, sparse_rows).astype(np.int64) for w in dense),
+                                      np.zeros(len(sparse_rows), dtype=np.int64))
+            sparse_totals = sparse_totals + sparse_dense_counts
+        sparse_allowed = self._is_allowed(sparse_rows, allowed_ids)
+
+        selected, coverage = [], []
+        needed = top_k
+        # Walk the coverage levels from "uses everything" down until top_k recipes are found
+        for level in range(len(query), 0, -1):
+            rows = sparse_rows[(sparse_totals == level) & sparse_allowed]
+            if planes and level < 2 ** len(planes):
+                mask = np.full(self.num_words, ~np.uint64(0))
+                for j, plane in enumerate(planes):
+                    mask &= plane if (level >> j) & 1 else ~plane
+                # Sparse candidates with this many dense matches belong to a higher level
+                limit = needed + int(np.count_nonzero(sparse_dense_counts == level))
+                while True:
+                    dense_rows = _first_rows(mask, limit)
+                    exhausted = len(dense_rows) < limit
+                    dense_rows = dense_rows[~np.isin(dense_rows, sparse_rows, assume_unique=True)]
+                    dense_rows = dense_rows[self._is_allowed(dense_rows, allowed_ids)]
+                    if exhausted or len(dense_rows) >= needed:
+                        break
+                    limit *= 4
+                rows = np.sort(np.concatenate([rows, dense_rows]))
+            rows = rows[:needed]
+
+            selected.append(rows)
+            coverage.append(np.full(len(rows), level / len(query), dtype=np.float32))
+            needed -= len(rows)
+            if needed <= 0:
+                break
+
+        return self.row_ids[np.concatenate(selected)], np.concatenate(coverage)
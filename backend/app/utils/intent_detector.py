@@ -1,6 +1,9 @@
 import re
 from typing import Literal, Dict
 
+from app.utils.prompt import match_prompt_addons, instructions_for
+from app.utils.intent_router import EmbeddingIntentRouter
+
 IntentType = Literal[
     "specific_recipe",
     "recipe_generation",
@@ -13,8 +16,14 @@ IntentType = Literal[
     "unclear"
 ]
 
+SPECIFIC_RECIPE_PATTERN = re.compile(r"(recipe for|how to make|tell me about)\s+[a-z ]+")
+
+def _keyword_pattern(keywords) -> "re.Pattern":
+    """One compiled alternation with the same result as `any(kw in text for kw in keywords)`."""
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
 class IntentDetector:
-    def __init__(self):
+    def __init__(self, router: EmbeddingIntentRouter = None):
         self.recipe_keywords = ["recipe", "make", "cook", "prepare", "how to"]
         self.ingredient_keywords = ["have", "with", "using", "ingredients"]
         self.step_keywords = ["next step", "what's next", "then", "after that"]
@@ -23,41 +32,63 @@ class IntentDetector:
         self.time_keywords = ["quick", "under", "minutes", "fast", "less than"]
         self.rating_keywords = ["top", "best", "highest rated", "popular"]
 
-    def detect_intent(self, user_input: str) -> Dict[str, str]:
-        print(user_input)
-        user_input = user_input.lower()
+        # Compiled once; checked in priority order, first match wins
+        self.ingredient_pattern = _keyword_pattern(self.ingredient_keywords)
+        self.recipe_pattern = _keyword_pattern(self.recipe_keywords)
+        self.keyword_rules = [
+            ("step_navigation", _keyword_pattern(self.step_keywords)),
+            ("diet_filter", _keyword_pattern(self.diet_keywords)),
+            ("nutrition_info", _keyword_pattern(self.nutrition_keywords)),
+            ("time_filter", _keyword_pattern(self.time_keywords)),
+            ("rating_filter", _keyword_pattern(self.rating_keywords)),
+        ]
 
+        # Optional embedding router; the keyword rules remain the fallback
+        self.router = router
+
+    def _retrieval_intent(self, user_input: str) -> IntentType:
         # --- Specific Recipe ---
-        if re.search(r"(recipe for|how to make|tell me about)\s+[a-z ]+", user_input):
-            return {"intent": "specific_recipe"}
+        if SPECIFIC_RECIPE_PATTERN.search(user_input):
+            return "specific_recipe"
 
         # --- Ingredient-Based Search ---
-        if any(keyword in user_input for keyword in self.ingredient_keywords) and ',' in user_input:
-            return {"intent": "ingredient_search"}
+        if ',' in user_input and self.ingredient_pattern.search(user_input):
+            return "ingredient_search"
 
         # --- Recipe Generation ---
-        if any(kw in user_input for kw in self.recipe_keywords) and "recipe" in user_input:
-            return {"intent": "recipe_generation"}
+        if "recipe" in user_input and self.recipe_pattern.search(user_input):
+            return "recipe_generation"
 
-        # --- Step Navigation ---
-        if any(kw in user_input for kw in self.step_keywords):
-            return {"intent": "step_navigation"}
+        # --- Step navigation, diet, nutrition, time, rating ---
+        for intent, pattern in self.keyword_rules:
+            if pattern.search(user_input):
+                return intent
 
-        # --- Dietary Filter ---
-        if any(kw in user_input for kw in self.diet_keywords):
-            return {"intent": "diet_filter"}
+        # --- Default Case ---
+        return "unclear"
 
-        # --- Nutrition Info ---
-        if any(kw in user_input for kw in self.nutrition_keywords):
-            return {"intent": "nutrition_info"}
+    def detect_intent(self, user_input: str, query_embedding=None) -> Dict[str, object]:
+        """
+        Classify a message from one lowercased copy: the retrieval intent plus
+        the prompt addons (see prompt.INTENT_PATTERNS) and their instructions,
+        which are memoized per addon set. Each rule and addon is one
+        precompiled alternation searched separately (up to 15 searches), with
+        the retrieval rules stopping at the first match.
 
-        # --- Time Filter ---
-        if any(kw in user_input for kw in self.time_keywords):
-            return {"intent": "time_filter"}
+        With a router and the query's embedding, the retrieval intent comes
+        from the nearest prototype centroid; the keyword rules decide when
+        the router is not confident. `intent_source` says which one did.
+        """
+        user_input = user_input.lower()
+        addons = match_prompt_addons(user_input)
 
-        # --- Rating Filter ---
-        if any(kw in user_input for kw in self.rating_keywords):
-            return {"intent": "rating_filter"}
+        routed = None
+        if self.router is not None and query_embedding is not None:
+            routed = self.router.route(query_embedding)
 
-        # --- Default Case ---
-        return {"intent": "unclear"}
\ No newline at end of file
+        return {
+            "intent": routed["intent"] if routed else self._retrieval_intent(user_input),
+            "intent_source": "embedding" if routed else "keywords",
+            "addons": addons,
+            "instructions": instructions_for(addons)
+        }
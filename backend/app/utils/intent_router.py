@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    # Type hints only: importing intent_detector must not pull in torch
+    from sentence_transformers import SentenceTransformer
+
+DEFAULT_INTENT_PROTOTYPES = {
+    "specific_recipe": [
+        "give me the recipe for chicken tikka masala",
+        "how do I make banana bread",
+        "tell me about shepherd's pie",
+        "show me the lasagna recipe",
+        "what is the recipe for pad thai",
+    ],
+    "recipe_generation": [
+        "create a new recipe for a summer salad",
+        "invent a dinner recipe for me",
+        "write me a recipe for a chocolate dessert",
+        "come up with a recipe for a birthday cake",
+        "make up a pasta recipe",
+    ],
+    "ingredient_search": [
+        "I have chicken, rice and garlic",
+        "what can I make with eggs and spinach",
+        "recipes using leftover turkey and potatoes",
+        "I only have pasta, tomatoes and basil",
+        "something with tofu and broccoli",
+        "what can I cook with what's in my fridge",
+    ],
+    "step_navigation": [
+        "what's the next step",
+        "what do I do after that",
+        "ok done, then what",
+        "go back to the previous step",
+        "repeat the last step",
+    ],
+    "diet_filter": [
+        "vegan dinner ideas",
+        "gluten free dessert",
+        "something keto for lunch",
+        "vegetarian meals for the week",
+        "dairy free breakfast",
+        "is there a halal option",
+    ],
+    "nutrition_info": [
+        "how many calories does this have",
+        "what's the nutrition for this recipe",
+        "how much protein is in it",
+        "is this dish healthy",
+        "how many carbs per serving",
+    ],
+    "time_filter": [
+        "quick dinner under 20 minutes",
+        "something fast I can make in half an hour",
+        "meals that take less than an hour",
+        "recipes I can cook in 15 minutes",
+    ],
+    "rating_filter": [
+        "top rated cookies",
+        "the best chili recipe",
+        "most popular soups",
+        "highest rated vegetarian curry",
+    ],
+    "unclear": [
+        "hello",
+        "thanks!",
+        "who are you",
+        "ok",
+        "can you help me",
+    ],
+}
+
+DEFAULT_INTENT_ROUTER_CONFIG = {
+    "enabled": True,
+    "threshold": 0.45,      # below this cosine similarity the keyword rules decide
+    "min_margin": 0.03,     # ... and likewise when the runner-up intent is this close
+    "cache_path": "data/cache/intent_centroids.npz",
+    "prototypes": None      # intent -> example queries; None = DEFAULT_INTENT_PROTOTYPES
+}
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIntentRouter:
+    """
+    Routes a query to the intent whose prototype centroid is closest to the
+    query embedding (cosine similarity, one matrix-vector product), reusing
+    the embedding already computed for retrieval.
+    """
+
+    def __init__(self, intents: List[str], centroids: np.ndarray, threshold: float = 0.45, min_margin: float = 0.03):
+        self.intents = intents
+        self.centroids = np.ascontiguousarray(_normalize_rows(centroids.astype(np.float32)))
+        self.threshold = threshold
+        self.min_margin = min_margin
+
+    def route(self, query_embedding) -> Optional[Dict[str, object]]:
+        """{"intent", "score"} for a confident match, or None to fall back to the keyword rules."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.centroids @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        if len(scores) > 1:
+            runner_up, best = np.argpartition(scores, -2)[-2:]
+            margin = float(scores[best] - scores[runner_up])
+        else:
+            best, margin = 0, np.inf
+        if scores[best] < self.threshold or margin < self.min_margin:
+            return None
+        return {"intent": self.intents[best], "score": float(scores[best])}
+
+
+def prototype_centroids(prototypes: Dict[str, List[str]], model: "SentenceTransformer") -> np.ndarray:
+    """Embed every prototype in one encode call and average them per intent."""
+    texts = [text for examples in prototypes.values() for text in examples]
+    embeddings = _normalize_rows(model.encode(texts, show_progress_bar=False, convert_to_numpy=True))
+    bounds = np.cumsum([0] + [len(examples) for examples in prototypes.values()])
+    return np.stack([embeddings[start:end].mean(axis=0) for start, end in zip(bounds[:-1], bounds[1:])])
+
+
+def build_intent_router(config, model: "SentenceTransformer") -> Optional[EmbeddingIntentRouter]:
+    """
+    Create the router from `intent_router` in the config, or None if disabled.
+    Centroids are cached on disk under a hash of the model name and the
+    prototype sets, so a restart only re-embeds when either changes.
+    """
+    router_config = {**DEFAULT_INTENT_ROUTER_CONFIG, **(config.get("intent_router") or {})}
+    if not router_config["enabled"]:
+        return None
+
+    prototypes = {k: v for k, v in (router_config["prototypes"] or DEFAULT_INTENT_PROTOTYPES).items() if v}
+    key = hashlib.sha1(
+        json.dumps([config["embedding"]["model_name"], prototypes], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+    cache_path = router_config["cache_path"]
+    centroids = None
+    if cache_path and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            if str(cached["key"]) == key:
+                centroids = cached["centroids"]
+
+    if centroids is None:
+        centroids = prototype_centroids(prototypes, model)
+        print(f"[INFO] Embedded {sum(map(len, prototypes.values()))} intent prototypes for {len(prototypes)} intents")
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            tmp_path = cache_path + ".tmp.npz"
+            np.savez(tmp_path, key=np.array(key), centroids=centroids.astype(np.float32))
+            os.replace(tmp_path, cache_path)
+
+    return EmbeddingIntentRouter(
+        list(prototypes), centroids, threshold=router_config["threshold"], min_margin=router_config["min_margin"]
+    )
@@ -1,29 +1,194 @@
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaRAMCache, LlamaDiskCache
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+import os
 import re
+import threading
+import time
 from app.utils.config_loader import load_config
+from app.utils.metrics import record_stage
+
+DEFAULT_LLM_CONFIG = {
+    "pool_size": 1,       # independent Llama instances; weights are mmapped and shared
+    "n_ctx": 4096,
+    "n_threads": None,    # per instance; None = cpu_count // pool_size
+    "n_batch": 128,
+    "max_tokens": 512,    # completion budget; the prompt gets n_ctx - max_tokens
+    "max_queue_size": 8,  # admitted generations (running + waiting) before /chat answers 503
+    "generation_timeout_seconds": 120,  # stop a generation running longer than this; None = no limit
+    "idle_timeout_seconds": 30,         # stop when streamed text has gone unread this long; None = never
+    "verbose": False,     # llama.cpp's own timing logs on stderr; /metrics covers them
+    "prompt_cache": {
+        "type": "ram",        # ram | disk | none
+        "capacity_mb": 2048,
+        "disk_dir": "data/cache/llama_prompt_cache"
+    },
+    "prompt_lookup": {
+        "enabled": False,     # draft tokens by matching n-grams of the prompt (speculative decoding, no draft model)
+        "num_pred_tokens": 10,
+        "max_ngram_size": 2
+    }
+}
+
+# End of the assistant's turn in the streamed chat format
+STOP_SEQUENCES = ["<|endoftext|>", "User:", "Assistant:"]
+
+def get_llm_config(config) -> dict:
+    return {**DEFAULT_LLM_CONFIG, **(config.get("llm") or {})}
+
+class SharedRAMCache(LlamaRAMCache):
+    """
+    LlamaRAMCache that can be shared by every runner in the pool. llama.cpp
+    states are keyed by token sequence, lookups return the longest cached
+    prefix and the least recently used states are evicted past capacity.
+    """
+
+    def __init__(self, capacity_bytes: int):
+        super().__init__(capacity_bytes=capacity_bytes)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key):
+        with self.lock:
+            try:
+                state = super().__getitem__(key)
+            except KeyError:
+                self.misses += 1
+                raise
+            self.hits += 1
+            return state
+
+    def hit_rate(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return self.hits / lookups if lookups else None
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return super().__contains__(key)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+
+def build_prompt_cache(config):
+    """Create the KV-state prompt cache from `llm.prompt_cache`, or None if disabled."""
+    cache_config = {**DEFAULT_LLM_CONFIG["prompt_cache"], **(get_llm_config(config).get("prompt_cache") or {})}
+    capacity_bytes = int(cache_config["capacity_mb"] * 1024 * 1024)
+    if cache_config["type"] == "ram":
+        return SharedRAMCache(capacity_bytes)
+    if cache_config["type"] == "disk":
+        return LlamaDiskCache(cache_dir=cache_config["disk_dir"], capacity_bytes=capacity_bytes)
+    return None
+
+def build_draft_model(config):
+    """
+    Prompt-lookup drafter from `llm.prompt_lookup`, or None if disabled. Drafts
+    are continuations of n-grams already in the prompt, so answers copying the
+    retrieved recipes (ingredients, steps, image links) decode several tokens
+    per forward pass; every drafted token is still verified by the model.
+    """
+    lookup_config = {**DEFAULT_LLM_CONFIG["prompt_lookup"], **(get_llm_config(config).get("prompt_lookup") or {})}
+    if not lookup_config["enabled"]:
+        return None
+    return LlamaPromptLookupDecoding(
+        max_ngram_size=lookup_config["max_ngram_size"],
+        num_pred_tokens=lookup_config["num_pred_tokens"]
+    )
+
+def default_thread_count(pool_size: int) -> int:
+    """Split the machine's cores evenly across the pool."""
+    return max(1, (os.cpu_count() or 1) // max(1, pool_size))
 
 class LLMRunner:
-    def __init__(self):
-        config = load_config()
-        self.context_length = 4096
+    def __init__(self, config=None, n_threads: int = None, prompt_cache=None):
+        config = config or load_config()
+        llm_config = get_llm_config(config)
+        self.context_length = llm_config["n_ctx"]
+        self.max_tokens = llm_config["max_tokens"]
+        self.n_threads = n_threads or llm_config["n_threads"] or default_thread_count(llm_config["pool_size"])
+        self.draft_model = build_draft_model(config)
         self.model = Llama(
             model_path=config["paths"]["model_path"],
             n_ctx=self.context_length,
-            n_threads=8,
-            n_batch=128,
+            n_threads=self.n_threads,
+            n_threads_batch=self.n_threads,
+            n_batch=llm_config["n_batch"],
+            use_mmap=True,
             temperature=0.7,
             top_p=0.9,
             repeat_penalty=1.1,
             stop=["<|endoftext|>"],
-            verbose=True
+            draft_model=self.draft_model,
+            verbose=llm_config["verbose"]
+        )
+        # Reuse evaluated KV state for the longest cached token prefix of each prompt
+        self.prompt_cache = prompt_cache
+        if prompt_cache is not None:
+            self.model.set_cache(prompt_cache)
+        print(
+            f"[INFO] Loaded GGUF model from {config['paths']['model_path']} ({self.n_threads} threads"
+            f"{', prompt-lookup decoding' if self.draft_model is not None else ''})"
         )
-        print(f"[INFO] Loaded GGUF model from {config['paths']['model_path']}")
 
-    def truncate_prompt(self, prompt: str) -> str:
-        tokens = prompt.split()
-        if len(tokens) > self.context_length - 512:
-            tokens = tokens[-(self.context_length - 512):]
-        return " ".join(tokens)
+    def restore_state(self, state) -> bool:
+        """
+        Load a saved llama.cpp state (see save_state) so a prompt extending it
+        only prefills the remainder. Skipped when this instance still holds
+        that state, e.g. it also served the session's previous turn.
+        """
+        saved = state.input_ids[:state.n_tokens]
+        current = self.model._input_ids
+        if len(current) >= len(saved) and (current[:len(saved)] == saved).all():
+            return False
+        self.model.load_state(state)
+        return True
+
+    def save_state(self):
+        """Snapshot of the evaluated tokens and KV cache (llama_cpp.LlamaState)."""
+        return self.model.save_state()
+
+    def prompt_cache_hit_rate(self):
+        """Share of prompts that found a cached prefix, when the cache keeps count (SharedRAMCache)."""
+        return self.prompt_cache.hit_rate() if isinstance(self.prompt_cache, SharedRAMCache) else None
+
+    @property
+    def max_prompt_tokens(self) -> int:
+        return self.context_length - self.max_tokens
+
+    def tokenize(self, text: str) -> list:
+        return self.model.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def count_tokens(self, text: str) -> int:
+        """Number of model tokens in `text` (same tokenizer llama.cpp prefills with)."""
+        return len(self.tokenize(text))
+
+    def truncate_tokens(self, text: str, max_tokens: int) -> str:
+        """Cut `text` to at most `max_tokens` model tokens, keeping its start."""
+        tokens = self.tokenize(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.model.detokenize(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+
+    def truncate_prompt(self, prompt: str, keep_prefix_tokens: int = 0) -> str:
+        """
+        Last-resort guard for prompts over the budget (assemble_prompt and
+        sessions already enforce it). The first `keep_prefix_tokens` tokens,
+        the cacheable system prompt, are always kept; the oldest tokens after
+        them (history, context) are dropped. Raises ValueError when the
+        prefix alone does not fit.
+        """
+        tokens = self.tokenize(prompt)
+        if len(tokens) <= self.max_prompt_tokens:
+            return prompt
+        if keep_prefix_tokens >= self.max_prompt_tokens:
+            raise ValueError(
+                f"System prompt ({keep_prefix_tokens} tokens) leaves no room in the "
+                f"{self.max_prompt_tokens}-token prompt budget"
+            )
+        tail = self.max_prompt_tokens - keep_prefix_tokens
+        tokens = tokens[:keep_prefix_tokens] + tokens[-tail:]
+        return self.model.detokenize(tokens).decode("utf-8", errors="ignore")
 
     def _clean_streamed_text(self, text: str) -> str:
         text = re.sub(r'[ ]{2,}', ' ', text)
@@ -35,26 +200,50 @@ class LLMRunner:
         try:
             print("[INFO] Generating full response...")
             response = self.model(
-                prompt=prompt,
-                max_tokens=512,
+                prompt=self.truncate_prompt(prompt),
+                max_tokens=self.max_tokens,
                 stop=["<|endoftext|>"]
             )
             return response["choices"][0]["text"].strip()
         except Exception as e:
             return f"Error generating response: {str(e)}"
 
-    def stream_response(self, prompt: str):
+    def stream_response(self, prompt: str, stats: dict = None, should_stop=None, keep_prefix_tokens: int = 0):
+        """
+        Stream cleaned text chunks. `stats`, if given, receives the raw token
+        count, the raw generated text and the times of the first and last
+        token; the gap between consecutive tokens is recorded as the
+        llm_decode_token stage. `should_stop`, if given, is called after every
+        token; when it returns True generation ends there and the text so far
+        is flushed. `keep_prefix_tokens` is passed to truncate_prompt.
+        """
+        raw = []
+        completion = None
         try:
-            print("[INFO] Streaming response...")
             buffer = ""
-            for chunk in self.model(
-                prompt=prompt,
-                max_tokens=512,
+            last_token_at = None
+            completion = self.model(
+                prompt=self.truncate_prompt(prompt, keep_prefix_tokens),
+                max_tokens=self.max_tokens,
                 stream=True,
-                stop=["<|endoftext|>", "User:", "Assistant:"]
-            ):
+                stop=STOP_SEQUENCES
+            )
+            for chunk in completion:
                 token = chunk["choices"][0]["text"]
                 buffer += token
+                raw.append(token)
+
+                if stats is not None:
+                    now = time.perf_counter()
+                    if last_token_at is None:
+                        stats["first_token_at"] = now
+                    else:
+                        record_stage("llm_decode_token", now - last_token_at)
+                    last_token_at = stats["last_token_at"] = now
+                    stats["completion_tokens"] = stats.get("completion_tokens", 0) + 1
+
+                if should_stop is not None and should_stop():
+                    break
 
                 if re.search(r"[ \n]$", buffer) or re.search(r'\]\([^)]+?\)$', buffer):
                     cleaned = self._clean_streamed_text(buffer)
@@ -66,4 +255,11 @@ class LLMRunner:
                 yield self._clean_streamed_text(buffer)
 
         except Exception as e:
-            yield f"\n[Error generating response: {str(e)}]"
\ No newline at end of file
+            yield f"\n[Error generating response: {str(e)}]"
+
+        finally:
+            # Leaves llama.cpp's generation loop before it evaluates another token
+            if completion is not None:
+                completion.close()
+            if stats is not None:
+                stats["text"] = "".join(raw)
\ No newline at end of file
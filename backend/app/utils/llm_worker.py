@@ -0,0 +1,229 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.utils.llm_model import LLMRunner, get_llm_config, build_prompt_cache
+from app.utils.metrics import record_generation, timed
+
+class QueueFullError(Exception):
+    """Raised when the LLM queue is at its admission limit."""
+
+
+class GenerationJob:
+    """
+    One queued generation. Tokens produced on the worker thread are handed
+    to the request's event loop through an asyncio queue. `cancel` stops it
+    before its next token (or before it starts, while queued).
+    """
+
+    def __init__(self, prompt: str, loop: asyncio.AbstractEventLoop, position: int, prompt_tokens: int = None,
+                 state=None, keep_state: bool = False, prefix_tokens: int = 0):
+        self.prompt = prompt
+        self.prompt_tokens = prompt_tokens
+        self.prefix_tokens = prefix_tokens  # system prompt tokens kept if the prompt must be truncated
+        self.state = state              # llama.cpp state to resume from (session turns)
+        self.keep_state = keep_state    # replace `state` with the one after generation
+        self.loop = loop
+        self.position = position
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.first_token_at = None
+        self.stats = {}   # filled by LLMRunner.stream_response
+        self.finished = False
+        self.stop_reason = None         # "disconnect" | "deadline" | "idle" once stopped early
+        self.tokens_at_stop = None      # completion tokens generated when it was stopped
+        self.emitted_at = []            # emit time of each text chunk
+        self.emitted_tokens = []        # completion tokens generated up to each text chunk
+        self.read_chunks = 0            # chunks the furthest reader has taken
+        self.delivered_tokens = 0       # completion tokens behind those chunks
+
+    def emit(self, kind: str, payload=None):
+        """Thread-safe: push an event onto the request's event loop."""
+        if kind == "token":
+            self.emitted_tokens.append(self.stats.get("completion_tokens", 0))
+            self.emitted_at.append(time.perf_counter())
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, payload))
+
+    def mark_read(self, chunks: int):
+        """A client has taken the first `chunks` text chunks; earlier positions are ignored."""
+        if chunks > self.read_chunks:
+            self.read_chunks = chunks
+            self.delivered_tokens = self.emitted_tokens[chunks - 1]
+
+    async def stream(self, track_reads: bool = True) -> AsyncIterator[Tuple[str, object]]:
+        """
+        Yield (kind, payload) events until the job finishes. With
+        `track_reads=False` the consumer is not a client (e.g. it forwards
+        the events to readers that call `mark_read` themselves).
+        """
+        while True:
+            kind, payload = await self.events.get()
+            if kind == "token" and track_reads:
+                self.mark_read(self.read_chunks + 1)
+            yield kind, payload
+            if kind in ("done", "error"):
+                return
+
+    def cancel(self, reason: str = "disconnect"):
+        """Thread-safe: stop generating, e.g. because nobody is reading any more. No-op once finished."""
+        if self.finished or self.stop_reason is not None:
+            return
+        self.tokens_at_stop = self.stats.get("completion_tokens", 0)
+        self.stop_reason = reason
+
+    def should_stop(self, deadline_seconds: Optional[float], idle_seconds: Optional[float]) -> bool:
+        """
+        Checked by the worker after every token: cancelled, running past the
+        deadline, or the oldest unread chunk has waited longer than `idle_seconds`
+        (the client stalled or vanished without the disconnect being seen).
+        """
+        if self.stop_reason is None:
+            now = time.perf_counter()
+            if deadline_seconds is not None and now - self.started_at > deadline_seconds:
+                self.cancel("deadline")
+            elif (idle_seconds is not None and self.read_chunks < len(self.emitted_at)
+                  and now - self.emitted_at[self.read_chunks] > idle_seconds):
+                self.cancel("idle")
+        return self.stop_reason is not None
+
+    def wasted_tokens(self) -> int:
+        """
+        Generated tokens no client read: those after the last chunk read when
+        the reader went away. A deadline stop still delivers everything.
+        """
+        total = self.stats.get("completion_tokens", 0)
+        if self.stop_reason not in ("disconnect", "idle"):
+            return 0
+        return total - min(self.delivered_tokens, self.tokens_at_stop)
+
+    def timings(self) -> dict:
+        timings = {}
+        if self.started_at is not None:
+            timings["queue_wait_ms"] = round((self.started_at - self.submitted_at) * 1000, 1)
+        if self.first_token_at is not None:
+            timings["ttft_ms"] = round((self.first_token_at - self.submitted_at) * 1000, 1)
+
+        first, last = self.stats.get("first_token_at"), self.stats.get("last_token_at")
+        tokens = self.stats.get("completion_tokens", 0)
+        timings["completion_tokens"] = tokens
+        if first is not None and self.started_at is not None:
+            timings["llm_prefill_ms"] = round((first - self.started_at) * 1000, 1)
+            timings["llm_decode_ms"] = round((last - first) * 1000, 1)
+            if tokens > 1 and last > first:
+                timings["tokens_per_second"] = round((tokens - 1) / (last - first), 1)
+        return timings
+
+
+class LLMWorkerPool:
+    """
+    Runs generations on dedicated threads, one per LLMRunner slot. Each
+    runner is only ever used by its own thread, so no Llama instance is
+    shared concurrently, and queued requests go to whichever slot frees up
+    first. Slow generations do not tie up the FastAPI threadpool, and
+    admission is bounded by `max_queue_size`. A generation is stopped
+    early when cancelled, after `generation_timeout_seconds`, or once its
+    output has gone unread for `idle_timeout_seconds`.
+    """
+
+    def __init__(self, runners: List[LLMRunner], max_queue_size: int = 8,
+                 generation_timeout_seconds: Optional[float] = None, idle_timeout_seconds: Optional[float] = None):
+        self.runners = runners
+        self.max_queue_size = max_queue_size
+        self.generation_timeout_seconds = generation_timeout_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.workers = [
+            threading.Thread(target=self._run, args=(runner,), name=f"llm-slot-{slot}", daemon=True)
+            for slot, runner in enumerate(runners)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    @property
+    def tokenizer(self) -> LLMRunner:
+        """Any runner can tokenize; they all load the same model."""
+        return self.runners[0]
+
+    def submit(self, prompt: str, prompt_tokens: int = None, state=None, keep_state: bool = False,
+               prefix_tokens: int = 0) -> GenerationJob:
+        """
+        Queue a prompt from within the event loop; raises QueueFullError when saturated.
+        With `state`, the runner resumes from that llama.cpp state first; with
+        `keep_state`, the job's `state` is the runner's state after generating.
+        `prefix_tokens` is the length of the system prompt the prompt starts with.
+        """
+        with self.lock:
+            if self.admitted >= self.max_queue_size:
+                raise QueueFullError(f"LLM queue is full ({self.max_queue_size} requests)")
+            # Requests ahead of this one that are still waiting for a slot
+            position = max(0, self.admitted - len(self.runners) + 1)
+            job = GenerationJob(
+                prompt, asyncio.get_running_loop(), position=position, prompt_tokens=prompt_tokens,
+                state=state, keep_state=keep_state, prefix_tokens=prefix_tokens
+            )
+            self.admitted += 1
+        self.jobs.put(job)
+        return job
+
+    def close(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def _run(self, runner: LLMRunner):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            job.started_at = time.perf_counter()
+            try:
+                # Requests cancelled while queued never reach the model
+                if job.stop_reason is None:
+                    if job.state is not None:
+                        with timed("llm_state_load"):
+                            runner.restore_state(job.state)
+                    should_stop = lambda: job.should_stop(self.generation_timeout_seconds, self.idle_timeout_seconds)
+                    for token in runner.stream_response(job.prompt, stats=job.stats, should_stop=should_stop,
+                                                        keep_prefix_tokens=job.prefix_tokens):
+                        if job.first_token_at is None:
+                            job.first_token_at = time.perf_counter()
+                        job.emit("token", token)
+                if job.keep_state and job.stop_reason == "disconnect":
+                    job.state = None    # nobody will commit this turn
+                elif job.keep_state:
+                    with timed("llm_state_save"):
+                        job.state = runner.save_state()
+                timings = job.timings()
+                if job.stop_reason is not None:
+                    timings["stop_reason"] = job.stop_reason
+                record_generation(timings, job.prompt_tokens, wasted_tokens=job.wasted_tokens())
+                job.finished = True
+                job.emit("done", timings)
+            except Exception as e:
+                job.finished = True
+                job.emit("error", str(e))
+            finally:
+                with self.lock:
+                    self.admitted -= 1
+
+
+def build_llm_pool(config) -> LLMWorkerPool:
+    """
+    Load `llm.pool_size` runners, splitting the cores between them and sharing
+    one prompt cache, and start their slots.
+    """
+    llm_config = get_llm_config(config)
+    prompt_cache = build_prompt_cache(config)
+    runners = [LLMRunner(config, prompt_cache=prompt_cache) for _ in range(llm_config["pool_size"])]
+    return LLMWorkerPool(
+        runners,
+        max_queue_size=llm_config["max_queue_size"],
+        generation_timeout_seconds=llm_config["generation_timeout_seconds"],
+        idle_timeout_seconds=llm_config["idle_timeout_seconds"]
+    )
@@ -0,0 +1,259 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_METRICS_CONFIG = {
+    "enabled": True,
+    "request_timings": True    # per-stage timings in the final {"type": "done"} event
+}
+
+# Seconds; 0.1 ms .. 60 s, roughly x2.5 apart
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[LabelValues, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *label_values: str):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            items = list(self.values.items())
+        lines.extend(f"{self.name}{_format_labels(self.labels, values)} {value:g}" for values, value in items)
+        return lines
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"/".join(values) or "total": value for values, value in self.values.items()}
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram, optionally split by label values. An observation
+    is a bisect and two additions under a lock; quantiles are interpolated
+    from the buckets when read.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self.series: Dict[LabelValues, list] = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def quantile(self, q: float, *label_values: str) -> Optional[float]:
+        with self.lock:
+            series = self.series.get(label_values)
+            counts = list(series[:-1]) if series else None
+        if not counts or sum(counts) == 0:
+            return None
+        rank = q * sum(counts)
+        seen = 0
+        for slot, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[slot - 1] if slot > 0 else 0.0
+                upper = self.buckets[slot] if slot < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            items = [(values, list(series)) for values, series in self.series.items()]
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                bucket_labels = _format_labels(self.labels, values, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            keys = list(self.series)
+        summary = {}
+        for values in keys:
+            with self.lock:
+                series = list(self.series[values])
+            count = sum(series[:-1])
+            summary["/".join(values) or "total"] = {
+                "count": count,
+                "mean": series[-1] / count if count else None,
+                **{f"p{int(q * 100)}": self.quantile(q, *values) for q in (0.5, 0.95, 0.99)}
+            }
+        return summary
+
+
+class MetricsRegistry:
+    """Process-wide metrics, exposed in the Prometheus text format at /metrics."""
+
+    def __init__(self):
+        self.enabled = True
+        self.request_timings = True
+        self.metrics: Dict[str, object] = {}
+        self.gauges: Dict[str, Tuple[str, Callable[[], Optional[float]]]] = {}
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS, labels: Tuple[str, ...] = ()) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets, labels))
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], Optional[float]]):
+        """A value read at scrape time, e.g. a cache hit rate."""
+        self.gauges[name] = (help_text, read)
+
+    def expose(self) -> str:
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.expose())
+        for name, (help_text, read) in list(self.gauges.items()):
+            value = read()
+            if value is not None:
+                lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"])
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """JSON view with p50/p95/p99 per histogram series."""
+        summary = {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+        summary.update({name: read() for name, (_, read) in list(self.gauges.items())})
+        return summary
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    "chefmate_stage_seconds", "Latency of each /chat pipeline stage", labels=("stage",)
+)
+
+# Timings of the request being served in this context (see request_trace)
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("chefmate_trace", default=None)
+
+
+@contextmanager
+def request_trace():
+    """Collect the stage timings of one request into a dict (milliseconds per stage)."""
+    trace = {}
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_stage(stage: str, seconds: float):
+    """Add a stage timing to the histogram and to the active request trace, if any."""
+    if not METRICS.enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace[f"{stage}_ms"] = round(trace.get(f"{stage}_ms", 0.0) + seconds * 1000, 2)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as one pipeline stage, e.g. `with timed("embed"): ...`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def configure_metrics(config):
+    """Apply the `metrics` section of the config to the process-wide registry."""
+    metrics_config = {**DEFAULT_METRICS_CONFIG, **(config.get("metrics") or {})}
+    METRICS.enabled = metrics_config["enabled"]
+    METRICS.request_timings = metrics_config["request_timings"]
+
+
+CHAT_REQUESTS = METRICS.counter("chefmate_chat_requests_total", "Chat requests by outcome", labels=("status",))
+INTENTS = METRICS.counter("chefmate_intents_total", "Detected intents by source", labels=("intent", "source"))
+FAST_PATH = METRICS.counter(
+    "chefmate_fast_path_answers_total", "Step and fact questions answered from recipe metadata", labels=("kind",)
+)
+RESPONSE_CACHE = METRICS.counter(
+    "chefmate_response_cache_total", "/chat answer cache lookups (hit, similar, coalesced, miss)", labels=("result",)
+)
+PROMPT_TOKENS = METRICS.counter("chefmate_prompt_tokens_total", "Prompt tokens sent to the LLM")
+COMPLETION_TOKENS = METRICS.counter("chefmate_completion_tokens_total", "Tokens generated by the LLM")
+GENERATED_TOKENS = METRICS.counter(
+    "chefmate_generated_tokens_total", "Completion tokens a client read (delivered) or never read (wasted)",
+    labels=("outcome",)
+)
+GENERATIONS_STOPPED = METRICS.counter(
+    "chefmate_generations_stopped_total", "Generations stopped early (disconnect, deadline, idle)", labels=("reason",)
+)
+PROMPT_TOKENS_PER_REQUEST = METRICS.histogram(
+    "chefmate_prompt_tokens", "Prompt tokens per generation", buckets=TOKEN_BUCKETS
+)
+TTFT_SECONDS = METRICS.histogram("chefmate_ttft_seconds", "Time from submission to the first streamed text")
+TOKENS_PER_SECOND = METRICS.histogram(
+    "chefmate_decode_tokens_per_second", "Decode throughput per generation", buckets=RATE_BUCKETS
+)
+
+
+def record_generation(timings: dict, prompt_tokens: Optional[int] = None, wasted_tokens: int = 0):
+    """
+    Record one finished generation from its timings (see GenerationJob.timings);
+    `wasted_tokens` of its completion tokens were never read by a client.
+    """
+    if not METRICS.enabled:
+        return
+    for stage, key in (("llm_queue", "queue_wait_ms"), ("llm_prefill", "llm_prefill_ms"), ("llm_decode", "llm_decode_ms")):
+        if key in timings:
+            STAGE_SECONDS.observe(timings[key] / 1000, stage)
+    if "ttft_ms" in timings:
+        TTFT_SECONDS.observe(timings["ttft_ms"] / 1000)
+    if timings.get("tokens_per_second"):
+        TOKENS_PER_SECOND.observe(timings["tokens_per_second"])
+    COMPLETION_TOKENS.inc(timings.get("completion_tokens", 0))
+    GENERATED_TOKENS.inc(timings.get("completion_tokens", 0) - wasted_tokens, "delivered")
+    GENERATED_TOKENS.inc(wasted_tokens, "wasted")
+    if "stop_reason" in timings:
+        GENERATIONS_STOPPED.inc(1, timings["stop_reason"])
+    if prompt_tokens is not None:
+        PROMPT_TOKENS.inc(prompt_tokens)
+        PROMPT_TOKENS_PER_REQUEST.observe(prompt_tokens)
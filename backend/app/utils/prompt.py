@@ -1,13 +1,28 @@
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
+import math
 import re
 
-def construct_prompt(system_prompt: str, retrieved_chunks: list, chat_history: list, latest_user_message: str) -> str:
+BASE_SYSTEM_PROMPT = """
+You are a helpful, friendly AI cooking assistant. Always:
+- Format response using proper Markdown syntax [e.g., Use **bold** for key terms].
+- Ask clarifying questions if anything is ambiguous.
+Strictly avoid responses stating: "Based on the knowledge base", or similar phrases.
+Keep answers concise and helpful.
+"""
+
+def construct_prompt(system_prompt: str, retrieved_chunks: list, chat_history: list, latest_user_message: str,
+                     instructions: str = "") -> str:
     """
     Constructs a complete prompt for the language model by combining:
     - a system prompt
-    - context retrieved from vector DB
     - chat history
+    - per-turn instructions
+    - context retrieved from vector DB
     - latest user query
+
+    Parts that stay the same across turns come first, so the LLM's prompt
+    cache can reuse the evaluated prefix and only prefill the new turn.
     """
     # Formatting retrieved chunks
     if retrieved_chunks:
@@ -23,54 +38,194 @@ def construct_prompt(system_prompt: str, retrieved_chunks: list, chat_history: l
         content = msg["content"]
         formatted_history += f"{role.capitalize()}: {content}\n"
 
+    instructions_block = f"{instructions.strip()}\n" if instructions.strip() else ""
+
     # Combining all parts
     prompt = (
         f"{system_prompt}\n"
-        f"{context_message}"
         f"[Conversation History]\n"
         f"{formatted_history}\n"
+        f"{instructions_block}"
+        f"{context_message}"
         f"The user asked: {latest_user_message}\n"
         f"Assiatnce: You are the assistant. Please respond accordingly."
     )
     return prompt
 
-def generate_system_prompt(user_message: str) -> str:
-    INTENT_PATTERNS = {
-        "SuggestRecipe": [
-            r"\b(suggest|recommend|idea|give me|show|find|any)\b.*\b(recipes?|dishes?|meals?)\b",
-            r"\b(what can i make|cook|prepare)\b.*\b(with|using)\b.*",
-            r"\b(available ingredients?|leftovers?|at home)\b",
-            r"\b(good|easy|quick|simple|healthy).*\brecipes?\b",
-            r"\b(dinner|lunch|breakfast|snack).*ideas?\b",
-        ],
-        "IngredientQuery": [
-            r"\b(ingredients?|need(ed)?|require|contain|consist of)\b",
-            r"\b(do i need|what do i need|is it made of)\b.*",
-        ],
-        "InstructionsOnly": [
-            r"\b(how to|steps to|prepare|make|cook|method|instruction(s)?)\b.*",
-            r"\bprocedure\b",
-        ],
-        "NutritionInfo": [
-            r"\b(calories|nutritional|health(y)?|macro|carbs|protein)\b",
-        ],
-        "CookingTimeFilter": [
-            r"\b(time|required|cook(ing)? time|under \d{1,3} (mins?|minutes?))\b",
-            r"\bquick|fast|30 min\b",
-        ],
-        "DietaryPreferences": [
-            r"\b(vegetarian|vegan|gluten[- ]?free|dairy[- ]?free|low carb|low fat|keto|paleo)\b",
-        ],
-        "ExpandRecipe": [
-            r"\b(more details|elaborate|explain more|show full|tell me more)\b",
-        ],
-        "ToolOrMethodQuery": [
-            r"\b(do i need|how to use|can i use|tool(s)?|equipment|machine|oven|grill|stove|microwave)\b",
-        ],
-    }
-
-    intent_addons = {
-        "SuggestRecipe": """
+DEFAULT_PROMPT_BUDGET = {
+    "context_tokens": 1200,   # retrieved recipes
+    "history_tokens": 1500,   # earlier turns, oldest dropped first
+    "query_tokens": 256       # latest user message
+}
+
+SUMMARY_FIELDS = ["name", "category", "calories", "total_time", "rating", "images", "ingredients_with_quantities"]
+FULL_FIELDS = SUMMARY_FIELDS + ["recipe_instructions"]
+
+# Recipe fields the model needs for each retrieval intent
+RECIPE_FIELDS_BY_INTENT = {
+    "specific_recipe": FULL_FIELDS,
+    "recipe_generation": FULL_FIELDS,
+    "step_navigation": ["name", "recipe_instructions"],
+    "nutrition_info": ["name", "calories", "ingredients_with_quantities"],
+    "time_filter": ["name", "total_time", "category", "rating", "images", "ingredients_with_quantities"],
+    "rating_filter": ["name", "rating", "category", "calories", "total_time", "images"],
+}
+
+FIELD_LABELS = {
+    "name": "Name",
+    "category": "Category",
+    "calories": "Calories",
+    "total_time": "Total time (HH:MM)",
+    "rating": "Rating",
+    "images": "Image",
+    "ingredients_with_quantities": "Ingredients",
+    "recipe_instructions": "Instructions",
+}
+
+def _is_missing(value) -> bool:
+    return value is None or value == "" or value == [] or (isinstance(value, float) and math.isnan(value))
+
+def format_recipe(recipe: dict, fields: List[str]) -> str:
+    """Compact plain-text rendering of a retrieved recipe with only the given fields."""
+    lines = []
+    for field in fields:
+        value = recipe.get(field)
+        if _is_missing(value):
+            continue
+        if field == "images":
+            value = value[0] if isinstance(value, list) else value
+        elif field == "ingredients_with_quantities" and isinstance(value, list):
+            value = "; ".join(value)
+        elif field == "recipe_instructions" and isinstance(value, list):
+            lines.append(f"{FIELD_LABELS[field]}:")
+            lines.extend(f"{i + 1}. {step}" for i, step in enumerate(value))
+            continue
+        lines.append(f"{FIELD_LABELS[field]}: {value}")
+    return "\n".join(lines)
+
+def assemble_prompt(system_prompt: str, instructions: str, retrieved_recipes: list, chat_history: list,
+                    latest_user_message: str, intent: str, tokenizer, budget: dict = None) -> Tuple[str, dict]:
+    """
+    Token-budgeted prompt assembly. Each section (retrieved recipes, history,
+    query) gets a budget measured with the model's tokenizer; recipes are
+    serialized with only the fields the intent needs and the oldest history
+    is dropped first. `tokenizer` is an LLMRunner (count_tokens/truncate_tokens).
+    Returns the prompt and per-section prefill token counts.
+    """
+    budget = {**DEFAULT_PROMPT_BUDGET, **(budget or {})}
+    prefix_tokens = tokenizer.count_tokens(f"{system_prompt}\n")
+    counts = {"system": prefix_tokens + tokenizer.count_tokens(instructions)}
+    template_tokens = tokenizer.count_tokens(construct_prompt("", [], [], "", ""))
+    remaining = tokenizer.max_prompt_tokens - counts["system"] - template_tokens
+
+    # Latest query
+    query = tokenizer.truncate_tokens(latest_user_message, min(budget["query_tokens"], max(remaining, 0)))
+    counts["query"] = tokenizer.count_tokens(query)
+    remaining -= counts["query"]
+
+    # Retrieved recipes, best match first, until the context budget is spent
+    fields = RECIPE_FIELDS_BY_INTENT.get(intent, SUMMARY_FIELDS)
+    context_budget = min(budget["context_tokens"], remaining)
+    chunks, counts["context"] = [], 0
+    for recipe in retrieved_recipes:
+        chunk = format_recipe(recipe, fields)
+        chunk_tokens = tokenizer.count_tokens(chunk) + 4  # "Recipe N:" header
+        if counts["context"] + chunk_tokens > context_budget:
+            break
+        chunks.append(chunk)
+        counts["context"] += chunk_tokens
+    remaining -= counts["context"]
+
+    # Earlier turns, newest first; the latest user message is already the query
+    history = list(chat_history)
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == latest_user_message:
+        history = history[:-1]
+    history_budget = min(budget["history_tokens"], remaining)
+    kept, counts["history"] = [], 0
+    for msg in reversed(history):
+        msg_tokens = tokenizer.count_tokens(f"{msg['role'].capitalize()}: {msg['content']}\n")
+        if counts["history"] + msg_tokens > history_budget:
+            break
+        kept.append(msg)
+        counts["history"] += msg_tokens
+    kept.reverse()
+
+    prompt = construct_prompt(
+        system_prompt=system_prompt,
+        retrieved_chunks=chunks,
+        chat_history=kept,
+        latest_user_message=query,
+        instructions=instructions
+    )
+    counts["total"] = tokenizer.count_tokens(prompt)
+    counts["prefix"] = prefix_tokens  # the system prompt, kept if the prompt is ever truncated
+    counts["dropped_history_messages"] = len(history) - len(kept)
+    return prompt, counts
+
+def session_preamble(system_prompt: str) -> str:
+    """Start of a session transcript; every later turn is appended after it."""
+    return f"{system_prompt}\n[Conversation]\n"
+
+def session_turn(message: str, instructions: str = "", recipe_chunks: List[str] = (), first_recipe: int = 1) -> str:
+    """
+    One user turn of a session transcript: the turn's instructions, recipes
+    not yet shown in the session (numbered on from `first_recipe`) and the
+    message, ending where the assistant's reply starts. Earlier turns are
+    never rewritten, so the transcript only grows at the end and the model
+    state of the previous turn covers all of it.
+    """
+    parts = []
+    if instructions.strip():
+        parts.append(f"{instructions.strip()}\n")
+    if recipe_chunks:
+        context_block = "\n".join(f"Recipe {first_recipe + i}:\n{chunk}" for i, chunk in enumerate(recipe_chunks))
+        parts.append(f"[Context Retrieved from Knowledge Base]\n{context_block}\n")
+    parts.append(f"User: {message}\nAssistant:")
+    return "".join(parts)
+
+# Prompt addon -> patterns on the lowercased message; each list is compiled
+# into one alternation (any pattern matching selects the addon)
+INTENT_PATTERNS = {
+    "SuggestRecipe": [
+        r"\b(suggest|recommend|idea|give me|show|find|any)\b.*\b(recipes?|dishes?|meals?)\b",
+        r"\b(what can i make|cook|prepare)\b.*\b(with|using)\b",
+        r"\b(available ingredients?|leftovers?|at home)\b",
+        r"\b(good|easy|quick|simple|healthy).*\brecipes?\b",
+        r"\b(dinner|lunch|breakfast|snack).*ideas?\b",
+    ],
+    "IngredientQuery": [
+        r"\b(ingredients?|need(ed)?|require|contain|consist of)\b",
+        r"\b(do i need|what do i need|is it made of)\b",
+    ],
+    "InstructionsOnly": [
+        r"\b(how to|steps to|prepare|make|cook|method|instruction(s)?)\b",
+        r"\bprocedure\b",
+    ],
+    "NutritionInfo": [
+        r"\b(calories|nutritional|health(y)?|macro|carbs|protein)\b",
+    ],
+    "CookingTimeFilter": [
+        r"\b(time|required|cook(ing)? time|under \d{1,3} (mins?|minutes?))\b",
+        r"\bquick|fast|30 min\b",
+    ],
+    "DietaryPreferences": [
+        r"\b(vegetarian|vegan|gluten[- ]?free|dairy[- ]?free|low carb|low fat|keto|paleo)\b",
+    ],
+    "ExpandRecipe": [
+        r"\b(more details|elaborate|explain more|show full|tell me more)\b",
+    ],
+    "ToolOrMethodQuery": [
+        r"\b(do i need|how to use|can i use|tool(s)?|equipment|machine|oven|grill|stove|microwave)\b",
+    ],
+}
+
+COMPILED_INTENT_PATTERNS = [
+    (intent, re.compile("|".join(f"(?:{pattern})" for pattern in patterns)))
+    for intent, patterns in INTENT_PATTERNS.items()
+]
+
+INTENT_ADDONS = {
+    "SuggestRecipe": """
 When suggesting recipes:
 - Provide 2 to 3 options in Markdown.
 - Include name, category, calories, cook time (e.g., "1 hour 30 minutes", not 01:30), and rating - strictly each on a new line with labels, and properly formatted
@@ -78,62 +233,58 @@ When suggesting recipes:
 - Brief list of ingredients [sub-bulleted list or comma separated].
 - There is no need to include instructions.
 """,
-        "IngredientQuery": """
+    "IngredientQuery": """
 For ingredient questions:
 - Use bullet points with quantities.
 - Only include relevant ingredients.
 """,
-        "InstructionsOnly": """
+    "InstructionsOnly": """
 When explaining instructions steps:
 - Use a numbered list.
 - Avoid adding unrelated commentary.
 """,
-        "NutritionInfo": """
+    "NutritionInfo": """
 For nutrition questions:
 - Mention calories, macros, and diet types (if known).
 - Use a clean, bullet-style summary.
 """,
-        "CookingTimeFilter": """
+    "CookingTimeFilter": """
 For time-based requests:
 - Suggest recipes with matching or under X cook time.
 - Clearly show total cooking time (e.g., "1 hour 30 minutes", not 01:30).
 """,
-        "DietaryPreferences": """
+    "DietaryPreferences": """
 Respect dietary preferences like vegan, gluten-free, etc.
 - Do not suggest recipes with restricted ingredients.
 """,
-        "ExpandRecipe": """
+    "ExpandRecipe": """
 If elaborating on a recipe:
 - Include full details (name, image, ingredients, instructions, calories, rating, total time).
 - Numbered steps for instructions.
 """,
-        "ToolOrMethodQuery": """
+    "ToolOrMethodQuery": """
 For tool/method questions:
 - Briefly explain tool usage.
 - Offer alternatives if applicable.
 """
-    }
+}
 
-    base_prompt = """
-You are a helpful, friendly AI cooking assistant. Always:
-- Format response using proper Markdown syntax [e.g., Use **bold** for key terms].
-- Ask clarifying questions if anything is ambiguous.
-Strictly avoid responses stating: "Based on the knowledge base", or similar phrases.
-Keep answers concise and helpful.
-"""
+def match_prompt_addons(lowered_message: str) -> Tuple[str, ...]:
+    """Names of the INTENT_ADDONS whose patterns match an already lowercased message, in declaration order."""
+    return tuple(intent for intent, pattern in COMPILED_INTENT_PATTERNS if pattern.search(lowered_message))
 
-    # Normalize input
-    user_message = user_message.lower()
+@lru_cache(maxsize=None)
+def instructions_for(addons: Tuple[str, ...]) -> str:
+    """Joined addon instructions, built once per distinct addon set."""
+    return "".join(INTENT_ADDONS.get(intent, "") for intent in addons)
 
-    # Detecting intents
-    matched_intents = []
-    for intent, patterns in INTENT_PATTERNS.items():
-        if any(re.search(pattern, user_message) for pattern in patterns):
-            matched_intents.append(intent)
+@lru_cache(maxsize=None)
+def system_prompt_for(addons: Tuple[str, ...]) -> str:
+    return (BASE_SYSTEM_PROMPT + instructions_for(addons)).strip()
 
-    # Building final prompt
-    full_prompt = base_prompt
-    for intent in matched_intents:
-        full_prompt += intent_addons.get(intent, "")
+def generate_intent_instructions(user_message: str) -> str:
+    """Intent-specific formatting instructions for the latest user message."""
+    return instructions_for(match_prompt_addons(user_message.lower()))
 
-    return full_prompt.strip()
\ No newline at end of file
+def generate_system_prompt(user_message: str) -> str:
+    return system_prompt_for(match_prompt_addons(user_message.lower()))
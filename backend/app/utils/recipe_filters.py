@@ -0,0 +1,233 @@
+import re
+import numpy as np
+import pandas as pd
+import faiss
+from typing import Dict, List, Optional
+
+from app.utils.recipe_store import RecipeStore, load_derived, save_derived
+
+# Diet -> (Food.com keywords, recipe categories) that mark a recipe as fitting it
+DIET_RULES = {
+    "vegan": (["vegan"], ["vegan"]),
+    "vegetarian": (["vegetarian", "vegan"], ["vegetarian", "vegan"]),
+    "gluten_free": (["gluten free", "gluten-free"], ["gluten free"]),
+    "low_carb": (["very low carbs", "low carb"], []),
+    "dairy_free": (["lactose free", "dairy free"], []),
+    "egg_free": (["egg free"], []),
+    "high_protein": (["high protein"], []),
+    "low_cholesterol": (["low cholesterol"], []),
+    "kosher": (["kosher"], []),
+    "halal": (["halal"], []),
+    "healthy": (["healthy"], []),
+}
+
+DIET_PATTERNS = {
+    "vegan": r"\bvegan\b",
+    "vegetarian": r"\bvegetarian\b|\bveggie\b",
+    "gluten_free": r"\bgluten[- ]?free\b|\bno gluten\b|\bceliac\b",
+    "low_carb": r"\bketo\b|\blow[- ]?carbs?\b",
+    "dairy_free": r"\bdairy[- ]?free\b|\blactose[- ]?free\b|\bno dairy\b",
+    "egg_free": r"\begg[- ]?free\b|\bno eggs?\b",
+    "high_protein": r"\bhigh[- ]?protein\b",
+    "low_cholesterol": r"\blow[- ]?cholesterol\b",
+    "kosher": r"\bkosher\b",
+    "halal": r"\bhalal\b",
+    "healthy": r"\bhealthy\b",
+}
+
+UPPER_BOUND = r"(?:under|less than|below|within|in|max(?:imum)?|at most|no more than|up to)"
+TIME_PATTERN = re.compile(UPPER_BOUND + r"\s+(\d+(?:\.\d+)?)\s*(minutes?|mins?|hours?|hrs?|h)\b")
+CALORIE_PATTERN = re.compile(UPPER_BOUND + r"\s+(\d+)\s*(?:k?cals?|calories)\b")
+RATING_PATTERN = re.compile(r"(?:(?:at least|above|over|min(?:imum)?)\s+)?(\d(?:\.\d)?)\s*\+?\s*stars?\b"
+                            r"|rated\s+(?:at least|above|over)\s+(\d(?:\.\d)?)")
+
+QUICK_MINUTES = 30          # "quick", "fast"
+LOW_CALORIE_LIMIT = 400     # "low calorie"
+TOP_RATED_MIN = 4.5         # "top rated", "highly rated", "most popular"
+
+
+def parse_recipe_filters(user_message: str) -> Dict[str, object]:
+    """
+    Extract hard constraints from a user message, e.g. "vegan under 30 minutes"
+    -> {"diets": ["vegan"], "max_minutes": 30}. Only constraints that were
+    stated are returned.
+    """
+    text = user_message.lower()
+    filters = {}
+
+    match = TIME_PATTERN.search(text)
+    if match:
+        value, unit = float(match.group(1)), match.group(2)
+        filters["max_minutes"] = value * 60 if unit.startswith("h") else value
+    elif re.search(r"\bhalf an hour\b", text):
+        filters["max_minutes"] = 30
+    elif re.search(r"\b(?:under|within|in|less than) an hour\b", text):
+        filters["max_minutes"] = 60
+    elif re.search(r"\b(?:quick|fast|speedy)\b", text):
+        filters["max_minutes"] = QUICK_MINUTES
+
+    match = CALORIE_PATTERN.search(text)
+    if match:
+        filters["max_calories"] = float(match.group(1))
+    elif re.search(r"\blow[- ]?cal(?:orie)?s?\b", text):
+        filters["max_calories"] = LOW_CALORIE_LIMIT
+
+    match = RATING_PATTERN.search(text)
+    if match:
+        filters["min_rating"] = float(match.group(1) or match.group(2))
+    elif re.search(r"\b(?:top|best|highly|highest)[- ]rated\b|\bmost popular\b", text):
+        filters["min_rating"] = TOP_RATED_MIN
+
+    diets = [diet for diet, pattern in DIET_PATTERNS.items() if re.search(pattern, text)]
+    if diets:
+        filters["diets"] = diets
+    return filters
+
+
+def _duration_minutes(values: list) -> np.ndarray:
+    """'HH:MM' strings -> float32 minutes, NaN when missing."""
+    parts = pd.Series(values, dtype=object).astype("string").str.extract(r"^(\d+):(\d+)$").astype(float)
+    return (parts[0] * 60 + parts[1]).to_numpy(dtype=np.float32)
+
+
+class RecipeAttributeIndex:
+    """
+    Columnar attribute indexes over the recipe store: total minutes,
+    calories and rating as float32 arrays, category codes, and one packed
+    bitset per Food.com keyword. A set of filters resolves to the eligible
+    FAISS ids with a few vectorized comparisons.
+
+    Built from the store's columns, unless `save` stored them with it: a
+    store loaded from disk then memory-maps them instead.
+    """
+
+    ARRAYS = ("total_minutes", "calories", "rating", "category_codes", "keyword_bits")
+
+    def __init__(self, store: RecipeStore):
+        self.ids = store.ids
+        self.num_rows = len(store)
+        saved = load_derived(store, "attributes")
+        if saved is not None:
+            meta, arrays = saved
+            for name in self.ARRAYS:
+                setattr(self, name, arrays.get(name))
+            self.categories = meta["categories"]
+            self.keywords = {keyword: row for row, keyword in enumerate(meta["keywords"])}
+            return
+
+        total_time = store.column("total_time")
+        self.total_minutes = _duration_minutes(list(total_time)) if total_time is not None else None
+        self.calories = self._numeric(store, "calories")
+        self.rating = self._numeric(store, "aggregated_rating")
+
+        categories = store.column("recipe_category")
+        self.category_codes, self.categories = None, []
+        if categories is not None:
+            codes, uniques = pd.factorize(pd.Series(categories, dtype=object).astype("string").str.lower())
+            self.category_codes = codes.astype(np.int32)
+            self.categories = list(uniques)
+
+        # Keyword -> row of keyword_bits, one packed bit per recipe
+        self.keywords: Dict[str, int] = {}
+        self.keyword_bits = np.zeros((0, (self.num_rows + 7) // 8), dtype=np.uint8)
+        keywords = store.column("keywords")
+        if keywords is not None:
+            postings: Dict[str, List[int]] = {}
+            for position, row_keywords in enumerate(keywords):
+                for keyword in row_keywords or ():
+                    postings.setdefault(keyword.lower(), []).append(position)
+            self.keyword_bits = np.zeros((len(postings), self.keyword_bits.shape[1]), dtype=np.uint8)
+            for row, (keyword, positions) in enumerate(postings.items()):
+                mask = np.zeros(self.num_rows, dtype=bool)
+                mask[positions] = True
+                self.keyword_bits[row] = np.packbits(mask)
+                self.keywords[keyword] = row
+
+    def save(self, directory: str):
+        """Save the arrays with the store in `directory` (the one they were built from) for loads to memory-map."""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS if getattr(self, name) is not None}
+        save_derived(directory, "attributes", self.ids, arrays,
+                     {"categories": self.categories, "keywords": list(self.keywords)})
+
+    def _numeric(self, store: RecipeStore, name: str) -> Optional[np.ndarray]:
+        values = store.column(name)
+        if values is None:
+            return None
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float32)
+
+    def _keyword_mask(self, keyword: str) -> Optional[np.ndarray]:
+        row = self.keywords.get(keyword)
+        return None if row is None else np.unpackbits(self.keyword_bits[row], count=self.num_rows).astype(bool)
+
+    def _diet_mask(self, diet: str) -> Optional[np.ndarray]:
+        """Rows tagged with any of the diet's keywords/categories; None when the corpus has no such tags."""
+        keywords, categories = DIET_RULES[diet]
+        masks = [mask for mask in map(self._keyword_mask, keywords) if mask is not None]
+        known = [self.categories.index(c) for c in categories if c in self.categories]
+        if known:
+            masks.append(np.isin(self.category_codes, known))
+        if not masks:
+            return None
+        return np.logical_or.reduce(masks)
+
+    def eligible_ids(self, filters: Dict[str, object]) -> Optional[np.ndarray]:
+        """
+        Sorted FAISS ids satisfying every filter, or None when no filter
+        applies (unknown values such as a missing total time do not match).
+        Diets the corpus has no tags for are ignored rather than matching nothing.
+        """
+        masks = []
+        bounds = (
+            (self.total_minutes, filters.get("max_minutes"), np.less_equal),
+            (self.calories, filters.get("max_calories"), np.less_equal),
+            (self.rating, filters.get("min_rating"), np.greater_equal),
+        )
+        for values, bound, compare in bounds:
+            if values is not None and bound is not None:
+                masks.append(compare(values, bound))
+
+        for diet in filters.get("diets", []):
+            mask = self._diet_mask(diet)
+            if mask is not None:
+                masks.append(mask)
+
+        if not masks:
+            return None
+        return np.sort(self.ids[np.logical_and.reduce(masks)])
+
+
+def _base_index(index):
+    """Unwrap IDMap/pre-transform layers to the index that interprets search parameters."""
+    index = faiss.downcast_index(index)
+    while isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2, faiss.IndexPreTransform)):
+        index = faiss.downcast_index(index.index)
+    return index
+
+
+class IDFilter:
+    """
+    FAISS id selector over a set of eligible ids, as a bitmap over the id
+    space. `params_for(index)` builds search parameters of the type the index
+    expects, keeping its current nprobe/efSearch.
+    """
+
+    def __init__(self, ids: np.ndarray):
+        self.ids = ids
+        size = int(ids.max()) + 1 if len(ids) else 1
+        mask = np.zeros(size, dtype=bool)
+        mask[ids] = True
+        # Referenced by the selector, so it must live as long as this object;
+        # the selector takes its length in bytes and rejects ids beyond it
+        self.bitmap = np.packbits(mask, bitorder="little")
+        self.selector = faiss.IDSelectorBitmap(len(self.bitmap), faiss.swig_ptr(self.bitmap))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def params_for(self, index):
+        base = _base_index(index)
+        if isinstance(base, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=self.selector, nprobe=base.nprobe)
+        if isinstance(base, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=self.selector, efSearch=base.hnsw.efSearch)
+        return faiss.SearchParameters(sel=self.selector)
@@ -0,0 +1,184 @@
+import re
+import math
+from typing import Callable, List, Optional, Tuple
+
+# Longer messages are rarely bare navigation or fact questions; they go to the LLM
+MAX_STEP_COMMAND_WORDS = 8
+MAX_FACT_QUESTION_WORDS = 12
+
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5,
+    "sixth": 6, "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10
+}
+
+# Checked in order, first match wins; "goto" carries the step number
+STEP_COMMANDS = [
+    ("goto", re.compile(r"\bstep (?:number )?(\d{1,2})\b|\b(" + "|".join(ORDINALS) + r"|last|final) step\b")),
+    ("previous", re.compile(r"\b(previous|go back|step back|back one|before that)\b")),
+    ("repeat", re.compile(r"\b(repeat|again|current step|where was i|where am i|what step)\b")),
+    ("start", re.compile(r"\b(start|begin|from the top)\b")),
+    ("next", re.compile(r"\b(next|then what|after that|and then|what now|done|finished|ready)\b")),
+]
+
+# Recipe fact -> (store columns tried in order, question pattern, label, unit)
+FACTS = {
+    "calories": (["calories"], r"\b(calories|calorie|kcal)\b", "Calories", " kcal"),
+    "protein": (["protein_content"], r"\bprotein\b", "Protein", " g"),
+    "fat": (["fat_content"], r"\bfat\b", "Fat", " g"),
+    "carbs": (["carbohydrate_content"], r"\b(carbs?|carbohydrates?)\b", "Carbohydrates", " g"),
+    "sugar": (["sugar_content"], r"\bsugars?\b", "Sugar", " g"),
+    "fiber": (["fiber_content"], r"\b(fiber|fibre)\b", "Fiber", " g"),
+    "sodium": (["sodium_content"], r"\b(sodium|salt content)\b", "Sodium", " mg"),
+    "prep_time": (["prep_time"], r"\bprep(aration)? time\b", "Prep time", ""),
+    "cook_time": (["cook_time"], r"\bcook(ing)? time\b", "Cook time", ""),
+    "total_time": (["total_time"], r"\b(how long|total time|take to make)\b", "Total time", ""),
+    "servings": (["recipe_servings", "recipe_yield"], r"\b(servings?|serves|how many people|portions?|yield)\b", "Servings", ""),
+    "rating": (["aggregated_rating"], r"\b(rating|rated|stars)\b", "Rating", " / 5"),
+    "ingredients": (["ingredients_with_quantities"], r"\b(ingredients?|what do i need|shopping list)\b", "Ingredients", ""),
+}
+COMPILED_FACTS = [(fact, re.compile(pattern)) for fact, (_, pattern, _, _) in FACTS.items()]
+
+# Signs the user wants something other than the recipe being cooked
+NEW_SEARCH_PATTERN = re.compile(r"\b(recipes?|ideas?|suggest|recommend|instead|another|other|different)\b|,")
+REFERENCE_PATTERN = re.compile(r"\b(?:(" + "|".join(ORDINALS) + r"|last) one|(?:recipe|option|number) ?(\d))\b")
+
+
+def _is_missing(value) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def parse_step_command(lowered: str) -> Optional[Tuple[str, Optional[int]]]:
+    """("next" | "previous" | "repeat" | "start" | "goto", step number or -1 for the last step), or None."""
+    if len(lowered.split()) > MAX_STEP_COMMAND_WORDS:
+        return None
+    for command, pattern in STEP_COMMANDS:
+        match = pattern.search(lowered)
+        if match is None:
+            continue
+        if command != "goto":
+            return command, None
+        number, word = match.groups()
+        return command, int(number) if number else ORDINALS.get(word, -1)
+    return None
+
+
+def match_fact_questions(lowered: str) -> List[str]:
+    """Facts (keys of FACTS) asked about in a short question on the current recipe."""
+    if len(lowered.split()) > MAX_FACT_QUESTION_WORDS or NEW_SEARCH_PATTERN.search(lowered):
+        return []
+    return [fact for fact, pattern in COMPILED_FACTS if pattern.search(lowered)]
+
+
+def format_duration(value: str) -> str:
+    """ "01:30" (as stored) -> "1 hour 30 minutes"."""
+    hours, minutes = (int(part) for part in value.split(":"))
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+    if minutes or not hours:
+        parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+    return " ".join(parts)
+
+
+def step_reply(recipe: dict, step: Optional[int], command: str, target: Optional[int] = None) -> Optional[dict]:
+    """
+    Reply text and new position for a step command. `step` is the 1-based
+    step last shown, None before the first. None if the recipe has no steps.
+    """
+    steps = list(recipe.get("recipe_instructions") or [])
+    if not steps:
+        return None
+    total = len(steps)
+    current = step or 0
+
+    if command == "next":
+        new_step = current + 1
+    elif command == "previous":
+        new_step = max(current - 1, 1)
+    elif command == "repeat":
+        new_step = max(current, 1)
+    elif command == "start":
+        new_step = 1
+    else:
+        new_step = total if target == -1 else target
+
+    name = recipe.get("name", "this recipe")
+    if command == "goto" and not 1 <= new_step <= total:
+        return {"text": f"**{name}** only has {total} steps.", "step": step}
+    if new_step > total:
+        return {"text": f"That was the last step of **{name}** ({total} steps). Enjoy your meal!", "step": total}
+
+    text = f"**Step {new_step} of {total}:** {steps[new_step - 1]}"
+    if new_step == total:
+        text += "\n\nThat's the final step. Enjoy!"
+    elif command == "previous" and current <= 1:
+        text += "\n\nThis is the first step."
+    return {"text": text, "step": new_step}
+
+
+def fact_reply(recipe: dict, facts: List[str]) -> Optional[str]:
+    """Markdown answer for the asked facts, or None if any of them is not stored for the recipe."""
+    lines = [f"**{recipe.get('name', 'This recipe')}**"]
+    for fact in facts:
+        columns, _, label, unit = FACTS[fact]
+        value = next((recipe.get(column) for column in columns if not _is_missing(recipe.get(column))), None)
+        if value is None or (fact == "ingredients" and not len(value)) or (fact == "rating" and not value):
+            return None
+        if fact == "ingredients":
+            lines.append(f"{label}:")
+            lines.extend(f"- {item}" for item in value)
+            continue
+        if fact.endswith("_time"):
+            value = format_duration(value)
+        elif isinstance(value, float):
+            value = f"{round(value, 1):g}"
+        lines.append(f"- {label}: {value}{unit}")
+    return "\n".join(lines)
+
+
+def answer_from_recipe(lowered: str, intent: str, get_recipe: Callable[[], Optional[dict]],
+                       step: Optional[int]) -> Optional[dict]:
+    """
+    Deterministic answer to a step or fact question about the active recipe:
+    {"kind": "step" | "fact", "text", "step"}, or None when the LLM should answer.
+    `intent` is the keyword intent; anything but navigation, nutrition or an
+    unclear message is left to the normal pipeline. `get_recipe` is only
+    called once the message looks answerable.
+    """
+    command = parse_step_command(lowered) if intent in ("step_navigation", "unclear") else None
+    facts = match_fact_questions(lowered) if command is None and intent in ("nutrition_info", "unclear") else []
+    if command is None and not facts:
+        return None
+
+    recipe = get_recipe()
+    if recipe is None:
+        return None
+    if command is not None:
+        reply = step_reply(recipe, step, *command)
+        return {"kind": "step", **reply} if reply is not None else None
+    text = fact_reply(recipe, facts)
+    return {"kind": "fact", "text": text, "step": step} if text is not None else None
+
+
+def choose_active_recipe(lowered: str, intent: str, recipes: List[dict], current: Optional[int]) -> Optional[int]:
+    """
+    faiss_index of the recipe being cooked after a turn that retrieved
+    `recipes`: one the user points at ("the second one", "recipe 2" or by
+    name), the top hit of a specific-recipe request, or the top hit when no
+    recipe was active yet.
+    """
+    if not recipes:
+        return current
+    match = REFERENCE_PATTERN.search(lowered)
+    if match is not None:
+        word, number = match.groups()
+        position = len(recipes) if word == "last" else ORDINALS[word] if word else int(number)
+        if 1 <= position <= len(recipes):
+            return recipes[position - 1]["faiss_index"]
+    for recipe in recipes:
+        name = str(recipe.get("name") or "").lower()
+        if name and name in lowered:
+            return recipe["faiss_index"]
+    if intent == "specific_recipe" or current is None:
+        return recipes[0]["faiss_index"]
+    return current
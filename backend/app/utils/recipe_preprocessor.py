@@ -1,13 +1,21 @@
+import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
 from app.utils.helper import (
     to_snake_case,
-    parse_r_list_string,
-    clean_string_list,
-    combine_ingredients_with_quantities,
-    parse_iso_duration
+    parse_r_list_series,
+    parse_iso_duration_series
 )
 
+DEFAULT_PREPROCESSING_CONFIG = {
+    "workers": None     # processes used by clean_recipe_data; None = all cores
+}
+
+# Shards smaller than this are not worth the process start-up and pickling cost
+MIN_ROWS_PER_WORKER = 20000
+
 def load_recipe_data(file_path: str) -> pd.DataFrame:
     """Load recipe data from a CSV file into a DataFrame."""
     try:
@@ -17,8 +25,58 @@ def load_recipe_data(file_path: str) -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def clean_recipe_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Clean and transform the raw recipe DataFrame for analysis."""
+def get_preprocessing_workers(config) -> int:
+    """Worker process count from `preprocessing.workers` (defaults to all cores)."""
+    preprocessing_config = {**DEFAULT_PREPROCESSING_CONFIG, **(config.get("preprocessing") or {})}
+    return preprocessing_config["workers"] or os.cpu_count() or 1
+
+
+def _transform_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-row parsing of the raw columns. Runs on one shard inside a worker
+    process (or on the whole frame when serial); every step is row-local,
+    so sharding does not change the output.
+    """
+    # Fill missing quantities with empty list strings
+    df['recipe_ingredient_quantities'] = df['recipe_ingredient_quantities'].fillna('[]')
+
+    # Parse ingredients
+    ingredients_raw = parse_r_list_series(df['recipe_ingredient_parts'])
+    df['ingredients_raw'] = ingredients_raw
+    df['ingredients_cleaned'] = [[item.lower() for item in items if item] for items in ingredients_raw]
+
+    # Combine ingredients with their quantities
+    df['ingredients_with_quantities'] = [
+        [f"{q} {i}".strip() for q, i in zip(quantities, ingredients)]
+        for quantities, ingredients in zip(parse_r_list_series(df['recipe_ingredient_quantities']), ingredients_raw)
+    ]
+
+    df['recipe_instructions'] = parse_r_list_series(df['recipe_instructions'])
+    df['keywords'] = parse_r_list_series(df['keywords'])
+
+    # Convert time columns to a more usable format
+    df['cook_time'] = parse_iso_duration_series(df['cook_time'])
+    df['prep_time'] = parse_iso_duration_series(df['prep_time'])
+    df['total_time'] = parse_iso_duration_series(df['total_time'])
+    return df
+
+
+def _parallel_transform(df: pd.DataFrame, workers: int) -> pd.DataFrame:
+    """Split `df` into contiguous shards, transform them in a process pool and reassemble in order."""
+    workers = min(workers, len(df) // MIN_ROWS_PER_WORKER)
+    if workers <= 1:
+        return _transform_columns(df)
+
+    shards = [df.iloc[bounds] for bounds in np.array_split(np.arange(len(df)), workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return pd.concat(list(executor.map(_transform_columns, shards)))
+
+
+def clean_recipe_data(df: pd.DataFrame, workers: int = 1) -> pd.DataFrame:
+    """
+    Clean and transform the raw recipe DataFrame for analysis.
+    With `workers` > 1, the per-row parsing is spread over that many processes.
+    """
 
     # Rename columns to snake_case
     df.columns = [to_snake_case(col) for col in df.columns]
@@ -31,23 +89,8 @@ def clean_recipe_data(df: pd.DataFrame) -> pd.DataFrame:
     df.dropna(subset=['recipe_ingredient_parts', 'recipe_instructions'], inplace=True)
     print(f"Shape after dropping missing recipe parts/instructions: {df.shape}")
 
-    # Fill missing quantities with empty list strings
-    df['recipe_ingredient_quantities'] = df['recipe_ingredient_quantities'].fillna('[]')
-
-    # Parse ingredients
-    df['ingredients_raw'] = df['recipe_ingredient_parts'].apply(parse_r_list_string)
-    df['ingredients_cleaned'] = df['ingredients_raw'].apply(clean_string_list)
-
-    # Combine ingredients with their quantities
-    df['ingredients_with_quantities'] = df.apply(
-        lambda row: combine_ingredients_with_quantities(
-            row['recipe_ingredient_quantities'], row['ingredients_raw']
-        ),
-        axis=1
-    )
-    
-    df['recipe_instructions'] = df['recipe_instructions'].apply(parse_r_list_string)
-    df['keywords'] = df['keywords'].apply(parse_r_list_string)
+    # Parse the R-list and ISO-duration columns, sharded across processes
+    df = _parallel_transform(df, workers)
 
     # Debugging outputs (can be removed in production)
     print("Sample cleaned ingredients:")
@@ -62,10 +105,6 @@ def clean_recipe_data(df: pd.DataFrame) -> pd.DataFrame:
     df['aggregated_rating'] = df['aggregated_rating'].fillna(0.0).astype(float)
     print(f"Sample ratings: {df[['review_count', 'aggregated_rating']].head()}")
     
-    # Convert time columns to a more usable format
-    df['cook_time'] = df['cook_time'].apply(parse_iso_duration)
-    df['prep_time'] = df['prep_time'].apply(parse_iso_duration)
-    df['total_time'] = df['total_time'].apply(parse_iso_duration)
     print("Sample time conversions:")
     print(df[['cook_time', 'prep_time', 'total_time']].head())
 
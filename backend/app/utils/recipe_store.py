@@ -0,0 +1,359 @@
+import os
+import json
+import shutil
+import zlib
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_FILE = "manifest.json"
+# Indexes built from the columns (see save_derived); removed whenever the store is rewritten
+DERIVED_DIR = "derived"
+
+
+class EncodedColumn:
+    """
+    Variable-length column (strings, lists) stored as one UTF-8 JSON buffer
+    plus an offsets array, so it can be memory-mapped like a numeric column.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, positions) -> list:
+        starts, ends = self.offsets[positions], self.offsets[np.asarray(positions) + 1]
+        return [json.loads(self.data[start:end].tobytes()) for start, end in zip(starts.tolist(), ends.tolist())]
+
+    def select(self, mask: np.ndarray) -> "EncodedColumn":
+        """New in-memory column holding only the rows where `mask` is True."""
+        lengths = np.diff(self.offsets)
+        data = np.asarray(self.data[np.repeat(mask, lengths)])
+        offsets = np.zeros(int(mask.sum()) + 1, dtype=np.int64)
+        np.cumsum(lengths[mask], out=offsets[1:])
+        return EncodedColumn(data, offsets)
+
+    def extend(self, values) -> "EncodedColumn":
+        """New in-memory column with `values` appended."""
+        data, offsets = EncodedColumn.encode(values)
+        return EncodedColumn(
+            np.concatenate([np.asarray(self.data), data]),
+            np.concatenate([np.asarray(self.offsets), offsets[1:] + self.offsets[-1]])
+        )
+
+    @staticmethod
+    def encode(values) -> tuple:
+        chunks = [json.dumps(value, default=str).encode("utf-8") for value in values]
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        return np.frombuffer(b"".join(chunks), dtype=np.uint8), offsets
+
+
+def _to_list(values) -> list:
+    return values.tolist() if isinstance(values, np.ndarray) else values
+
+class RecipeStore:
+    """
+    Columnar, read-only view of the recipe metadata.
+
+    Every column is a contiguous NumPy array whose positions line up with the
+    FAISS ids, so a batch of search hits is resolved with one fancy-index take
+    per column instead of a pandas lookup per hit.
+    """
+
+    def __init__(self, ids: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.columns = columns
+        self.id_to_pos = self._build_position_map(self.ids)
+        self.directory = None   # set by `load`; where derived indexes are looked up
+
+    @staticmethod
+    def _build_position_map(ids: np.ndarray) -> np.ndarray:
+        size = int(ids.max()) + 1 if len(ids) else 0
+        id_to_pos = np.full(size, -1, dtype=np.int64)
+        id_to_pos[ids] = np.arange(len(ids), dtype=np.int64)
+        return id_to_pos
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, drop_columns: Iterable[str] = ()) -> "RecipeStore":
+        """
+        Build the store from a cleaned recipe DataFrame, leaving out the
+        given (embedding) columns entirely.
+        """
+        drop_columns = set(drop_columns)
+        columns = {}
+        for col in df.columns:
+            if col == "faiss_index" or col in drop_columns:
+                continue
+            series = df[col]
+            if series.dtype.kind not in "biuf":
+                columns[col] = np.asarray(series.astype(object).to_numpy(), dtype=object)
+            else:
+                columns[col] = np.ascontiguousarray(series.to_numpy())
+        return cls(df["faiss_index"].to_numpy(), columns)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, idx: int) -> bool:
+        return 0 <= idx < len(self.id_to_pos) and self.id_to_pos[idx] >= 0
+
+    def positions(self, ids) -> np.ndarray:
+        """Map FAISS ids to row positions; unknown ids map to -1."""
+        ids = np.asarray(ids, dtype=np.int64)
+        valid = (ids >= 0) & (ids < len(self.id_to_pos))
+        positions = np.full(ids.shape, -1, dtype=np.int64)
+        positions[valid] = self.id_to_pos[ids[valid]]
+        return positions
+
+    def column(self, name: str):
+        """Every value of a column in row order (decoded for variable-length columns), or None if absent."""
+        if name not in self.columns:
+            return None
+        values = self.columns[name]
+        return values if isinstance(values, np.ndarray) else values[np.arange(len(self))]
+
+    def take(self, ids, columns: Optional[List[str]] = None) -> List[Optional[dict]]:
+        """
+        Gather the rows for a batch of FAISS ids.
+        Returns one dict per id (None for ids not present in the store).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        positions = self.positions(ids)
+        found = positions >= 0
+        hit_positions = positions[found]
+
+        names = [c for c in (columns or self.columns) if c in self.columns]
+        gathered = [_to_list(self.columns[name][hit_positions]) for name in names]
+
+        rows = [dict(zip(names, values)) for values in zip(*gathered)] if names else [{} for _ in hit_positions]
+        results: List[Optional[dict]] = [None] * len(ids)
+        for slot, row in zip(np.flatnonzero(found), rows):
+            results[slot] = row
+        return results
+
+    def with_updates(self, rows: "RecipeStore", delete_ids=()) -> "RecipeStore":
+        """
+        Copy-on-write update: a new store without `delete_ids` and with `rows`
+        appended, replacing any existing rows with the same ids. Only this
+        store's columns are kept; missing values are filled like the writer does.
+        """
+        stale = np.union1d(np.asarray(list(delete_ids), dtype=np.int64), rows.ids)
+        keep = ~np.isin(self.ids, stale)
+
+        columns = {}
+        for name, values in self.columns.items():
+            new_values = rows.columns.get(name)
+            if new_values is None:
+                new_values = np.full(len(rows), None, dtype=object)
+
+            if isinstance(values, EncodedColumn):
+                columns[name] = values.select(keep).extend(_to_list(new_values))
+            elif values.dtype.kind in "biuf":
+                numeric = pd.to_numeric(pd.Series(new_values, dtype=object), errors="coerce")
+                if values.dtype.kind != "f":
+                    numeric = numeric.fillna(0)
+                columns[name] = np.concatenate([values[keep], numeric.to_numpy().astype(values.dtype)])
+            else:
+                columns[name] = np.concatenate([values[keep], np.asarray(new_values, dtype=object)])
+
+        return RecipeStore(np.concatenate([self.ids[keep], rows.ids]), columns)
+
+    def save(self, directory: str):
+        """
+        Write the store as raw binary columns plus a JSON manifest.
+        Numeric columns are written as-is; everything else is JSON encoded.
+        The manifest is written last, so a partial write is never loadable.
+        """
+        os.makedirs(directory, exist_ok=True)
+        shutil.rmtree(os.path.join(directory, DERIVED_DIR), ignore_errors=True)
+        manifest = {"num_rows": len(self), "columns": {}}
+
+        self.ids.tofile(os.path.join(directory, "faiss_index.bin"))
+        for name, values in self.columns.items():
+            if isinstance(values, np.ndarray) and values.dtype.kind in "biuf":
+                np.ascontiguousarray(values).tofile(os.path.join(directory, f"{name}.bin"))
+                manifest["columns"][name] = {"kind": "numeric", "dtype": values.dtype.str}
+            else:
+                if isinstance(values, EncodedColumn):
+                    data, offsets = values.data, values.offsets
+                else:
+                    data, offsets = EncodedColumn.encode(values)
+                data.tofile(os.path.join(directory, f"{name}.data.bin"))
+                offsets.tofile(os.path.join(directory, f"{name}.offsets.bin"))
+                manifest["columns"][name] = {"kind": "json"}
+
+        with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "RecipeStore":
+        """
+        Load a store written by `save`. With `mmap=True` the column files are
+        memory-mapped read-only, so workers on the same host share page cache.
+        """
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"Recipe store manifest not found at: {manifest_path}")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+        num_rows = manifest["num_rows"]
+        if num_rows == 0:
+            raise ValueError("Loaded recipe store is empty.")
+
+        def read(file_name, dtype, count):
+            path = os.path.join(directory, file_name)
+            if mmap and count > 0:
+                return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+            return np.fromfile(path, dtype=dtype, count=count)
+
+        columns = {}
+        for name, spec in manifest["columns"].items():
+            if spec["kind"] == "numeric":
+                columns[name] = read(f"{name}.bin", np.dtype(spec["dtype"]), num_rows)
+            else:
+                offsets = read(f"{name}.offsets.bin", np.int64, num_rows + 1)
+                data = read(f"{name}.data.bin", np.uint8, int(offsets[-1]))
+                columns[name] = EncodedColumn(data, offsets)
+
+        store = cls(read("faiss_index.bin", np.int64, num_rows), columns)
+        store.directory = directory
+        return store
+
+
+def _ids_checksum(ids: np.ndarray) -> int:
+    return zlib.crc32(np.ascontiguousarray(ids, dtype=np.int64))
+
+
+def save_derived(directory: str, name: str, ids: np.ndarray, arrays: Dict[str, np.ndarray], meta: dict):
+    """
+    Save arrays computed from the store saved in `directory` (e.g. an
+    attribute index) as .npy files in its DERIVED_DIR, with `meta` written
+    last as `<name>.json`. They are stamped with the store's `ids`, so they
+    are never used for other rows.
+    """
+    derived_dir = os.path.join(directory, DERIVED_DIR)
+    os.makedirs(derived_dir, exist_ok=True)
+    for key, values in arrays.items():
+        np.save(os.path.join(derived_dir, f"{name}.{key}.npy"), np.ascontiguousarray(values))
+    stamp = {"num_rows": len(ids), "ids_checksum": _ids_checksum(ids), "arrays": sorted(arrays)}
+    tmp_path = os.path.join(derived_dir, f"{name}.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({**stamp, "meta": meta}, f)
+    os.replace(tmp_path, os.path.join(derived_dir, f"{name}.json"))
+
+
+def load_derived(store: RecipeStore, name: str) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+    """
+    (meta, memory-mapped arrays) saved by `save_derived` for this store, or
+    None when the store was not loaded from disk or nothing matching was saved.
+    """
+    if store.directory is None:
+        return None
+    derived_dir = os.path.join(store.directory, DERIVED_DIR)
+    try:
+        with open(os.path.join(derived_dir, f"{name}.json")) as f:
+            saved = json.load(f)
+        if saved["num_rows"] != len(store) or saved["ids_checksum"] != _ids_checksum(store.ids):
+            return None
+        arrays = {key: np.load(os.path.join(derived_dir, f"{name}.{key}.npy"), mmap_mode="r")
+                  for key in saved["arrays"]}
+    except (OSError, ValueError, KeyError):
+        return None
+    return saved["meta"], arrays
+
+
+class RecipeStoreWriter:
+    """
+    Appends chunks of recipe rows to an on-disk store in the `RecipeStore.save`
+    layout, so a store can be built without holding the corpus in memory.
+
+    `state()` returns a JSON-serializable checkpoint; passing it back in
+    resumes after an interruption, truncating anything written past it.
+    """
+
+    def __init__(self, directory: str, state: Optional[dict] = None, drop_columns: Iterable[str] = ()):
+        self.directory = directory
+        self.drop_columns = set(drop_columns) | {"faiss_index"}
+        os.makedirs(directory, exist_ok=True)
+
+        if state and state.get("columns"):
+            self.num_rows = state["num_rows"]
+            self.columns = state["columns"]
+            self.data_sizes = state["data_sizes"]
+            self._truncate_to_state()
+        else:
+            self.num_rows = 0
+            self.columns = None
+            self.data_sizes = {}
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _truncate_to_state(self):
+        os.truncate(self._path("faiss_index.bin"), self.num_rows * 8)
+        for name, spec in self.columns.items():
+            if spec["kind"] == "numeric":
+                os.truncate(self._path(f"{name}.bin"), self.num_rows * np.dtype(spec["dtype"]).itemsize)
+            else:
+                os.truncate(self._path(f"{name}.offsets.bin"), (self.num_rows + 1) * 8)
+                os.truncate(self._path(f"{name}.data.bin"), self.data_sizes[name])
+
+    def _init_columns(self, df: pd.DataFrame):
+        """Fix the schema from the first chunk; all-null columns are stored as JSON."""
+        shutil.rmtree(self._path(DERIVED_DIR), ignore_errors=True)
+        self.columns = {}
+        for col in df.columns:
+            if col in self.drop_columns:
+                continue
+            series = df[col]
+            if series.dtype.kind in "biuf" and series.notna().any():
+                self.columns[col] = {"kind": "numeric", "dtype": series.dtype.str}
+            else:
+                self.columns[col] = {"kind": "json"}
+                self.data_sizes[col] = 0
+                np.zeros(1, dtype=np.int64).tofile(self._path(f"{col}.offsets.bin"))
+                open(self._path(f"{col}.data.bin"), "wb").close()
+            if self.columns[col]["kind"] == "numeric":
+                open(self._path(f"{col}.bin"), "wb").close()
+        open(self._path("faiss_index.bin"), "wb").close()
+
+    def append(self, df: pd.DataFrame):
+        """Append a chunk of rows; `df` must carry a `faiss_index` column."""
+        if self.columns is None:
+            self._init_columns(df)
+
+        with open(self._path("faiss_index.bin"), "ab") as f:
+            df["faiss_index"].to_numpy(dtype=np.int64).tofile(f)
+
+        for name, spec in self.columns.items():
+            series = df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index)
+            if spec["kind"] == "numeric":
+                dtype = np.dtype(spec["dtype"])
+                numeric = pd.to_numeric(series, errors="coerce")
+                if dtype.kind != "f":
+                    numeric = numeric.fillna(0)
+                with open(self._path(f"{name}.bin"), "ab") as f:
+                    numeric.to_numpy().astype(dtype).tofile(f)
+            else:
+                data, offsets = EncodedColumn.encode(series.astype(object).tolist())
+                with open(self._path(f"{name}.data.bin"), "ab") as f:
+                    data.tofile(f)
+                with open(self._path(f"{name}.offsets.bin"), "ab") as f:
+                    (offsets[1:] + self.data_sizes[name]).tofile(f)
+                self.data_sizes[name] += len(data)
+
+        self.num_rows += len(df)
+
+    def state(self) -> dict:
+        return {"num_rows": self.num_rows, "columns": self.columns, "data_sizes": self.data_sizes}
+
+    def finalize(self):
+        """Write the manifest, making the store loadable."""
+        manifest = {"num_rows": self.num_rows, "columns": self.columns or {}}
+        with open(self._path(MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
@@ -0,0 +1,182 @@
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from typing import Iterable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are serialized within one process only
+    fcntl = None
+
+from app.utils.helper import to_snake_case
+from app.utils.recipe_preprocessor import clean_recipe_data
+from app.utils.embedder import generate_recipe_embeddings
+from app.utils.faiss_handler import FAISSHandler, save_store_indexes
+from app.utils.recipe_store import RecipeStore
+
+# Writers are serialized; searches never take this lock
+UPDATE_LOCK = threading.Lock()
+
+# flock()ed in faiss_index_dir: exclusive by writers, shared by background reloads
+CORPUS_LOCK_FILE = "corpus.lock"
+
+# Raw CSV fields every upsert batch must carry: clean_recipe_data parses the
+# ingredient parts/instructions and the name is embedded
+REQUIRED_RAW_COLUMNS = ["Name", "RecipeIngredientParts", "RecipeInstructions"]
+
+# Raw columns clean_recipe_data reads besides the required ingredient parts/instructions
+OPTIONAL_RAW_COLUMNS = [
+    "recipe_ingredient_quantities", "keywords", "review_count", "aggregated_rating",
+    "cook_time", "prep_time", "total_time"
+]
+
+# Replaced after every corpus change; workers compare its identity to reload
+CORPUS_VERSION_FILE = "corpus.version"
+
+
+def _existing_faiss_ids(store: RecipeStore, recipe_ids: np.ndarray) -> dict:
+    """Map source RecipeIds already in the store to their faiss_index."""
+    if "recipe_id" not in store.columns or len(recipe_ids) == 0:
+        return {}
+    store_recipe_ids = np.asarray(store.columns["recipe_id"])
+    positions = np.flatnonzero(np.isin(store_recipe_ids, recipe_ids))
+    return dict(zip(store_recipe_ids[positions].tolist(), store.ids[positions].tolist()))
+
+
+def resolve_faiss_ids(store: RecipeStore, recipe_ids: Iterable[int] = (), faiss_indexes: Iterable[int] = ()) -> np.ndarray:
+    """FAISS ids for a mix of source RecipeIds and faiss_index values; unknown ids are dropped."""
+    recipe_ids = np.asarray(list(recipe_ids), dtype=np.int64)
+    ids = list(_existing_faiss_ids(store, recipe_ids).values()) + list(faiss_indexes)
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    return ids[store.positions(ids) >= 0]
+
+
+def prepare_recipe_rows(records: List[dict], store: RecipeStore, config, embedding_model) -> Tuple[pd.DataFrame, dict, int]:
+    """
+    Clean and embed raw recipe records (same fields as the source CSV) and
+    assign their faiss_index: records whose RecipeId is already in the store
+    keep its id, new ones get fresh ids. Returns the rows, their embedding
+    matrices and how many records were rejected by cleaning.
+    """
+    raw = pd.DataFrame(records)
+    raw.columns = [to_snake_case(col) for col in raw.columns]
+    missing = [col for col in REQUIRED_RAW_COLUMNS if to_snake_case(col) not in raw.columns]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    for col in OPTIONAL_RAW_COLUMNS:
+        if col not in raw.columns:
+            raw[col] = None
+
+    df = clean_recipe_data(raw)
+    rejected = len(records) - len(df)
+    if df.empty:
+        return df, {}, rejected
+
+    if "recipe_id" in df.columns:
+        df = df.drop_duplicates("recipe_id", keep="last")
+    df = df.reset_index(drop=True)
+
+    existing = _existing_faiss_ids(store, df["recipe_id"].to_numpy()) if "recipe_id" in df.columns else {}
+    next_id = int(store.ids.max()) + 1 if len(store) else 0
+    faiss_ids = []
+    for recipe_id in (df["recipe_id"].tolist() if "recipe_id" in df.columns else [None] * len(df)):
+        if recipe_id in existing:
+            faiss_ids.append(existing[recipe_id])
+        else:
+            faiss_ids.append(next_id)
+            next_id += 1
+    df["faiss_index"] = np.asarray(faiss_ids, dtype=np.int64)
+
+    embeddings, _ = generate_recipe_embeddings(df, config, embedding_model=embedding_model)
+    return df, embeddings, rejected
+
+
+@contextmanager
+def corpus_lock(config, shared: bool = False):
+    """
+    Cross-process lock on the corpus files. Writers hold it exclusively
+    from refreshing their handler to publishing the new version, so updates
+    sent to different workers apply one after the other; reloads hold it
+    shared, so they never read a half-written corpus. A no-op without fcntl.
+    """
+    if fcntl is None:
+        yield
+        return
+    index_dir = config["paths"]["faiss_index_dir"]
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, CORPUS_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def corpus_write_lock(config):
+    """UPDATE_LOCK for the threads of this process, then the exclusive corpus_lock for other workers."""
+    with UPDATE_LOCK, corpus_lock(config):
+        yield
+
+
+def corpus_version(config):
+    """
+    Identity (inode, mtime) of the corpus version marker, or None if no
+    change was published yet. One stat call, cheap enough for every request.
+    """
+    try:
+        stat = os.stat(os.path.join(config["paths"]["faiss_index_dir"], CORPUS_VERSION_FILE))
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def publish_corpus_version(config):
+    """
+    Replace the version marker once the indexes and store are fully written,
+    so every worker process reloads them. Returns the new version.
+    """
+    path = os.path.join(config["paths"]["faiss_index_dir"], CORPUS_VERSION_FILE)
+    with open(path + ".tmp", "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(path + ".tmp", path)
+    return corpus_version(config)
+
+
+def save_store_atomic(handler: FAISSHandler, store_dir: str):
+    """
+    Write the handler's store and the indexes built over it next to
+    `store_dir` and swap directories. Readers that memory-mapped the old
+    files keep valid mappings after they are unlinked.
+    """
+    tmp_dir, old_dir = store_dir + ".tmp", store_dir + ".old"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    handler.store.save(tmp_dir)
+    save_store_indexes(handler.store, tmp_dir, handler.attributes, handler.ingredients)
+    if os.path.exists(store_dir):
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def apply_recipe_updates(handler: FAISSHandler, upserts: pd.DataFrame = None, embeddings: dict = None,
+                         delete_ids=()) -> FAISSHandler:
+    """
+    Build the updated handler and persist its indexes and recipe store, so a
+    restart loads the same corpus. The caller swaps it into GlobalState.
+    """
+    store_dir = handler.config["paths"].get("recipe_store_dir")
+    if not store_dir:
+        raise ValueError("Incremental updates need paths.recipe_store_dir to persist recipe metadata")
+
+    updated = handler.with_updates(upserts, embeddings, delete_ids)
+    save_store_atomic(updated, store_dir)
+    updated.save_indexes()
+    upserted = 0 if upserts is None else len(upserts)
+    print(f"[INFO] Recipe corpus updated: {upserted} upserted, {len(delete_ids)} deleted, {len(updated.store)} total")
+    return updated
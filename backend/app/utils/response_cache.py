@@ -0,0 +1,272 @@
+import re
+import json
+import asyncio
+import hashlib
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+DEFAULT_RESPONSE_CACHE_CONFIG = {
+    "enabled": True,
+    "max_entries": 2000,
+    "max_mb": 64,                   # LRU-evicted beyond this many MB of cached text and embeddings
+    "ttl_seconds": 86400,           # None = entries never expire
+    "similarity_threshold": 0.95    # reuse an answer for a query this close (cosine); None = exact matches only
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace ("Easy pasta recipe?" == "easy pasta recipe")."""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+def response_cache_keys(query: str, intent: str, addons, recipe_ids: List[int],
+                        history: List[Dict[str, str]]) -> Tuple[str, str]:
+    """
+    (exact key, context key) for a generation. The context key covers
+    everything in the prompt except the query: the intent (which recipe
+    fields are shown), the system-prompt addon set, the retrieved recipe ids
+    in rank order and the earlier turns. Near-duplicate queries are only
+    matched within the same context.
+    """
+    context = json.dumps([intent, sorted(addons), [int(i) for i in recipe_ids], history], sort_keys=True)
+    context_key = hashlib.sha1(context.encode("utf-8")).hexdigest()
+    exact_key = hashlib.sha1(f"{context_key}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+    return exact_key, context_key
+
+
+class InFlightGeneration:
+    """
+    One generation shared by every identical request that arrives while it
+    runs. Events are kept, so a late subscriber replays the tokens it missed
+    before following the live stream; each reader only holds its position
+    in them. The job counts as read up to the furthest position any reader
+    has taken, so its idle timeout and delivered tokens follow the clients,
+    not the cache. Once every request reading it has left before the end,
+    the generation is cancelled. Used from the event loop only.
+    """
+
+    def __init__(self, job=None):
+        self.events: List[Tuple[str, object]] = []
+        self.changed = asyncio.Event()  # set (and replaced) on every publish
+        self.progress: Dict[object, int] = {}   # text chunks taken, per reader still streaming
+        self.finished = False
+        self.readers = 0        # requests sharing it that have not left early
+        self.abandoned = False  # every reader left early; new requests start their own generation
+        self.job = job          # the underlying GenerationJob
+        self.position = job.position if job is not None else 0
+        self.task = None
+
+    def publish(self, kind: str, payload=None):
+        self.events.append((kind, payload))
+        self.finished = kind in ("done", "error")
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def stream(self) -> AsyncIterator[Tuple[str, object]]:
+        """Yield (kind, payload) events, as GenerationJob.stream does."""
+        reader, cursor = object(), 0
+        self.progress[reader] = 0
+        try:
+            while True:
+                while cursor >= len(self.events):
+                    await self.changed.wait()
+                kind, payload = self.events[cursor]
+                cursor += 1
+                if kind == "token":
+                    self.progress[reader] += 1
+                    if self.job is not None:
+                        self.job.mark_read(max(self.progress.values()))
+                yield kind, payload
+                if kind in ("done", "error"):
+                    return
+        finally:
+            del self.progress[reader]
+
+    def leave(self):
+        """A request stopped reading before the end (its client disconnected)."""
+        self.readers -= 1
+        if not self.finished and self.readers <= 0:
+            self.abandoned = True
+            if self.job is not None:
+                self.job.cancel("disconnect")
+
+
+class ResponseCache:
+    """
+    Bounded LRU of finished /chat answers (the streamed text chunks and the
+    final done payload). Lookups match the exact key first, then the most
+    similar cached query embedding in the same context above
+    `similarity_threshold`. Identical requests in flight are coalesced
+    onto one generation (see `coalesce`).
+    """
+
+    def __init__(self, max_entries: int = 2000, max_mb: float = 64, ttl_seconds: Optional[float] = 86400,
+                 similarity_threshold: Optional[float] = 0.95):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.contexts: Dict[str, set] = {}       # context key -> exact keys, for near-duplicate lookups
+        self.in_flight: Dict[str, InFlightGeneration] = {}
+        self.bytes = 0
+        self.epoch = 0                           # bumped by clear(); older in-flight answers are not stored
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry["created"] > self.ttl_seconds
+
+    def _drop(self, key: str):
+        entry = self.entries.pop(key)
+        self.bytes -= entry["bytes"]
+        keys = self.contexts.get(entry["context_key"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.contexts[entry["context_key"]]
+
+    def _nearest(self, context_key: str, embedding: np.ndarray) -> Optional[str]:
+        """Most similar live entry in the context at or above the threshold."""
+        best_key, best_score = None, self.similarity_threshold
+        for key in self.contexts.get(context_key, ()):
+            entry = self.entries[key]
+            if entry["embedding"] is None or self._expired(entry):
+                continue
+            score = float(entry["embedding"] @ embedding)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, key: str, context_key: str, embedding=None) -> Optional[dict]:
+        """The cached answer with a `match` of "exact" or "similar", or None."""
+        unit = _unit(embedding)
+        with self.lock:
+            match = "exact"
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._drop(key)
+                entry = None
+            if entry is None and unit is not None and self.similarity_threshold is not None:
+                match = "similar"
+                nearest = self._nearest(context_key, unit)
+                if nearest is not None:
+                    key, entry = nearest, self.entries[nearest]
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            if match == "exact":
+                self.hits += 1
+            else:
+                self.similar_hits += 1
+            return {"match": match, "chunks": entry["chunks"], "done": entry["done"]}
+
+    def put(self, key: str, context_key: str, embedding, chunks: List[str], done: dict):
+        unit = _unit(embedding)
+        size = sum(len(chunk.encode("utf-8")) for chunk in chunks) + (unit.nbytes if unit is not None else 0) + 512
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = {
+                "context_key": context_key,
+                "embedding": unit,
+                "chunks": list(chunks),
+                "done": done,
+                "bytes": size,
+                "created": time.time()
+            }
+            self.contexts.setdefault(context_key, set()).add(key)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+    def clear(self):
+        """Forget every answer, e.g. after the recipe corpus changed."""
+        with self.lock:
+            self.entries.clear()
+            self.contexts.clear()
+            self.bytes = 0
+            self.epoch += 1
+
+    def coalesce(self, key: str, context_key: str, embedding, start) -> Tuple[InFlightGeneration, bool]:
+        """
+        The in-flight generation for `key`, starting one with `start()` (which
+        returns a GenerationJob) if there is none. Returns it and whether this
+        request joined an existing one. Call from the event loop; `start` may
+        raise (e.g. QueueFullError), in which case nothing is registered. A
+        request that stops reading early must call `flight.leave()`.
+        """
+        flight = self.in_flight.get(key)
+        if flight is not None and not flight.abandoned:
+            with self.lock:
+                self.coalesced += 1
+            flight.readers += 1
+            return flight, True
+
+        job = start()
+        flight = InFlightGeneration(job)
+        flight.readers = 1
+        self.in_flight[key] = flight
+        # Runs until the job ends, even once its subscribers are gone and it was cancelled
+        flight.task = asyncio.get_running_loop().create_task(self._drive(key, context_key, embedding, job, flight))
+        return flight, False
+
+    async def _drive(self, key: str, context_key: str, embedding, job, flight: InFlightGeneration):
+        chunks, epoch = [], self.epoch
+        try:
+            # Not a client: the readers of `flight` mark their own progress on the job
+            async for kind, payload in job.stream(track_reads=False):
+                if kind == "token":
+                    chunks.append(payload)
+                elif kind == "done" and epoch == self.epoch and "stop_reason" not in payload:
+                    self.put(key, context_key, embedding, chunks, payload)
+                flight.publish(kind, payload)
+        except Exception as e:
+            if not flight.finished:
+                flight.publish("error", str(e))
+        finally:
+            if self.in_flight.get(key) is flight:
+                del self.in_flight[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.similar_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0
+            }
+
+
+def _unit(embedding) -> Optional[np.ndarray]:
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+def build_response_cache(config) -> Optional[ResponseCache]:
+    """Create the /chat answer cache from `response_cache` in the config, or None if disabled."""
+    cache_config = {**DEFAULT_RESPONSE_CACHE_CONFIG, **(config.get("response_cache") or {})}
+    if not cache_config["enabled"]:
+        return None
+    return ResponseCache(
+        max_entries=cache_config["max_entries"],
+        max_mb=cache_config["max_mb"],
+        ttl_seconds=cache_config["ttl_seconds"],
+        similarity_threshold=cache_config["similarity_threshold"]
+    )
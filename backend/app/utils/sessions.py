@@ -0,0 +1,285 @@
+import os
+import pickle
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.prompt import DEFAULT_PROMPT_BUDGET, FULL_FIELDS, format_recipe, session_preamble, session_turn
+from app.utils.recipe_navigator import choose_active_recipe
+
+DEFAULT_SESSIONS_CONFIG = {
+    "enabled": True,
+    "max_sessions": 256,           # least recently used sessions are dropped beyond this
+    "idle_ttl_seconds": 1800,      # sessions idle this long are dropped
+    "state_ram_mb": 2048,          # llama.cpp states kept in memory across all sessions
+    "state_dir": None              # spill states past state_ram_mb here, e.g. data/cache/session_states; None = drop them
+}
+
+# Turns about the recipes already under discussion; they reuse the session's
+# last retrieved recipes instead of searching again
+FOLLOW_UP_INTENTS = {"step_navigation", "nutrition_info", "unclear"}
+
+
+class ChatSession:
+    """
+    One server-side conversation. `transcript` is the exact prompt text the
+    model has seen so far (turns are only ever appended), so the llama.cpp
+    state saved after a turn lets the next turn prefill just its own tokens.
+    """
+
+    def __init__(self, session_id: str, system_prompt: str, tokenizer):
+        self.session_id = session_id
+        self.preamble = session_preamble(system_prompt)
+        self.messages: List[Dict[str, str]] = []
+        self.preamble_tokens = tokenizer.count_tokens(self.preamble)
+        self.transcript = self.preamble
+        self.transcript_tokens = self.preamble_tokens
+        self.recipes: List[dict] = []             # last retrieved recipes
+        self.shown_recipes: Dict[int, int] = {}   # faiss_index -> "Recipe N" number in the transcript
+        self.active_recipe: Optional[int] = None  # faiss_index of the recipe being cooked
+        self.step: Optional[int] = None           # its step last shown (1-based)
+        self.state = None                         # llama.cpp state after the last turn, when held in memory
+        self.state_bytes = 0
+        self.state_path = None                    # spilled state file, when not in memory
+        self.busy = False                         # a turn is being generated
+        self.created = self.last_used = time.time()
+
+    def _turn(self, message: str, instructions: str, recipes: List[dict], tokenizer, budget: dict) -> Tuple[str, int, list]:
+        """Transcript segment for a turn, its token count and the faiss indexes of the recipes it adds."""
+        message = tokenizer.truncate_tokens(message, budget["query_tokens"])
+        chunks, added, context_tokens = [], [], 0
+        for recipe in recipes:
+            if recipe["faiss_index"] in self.shown_recipes:
+                continue
+            chunk = format_recipe(recipe, FULL_FIELDS)
+            chunk_tokens = tokenizer.count_tokens(chunk) + 4  # "Recipe N:" header
+            if context_tokens + chunk_tokens > budget["context_tokens"]:
+                break
+            chunks.append(chunk)
+            added.append(recipe["faiss_index"])
+            context_tokens += chunk_tokens
+        segment = session_turn(message, instructions, chunks, first_recipe=len(self.shown_recipes) + 1)
+        return segment, tokenizer.count_tokens(segment), added
+
+    def compact(self, tokenizer, history_tokens: int):
+        """
+        Restart the transcript from the newest messages that fit `history_tokens`.
+        The saved model state no longer matches it, so the next turn is prefilled in full.
+        """
+        kept, used = [], 0
+        for msg in reversed(self.messages):
+            line = f"{msg['role'].capitalize()}: {msg['content']}\n"
+            line_tokens = tokenizer.count_tokens(line)
+            if used + line_tokens > history_tokens:
+                break
+            kept.append(line)
+            used += line_tokens
+        self.transcript = self.preamble + "".join(reversed(kept))
+        self.transcript_tokens = self.preamble_tokens + used
+        self.shown_recipes = {}
+
+    def prepare_turn(self, message: str, intent: str, instructions: str, recipes: List[dict], tokenizer,
+                     budget: dict = None) -> dict:
+        """
+        Prompt for the next turn: the transcript plus the new segment. When
+        that would not fit next to the completion budget, the transcript is
+        compacted first. Returns the prompt, token counts and pending turn data
+        for commit_turn.
+        """
+        budget = {**DEFAULT_PROMPT_BUDGET, **(budget or {})}
+        segment, segment_tokens, added = self._turn(message, instructions, recipes, tokenizer, budget)
+        compacted = self.transcript_tokens + segment_tokens > tokenizer.max_prompt_tokens
+        if compacted:
+            # The compacted transcript no longer shows any recipe, so the segment brings its own
+            self.shown_recipes = {}
+            segment, segment_tokens, added = self._turn(message, instructions, recipes, tokenizer, budget)
+            history_budget = tokenizer.max_prompt_tokens - self.preamble_tokens - segment_tokens
+            self.compact(tokenizer, min(budget["history_tokens"], history_budget))
+
+        return {
+            "prompt": self.transcript + segment,
+            "prompt_tokens": {
+                "transcript": self.transcript_tokens,
+                "new": segment_tokens,
+                "total": self.transcript_tokens + segment_tokens,
+                "prefix": self.preamble_tokens,
+                "compacted": compacted
+            },
+            "message": message,
+            "intent": intent,
+            "recipes": recipes,
+            "added_recipes": added
+        }
+
+    def commit_turn(self, turn: dict, reply: str, tokenizer):
+        """Append a finished turn; `reply` is the raw generated text, as the model state has it."""
+        first = len(self.shown_recipes) + 1
+        self.shown_recipes.update((idx, first + i) for i, idx in enumerate(turn["added_recipes"]))
+        self.transcript = f"{turn['prompt']}{reply}\n"
+        self.transcript_tokens = turn["prompt_tokens"]["total"] + tokenizer.count_tokens(f"{reply}\n")
+        self.messages.append({"role": "user", "content": turn["message"]})
+        self.messages.append({"role": "assistant", "content": reply.strip()})
+        self.recipes = turn["recipes"]
+        active = choose_active_recipe(turn["message"].lower(), turn["intent"], turn["recipes"], self.active_recipe)
+        if active != self.active_recipe:
+            self.active_recipe, self.step = active, None
+
+    def record_exchange(self, message: str, reply: str, tokenizer, step: Optional[int] = None):
+        """
+        Append a turn answered without the LLM (see recipe_navigator). Its text
+        joins the transcript, so the next generated turn still sees it.
+        """
+        text = f"{session_turn(message)} {reply}\n"
+        self.transcript += text
+        self.transcript_tokens += tokenizer.count_tokens(text)
+        self.messages.append({"role": "user", "content": message})
+        self.messages.append({"role": "assistant", "content": reply})
+        self.step = step
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "messages": self.messages,
+            "recipes": [recipe.get("name") for recipe in self.recipes],
+            "active_recipe": self.active_recipe,
+            "step": self.step,
+            "transcript_tokens": self.transcript_tokens,
+            "state": "ram" if self.state is not None else "disk" if self.state_path else "none",
+            "idle_seconds": round(time.time() - self.last_used, 1)
+        }
+
+
+class SessionStore:
+    """
+    Sessions by id with LRU and idle-time eviction. llama.cpp states are
+    kept in memory up to `state_ram_mb` in total; beyond that the least
+    recently used sessions' states are pickled to `state_dir`, or dropped
+    when it is not set (their next turn is then prefilled in full).
+    """
+
+    def __init__(self, max_sessions: int = 256, idle_ttl_seconds: Optional[float] = 1800,
+                 state_ram_mb: float = 2048, state_dir: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.state_ram_bytes = int(state_ram_mb * 1024 * 1024)
+        self.state_dir = state_dir
+        self.sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self.state_bytes = 0
+        self.lock = threading.RLock()
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+
+    def create(self, system_prompt: str, tokenizer) -> ChatSession:
+        session = ChatSession(secrets.token_urlsafe(16), system_prompt, tokenizer)
+        with self.lock:
+            self._evict_idle()
+            self.sessions[session.session_id] = session
+            while len(self.sessions) > self.max_sessions:
+                self._discard(next(iter(self.sessions)))
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self.lock:
+            self._evict_idle()
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        with self.lock:
+            if session_id not in self.sessions:
+                return False
+            self._discard(session_id)
+            return True
+
+    def _evict_idle(self):
+        if self.idle_ttl_seconds is None:
+            return
+        cutoff = time.time() - self.idle_ttl_seconds
+        for session_id, session in list(self.sessions.items()):
+            if session.last_used >= cutoff:
+                break   # ordered by last use
+            if not session.busy:
+                self._discard(session_id)
+
+    def _discard(self, session_id: str):
+        session = self.sessions.pop(session_id)
+        self._release_state(session)
+
+    def _release_state(self, session: ChatSession):
+        self.state_bytes -= session.state_bytes
+        session.state, session.state_bytes = None, 0
+        if session.state_path:
+            try:
+                os.remove(session.state_path)
+            except OSError:
+                pass
+            session.state_path = None
+
+    def load_state(self, session: ChatSession):
+        """The session's saved llama.cpp state from memory or disk, or None."""
+        with self.lock:
+            if session.state is not None or not session.state_path:
+                return session.state
+            path = session.state_path
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def save_state(self, session: ChatSession, state):
+        """Keep the state of a finished turn, spilling or dropping older ones past the memory budget."""
+        size = getattr(state, "llama_state_size", 0) if state is not None else 0
+        with self.lock:
+            self._release_state(session)
+            if state is None or session.session_id not in self.sessions:
+                return
+            session.state, session.state_bytes = state, size
+            self.state_bytes += size
+            for other in list(self.sessions.values()):
+                if self.state_bytes <= self.state_ram_bytes:
+                    break
+                if other.state is not None and other is not session:
+                    self._spill(other)
+            if self.state_bytes > self.state_ram_bytes:
+                self._spill(session)
+
+    def _spill(self, session: ChatSession):
+        state = session.state
+        self.state_bytes -= session.state_bytes
+        session.state, session.state_bytes = None, 0
+        if not self.state_dir:
+            return
+        path = os.path.join(self.state_dir, f"{session.session_id}.state")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        session.state_path = path
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "states_in_memory": sum(session.state is not None for session in self.sessions.values()),
+                "states_on_disk": sum(bool(session.state_path) for session in self.sessions.values()),
+                "state_mb": round(self.state_bytes / 1024 / 1024, 1)
+            }
+
+
+def build_session_store(config) -> Optional[SessionStore]:
+    """Create the session store from `sessions` in the config, or None if disabled."""
+    sessions_config = {**DEFAULT_SESSIONS_CONFIG, **(config.get("sessions") or {})}
+    if not sessions_config["enabled"]:
+        return None
+    return SessionStore(
+        max_sessions=sessions_config["max_sessions"],
+        idle_ttl_seconds=sessions_config["idle_ttl_seconds"],
+        state_ram_mb=sessions_config["state_ram_mb"],
+        state_dir=sessions_config["state_dir"]
+    )
@@ -0,0 +1,86 @@
+"""
+Corpus embedding benchmark: the per-row list-column loop (embed_texts)
+against generate_recipe_embeddings (dedup + length-sorted batches +
+contiguous .npy matrices), reporting texts/sec, rows/sec and on-disk size
+for float32 and float16 storage, and a re-run served from a warm corpus
+embedding store (content-hash cache).
+
+Run from the backend directory with the cleaned pickle in place:
+    python -m benchmarks.bench_embedding_build [rows]
+"""
+import contextlib
+import io
+import pickle
+import sys
+import tempfile
+import time
+import numpy as np
+
+from app.utils.config_loader import load_config
+from app.utils.helper import load_dataframe
+from app.utils.faiss_handler import EMBEDDING_COLUMNS
+from app.utils.embedder import load_embedding_model, generate_recipe_embeddings
+
+
+def embed_texts(texts: list, model, batch_size: int = 32) -> list:
+    """The original corpus embedding: every text in file order, batches of `batch_size`, vectors as lists."""
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        embeddings.extend(model.encode(texts[i:i + batch_size], show_progress_bar=False))
+    return [emb.tolist() for emb in embeddings]
+
+
+def main():
+    config = load_config()
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = load_dataframe(config["paths"]["cleaned_data_pkl"]).head(rows).reset_index(drop=True)
+    model = load_embedding_model(config)
+    batch_size = config["embedding"]["batch_size"]
+
+    # Baseline: every row encoded in file order, vectors kept as Python lists
+    start = time.perf_counter()
+    baseline = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for text_col, embed_col in EMBEDDING_COLUMNS.items():
+            baseline[embed_col] = embed_texts(df[text_col].fillna("").astype(str).tolist(), model, batch_size)
+    baseline_secs = time.perf_counter() - start
+    baseline_bytes = len(pickle.dumps(baseline))
+
+    print(f"{len(df)} rows x {len(EMBEDDING_COLUMNS)} columns")
+    print(f"{'variant':16s} {'seconds':>8s} {'rows/s':>9s} {'MB on disk':>11s} {'max |diff|':>11s}")
+    print(f"{'list columns':16s} {baseline_secs:8.1f} {len(df) * 3 / baseline_secs:9.0f} "
+          f"{baseline_bytes / 1e6:11.1f} {0.0:11.2e}")
+
+    cache_dir = tempfile.TemporaryDirectory()
+    variants = [
+        ("npy float32", "float32", False),
+        ("npy float16", "float16", False),
+        ("npy warm cache", "float32", True),
+    ]
+    for name, dtype, cached in variants:
+        # Cold variants get a fresh store; the warm one re-reads what the float32 run wrote
+        cache_path = f"{cache_dir.name}/{'shared' if cached or dtype == 'float32' else name}.sqlite"
+        run_config = {**config, "embedding": {
+            **config["embedding"], "storage_dtype": dtype, "corpus_cache": {"enabled": True, "path": cache_path}
+        }}
+        with tempfile.TemporaryDirectory() as output_dir:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                embeddings, stats = generate_recipe_embeddings(df, run_config, model, output_dir=output_dir)
+            secs = time.perf_counter() - start
+
+            size = sum(column["bytes"] for column in stats.values())
+            diff = max(
+                float(np.abs(np.asarray(embeddings[col], dtype=np.float32) - np.asarray(baseline[col])).max())
+                for col in embeddings
+            )
+            print(f"{name:16s} {secs:8.1f} {len(df) * 3 / secs:9.0f} {size / 1e6:11.1f} {diff:11.2e}")
+            for col, column in stats.items():
+                print(f"    {col}: {column['unique_texts']} unique of {column['rows']}, "
+                      f"{column['cache_hits']} from cache, {column['texts_per_second']} texts/s")
+            del embeddings
+    cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
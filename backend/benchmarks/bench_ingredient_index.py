@@ -0,0 +1,115 @@
+"""
+Micro-benchmark: coverage ranking with the inverted ingredient index.
+
+Builds IngredientIndex over a synthetic corpus with a Food.com-like skew
+(a few pantry staples in most recipes, a long tail of rare ingredients),
+times loading the copy saved with the store, and compares per-query latency against a vectorized full scan over every
+(recipe, term) pair, checking that both agree on the best coverage.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ingredient_index [rows]
+"""
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from app.utils.recipe_store import RecipeStore
+from app.utils.ingredient_index import IngredientIndex
+
+N_QUERIES = 300
+TOP_K = 50
+
+STAPLES = ["salt", "water", "butter", "sugar", "onion", "garlic", "chicken breast", "rice",
+           "eggs", "olive oil", "black pepper", "flour"]
+
+
+def rare_name(i: int) -> str:
+    name = ""
+    i += 1
+    while i:
+        name += "bcdfghjklmnpqrtvwxz"[i % 19] + "aeiou"[i % 5]
+        i //= 19
+    return name
+
+
+def make_store(n_rows: int):
+    rng = np.random.default_rng(0)
+    rare = [rare_name(i) for i in range(3000)]
+    vocabulary = np.array(rare + STAPLES)
+    weights = np.r_[np.full(len(rare), 0.5 / len(rare)), np.full(len(STAPLES), 0.5 / len(STAPLES))]
+    sizes = rng.integers(3, 14, n_rows)
+    flat = rng.choice(vocabulary, size=sizes.sum(), p=weights)
+    lists = [list(x) for x in np.split(flat, np.cumsum(sizes)[:-1])]
+    df = pd.DataFrame({"faiss_index": np.arange(n_rows), "ingredients_cleaned": lists})
+    return RecipeStore.from_dataframe(df), rare
+
+
+def full_scan(index: IngredientIndex, pair_rows: np.ndarray, pair_terms: np.ndarray, text: str):
+    """Best coverage by testing every (row, term) pair against the query."""
+    query = index.query_terms(text)
+    counts = np.zeros(index.num_rows, dtype=np.int64)
+    for term_ids in query:
+        hits = np.zeros(index.num_rows, dtype=np.int64)
+        for term in term_ids:
+            hits += np.bincount(pair_rows[pair_terms == term], minlength=index.num_rows) > 0
+        counts += hits == len(term_ids)
+    return counts.max() / len(query)
+
+
+def main():
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    print(f"Building synthetic corpus with {n_rows} rows...")
+    store, rare = make_store(n_rows)
+
+    start = time.perf_counter()
+    index = IngredientIndex(store)
+    build_secs = time.perf_counter() - start
+    size = index.postings.nbytes + index.offsets.nbytes + index.bitmaps.nbytes
+    print(f"IngredientIndex build time: {build_secs:.2f} s, {len(index)} terms, "
+          f"{len(index.bitmaps)} as bitmaps, {size / 1e6:.1f} MB")
+    with tempfile.TemporaryDirectory() as store_dir:
+        store.save(store_dir)
+        index.save(store_dir)
+        start = time.perf_counter()
+        IngredientIndex(RecipeStore.load(store_dir))
+        print(f"IngredientIndex load time (saved, memory-mapped): {time.perf_counter() - start:.3f} s")
+
+    # (row, term) pairs for the full-scan baseline
+    values = pd.Series(list(store.column("ingredients_cleaned"))).explode().dropna()
+    term_lists = {v: [t for terms in index.query_terms(v) for t in terms] for v in values.unique()}
+    pairs = values.map(term_lists).explode().dropna()
+    pair_rows = index.store_to_row[pairs.index.to_numpy()]
+    pair_terms = pairs.to_numpy(dtype=np.int64)
+
+    queries = [
+        "I have chicken, rice and garlic",
+        "salt, butter, eggs, sugar, onion",
+        f"{rare[12]}, {rare[400]}, rice",
+        f"{rare[3]} and {rare[7]}",
+    ]
+    allowed = np.arange(0, n_rows, 3)
+    print(f"{'query':36s} {'index ms':>9s} {'filtered ms':>12s} {'full scan ms':>13s} {'coverage':>9s} {'agrees':>7s}")
+    for text in queries:
+        _, coverage = index.search(text, TOP_K)
+        start = time.perf_counter()
+        for _ in range(N_QUERIES):
+            index.search(text, TOP_K)
+        index_ms = (time.perf_counter() - start) / N_QUERIES * 1e3
+
+        start = time.perf_counter()
+        for _ in range(N_QUERIES):
+            index.search(text, TOP_K, allowed_ids=allowed)
+        filtered_ms = (time.perf_counter() - start) / N_QUERIES * 1e3
+
+        start = time.perf_counter()
+        best = full_scan(index, pair_rows, pair_terms, text)
+        scan_ms = (time.perf_counter() - start) * 1e3
+
+        print(f"{text:36s} {index_ms:9.3f} {filtered_ms:12.3f} {scan_ms:13.1f} {coverage[0]:9.2f} "
+              f"{str(bool(np.isclose(coverage[0], best))):>7s}")
+
+
+if __name__ == "__main__":
+    main()
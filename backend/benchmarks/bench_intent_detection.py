@@ -0,0 +1,173 @@
+"""
+Intent classification benchmark and equivalence check: the previous path
+(keyword loops in detect_intent, then generate_intent_instructions
+lowercasing again and running ~20 uncompiled regexes from a dict rebuilt on
+every call) against IntentDetector.detect_intent, which lowercases once and
+searches one precompiled alternation per rule and per addon, with memoized
+instructions.
+
+Both must agree on the retrieval intent and the instructions for every
+query; the script exits with an assertion error otherwise.
+Run from the backend directory (optionally with a file of one query per line):
+    python -m benchmarks.bench_intent_detection [queries.txt]
+"""
+import re
+import sys
+import time
+
+from app.utils.intent_detector import IntentDetector
+from app.utils.prompt import INTENT_ADDONS
+
+ROUNDS = 200
+
+QUERIES = [
+    "Give me a recipe for chicken tikka masala",
+    "How to make banana bread?",
+    "Tell me about shepherd's pie",
+    "I have chicken, rice, garlic",
+    "What can I make with eggs, spinach and feta?",
+    "using potatoes, leeks, cream",
+    "I want to cook a recipe with salmon",
+    "Can you prepare a recipe for a birthday cake",
+    "What's next?",
+    "ok, then what do I do after that",
+    "next step please",
+    "Any vegan dinner ideas?",
+    "gluten free dessert recipes",
+    "something keto for lunch",
+    "is this halal",
+    "how many calories are in this",
+    "high protein breakfast",
+    "what's the nutrition for the lasagna",
+    "low carbs snack ideas",
+    "quick pasta under 20 minutes",
+    "something fast for dinner",
+    "meals that take less than an hour",
+    "top rated cookies",
+    "best chili recipe",
+    "most popular soup recipes",
+    "highest rated vegetarian curry",
+    "tell me more about the second one",
+    "can I use an air fryer instead of the oven",
+    "do I need a stand mixer for this",
+    "what ingredients do I need for pad thai",
+    "show me some easy recipes",
+    "suggest healthy meals for the week",
+    "I have leftovers from thanksgiving, turkey, stuffing",
+    "what can I cook with what I have at home",
+    "how long does it take to bake",
+    "elaborate on the steps",
+    "what's the procedure for tempering chocolate",
+    "dairy-free mac and cheese",
+    "paleo dinner under 30 minutes",
+    "hello",
+    "thanks!",
+    "can you explain more about resting the dough",
+    "recommend a dish with tofu, broccoli",
+    "easy microwave mug cake recipe",
+    "how do I cook rice on the stove",
+    "low fat, high protein lunch with chicken",
+]
+
+# Prompt addon patterns exactly as generate_intent_instructions declared them
+REFERENCE_INTENT_PATTERNS = {
+    "SuggestRecipe": [
+        r"\b(suggest|recommend|idea|give me|show|find|any)\b.*\b(recipes?|dishes?|meals?)\b",
+        r"\b(what can i make|cook|prepare)\b.*\b(with|using)\b.*",
+        r"\b(available ingredients?|leftovers?|at home)\b",
+        r"\b(good|easy|quick|simple|healthy).*\brecipes?\b",
+        r"\b(dinner|lunch|breakfast|snack).*ideas?\b",
+    ],
+    "IngredientQuery": [
+        r"\b(ingredients?|need(ed)?|require|contain|consist of)\b",
+        r"\b(do i need|what do i need|is it made of)\b.*",
+    ],
+    "InstructionsOnly": [
+        r"\b(how to|steps to|prepare|make|cook|method|instruction(s)?)\b.*",
+        r"\bprocedure\b",
+    ],
+    "NutritionInfo": [
+        r"\b(calories|nutritional|health(y)?|macro|carbs|protein)\b",
+    ],
+    "CookingTimeFilter": [
+        r"\b(time|required|cook(ing)? time|under \d{1,3} (mins?|minutes?))\b",
+        r"\bquick|fast|30 min\b",
+    ],
+    "DietaryPreferences": [
+        r"\b(vegetarian|vegan|gluten[- ]?free|dairy[- ]?free|low carb|low fat|keto|paleo)\b",
+    ],
+    "ExpandRecipe": [
+        r"\b(more details|elaborate|explain more|show full|tell me more)\b",
+    ],
+    "ToolOrMethodQuery": [
+        r"\b(do i need|how to use|can i use|tool(s)?|equipment|machine|oven|grill|stove|microwave)\b",
+    ],
+}
+
+
+def reference_detect_intent(detector: IntentDetector, user_input: str) -> str:
+    """The keyword-loop detect_intent this module replaced (without its print)."""
+    user_input = user_input.lower()
+    if re.search(r"(recipe for|how to make|tell me about)\s+[a-z ]+", user_input):
+        return "specific_recipe"
+    if any(keyword in user_input for keyword in detector.ingredient_keywords) and ',' in user_input:
+        return "ingredient_search"
+    if any(kw in user_input for kw in detector.recipe_keywords) and "recipe" in user_input:
+        return "recipe_generation"
+    for intent, keywords in [
+        ("step_navigation", detector.step_keywords),
+        ("diet_filter", detector.diet_keywords),
+        ("nutrition_info", detector.nutrition_keywords),
+        ("time_filter", detector.time_keywords),
+        ("rating_filter", detector.rating_keywords),
+    ]:
+        if any(kw in user_input for kw in keywords):
+            return intent
+    return "unclear"
+
+
+def reference_intent_instructions(user_message: str) -> str:
+    """The previous generate_intent_instructions: dicts rebuilt and regexes looked up per call."""
+    intent_patterns = {intent: list(patterns) for intent, patterns in REFERENCE_INTENT_PATTERNS.items()}
+    intent_addons = dict(INTENT_ADDONS)
+    user_message = user_message.lower()
+    matched_intents = []
+    for intent, patterns in intent_patterns.items():
+        if any(re.search(pattern, user_message) for pattern in patterns):
+            matched_intents.append(intent)
+    return "".join(intent_addons.get(intent, "") for intent in matched_intents)
+
+
+def main():
+    queries = QUERIES
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    detector = IntentDetector()
+
+    for query in queries:
+        result = detector.detect_intent(query)
+        expected = (reference_detect_intent(detector, query), reference_intent_instructions(query))
+        assert (result["intent"], result["instructions"]) == expected, f"Mismatch for {query!r}"
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in queries:
+            reference_detect_intent(detector, query)
+            reference_intent_instructions(query)
+    reference_us = (time.perf_counter() - start) / (ROUNDS * len(queries)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in queries:
+            detector.detect_intent(query)
+    precompiled_us = (time.perf_counter() - start) / (ROUNDS * len(queries)) * 1e6
+
+    print(f"{len(queries)} queries, identical intents and instructions")
+    print(f"previous two-pass path : {reference_us:8.1f} us/query")
+    print(f"precompiled classifier : {precompiled_us:8.1f} us/query")
+    print(f"speed-up               : {reference_us / precompiled_us:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Embedding intent router benchmark: routes the bench_intent_detection query
+set by nearest prototype centroid and compares it with the keyword rules,
+reporting per-query routing cost (the query embedding is computed for
+retrieval anyway, so only the matrix-vector product is counted), the share
+of queries that fall back to the keywords, and where the two disagree.
+
+Run from the backend directory (optionally with a file of one query per line):
+    python -m benchmarks.bench_intent_router [queries.txt]
+"""
+import sys
+import tempfile
+import time
+
+from app.utils.config_loader import load_config
+from app.utils.embedder import load_embedding_model
+from app.utils.intent_detector import IntentDetector
+from app.utils.intent_router import build_intent_router
+from benchmarks.bench_intent_detection import QUERIES
+
+ROUNDS = 200
+
+
+def main():
+    queries = QUERIES
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    config = load_config()
+    model = load_embedding_model(config)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        router_config = {**(config.get("intent_router") or {}), "cache_path": f"{cache_dir}/centroids.npz"}
+        start = time.perf_counter()
+        router = build_intent_router({**config, "intent_router": router_config}, model)
+        cold_secs = time.perf_counter() - start
+        start = time.perf_counter()
+        build_intent_router({**config, "intent_router": router_config}, model)
+        warm_secs = time.perf_counter() - start
+
+    detector = IntentDetector()
+    embeddings = model.encode(queries, show_progress_bar=False, convert_to_numpy=True)
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for embedding in embeddings:
+            router.route(embedding)
+    route_us = (time.perf_counter() - start) / (ROUNDS * len(queries)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in queries:
+            detector._retrieval_intent(query.lower())
+    keyword_us = (time.perf_counter() - start) / (ROUNDS * len(queries)) * 1e6
+
+    print(f"{'query':48s} {'keywords':18s} {'router':18s} {'score':>6s}")
+    fallbacks = disagreements = 0
+    for query, embedding in zip(queries, embeddings):
+        keyword_intent = detector._retrieval_intent(query.lower())
+        scores = router.centroids @ (embedding / max(float((embedding ** 2).sum()) ** 0.5, 1e-12))
+        routed = router.route(embedding)
+        fallbacks += routed is None
+        routed_intent = routed["intent"] if routed else f"({router.intents[scores.argmax()]})"
+        disagreements += routed is not None and routed["intent"] != keyword_intent
+        print(f"{query[:48]:48s} {keyword_intent:18s} {routed_intent:18s} {scores.max():6.2f}")
+
+    print(f"\ncentroids: {len(router.intents)} intents, built in {cold_secs:.2f} s, loaded from cache in {warm_secs * 1e3:.1f} ms")
+    print(f"router     : {route_us:6.1f} us/query")
+    print(f"keywords   : {keyword_us:6.1f} us/query")
+    print(f"fallbacks  : {fallbacks}/{len(queries)}  (router below threshold/margin; shown in parentheses)")
+    print(f"disagree   : {disagreements}/{len(queries) - fallbacks} routed queries differ from the keyword rules")
+
+
+if __name__ == "__main__":
+    main()
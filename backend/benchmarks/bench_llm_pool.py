@@ -0,0 +1,67 @@
+"""
+LLM pool benchmark: aggregate completion tokens/sec and p95 time-to-first-token
+as the number of concurrent requests and the pool size grow. Requests that
+produced no tokens (empty completion or error) are left out of the TTFT
+percentile and counted separately.
+
+Every pool splits the cores evenly between its runners (see llm.n_threads).
+Run from the backend directory with the GGUF model in place:
+    python -m benchmarks.bench_llm_pool
+"""
+import asyncio
+import time
+import numpy as np
+
+from app.utils.config_loader import load_config
+from app.utils.llm_model import LLMRunner, default_thread_count
+from app.utils.llm_worker import LLMWorkerPool
+
+POOL_SIZES = [1, 2, 4]
+CONCURRENCY_LEVELS = [1, 4, 8]
+
+PROMPT = (
+    "You are a helpful, friendly AI cooking assistant.\n"
+    "The user asked: Suggest a quick weeknight pasta recipe with garlic and spinach.\n"
+    "Assistant:"
+)
+
+
+async def run_load(pool: LLMWorkerPool, concurrency: int):
+    tokenizer = pool.runners[0].model
+
+    async def one_request():
+        job = pool.submit(PROMPT)
+        text = ""
+        async for kind, payload in job.stream():
+            if kind == "token":
+                text += payload
+        # Empty completions and errors never produce a first token
+        ttft = job.first_token_at - job.submitted_at if job.first_token_at is not None else None
+        return ttft, len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one_request() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ttfts = np.array([ttft for ttft, _ in results if ttft is not None]) * 1000
+    total_tokens = sum(tokens for _, tokens in results)
+    p95_ttft = np.percentile(ttfts, 95) if len(ttfts) else float("nan")
+    return total_tokens / elapsed, p95_ttft, len(results) - len(ttfts)
+
+
+def main():
+    config = load_config()
+    print(f"{'pool':>4s} {'threads':>7s} {'clients':>7s} {'tok/s':>8s} {'p95 TTFT ms':>12s} {'no tokens':>9s}")
+    for pool_size in POOL_SIZES:
+        n_threads = default_thread_count(pool_size)
+        runners = [LLMRunner(config, n_threads=n_threads) for _ in range(pool_size)]
+        pool = LLMWorkerPool(runners, max_queue_size=max(CONCURRENCY_LEVELS))
+        for concurrency in CONCURRENCY_LEVELS:
+            tokens_per_sec, p95_ttft, empty = asyncio.run(run_load(pool, concurrency))
+            print(f"{pool_size:4d} {n_threads:7d} {concurrency:7d} {tokens_per_sec:8.1f} {p95_ttft:12.0f} {empty:9d}")
+        pool.close()
+        del pool, runners
+
+
+if __name__ == "__main__":
+    main()
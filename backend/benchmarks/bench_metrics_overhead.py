@@ -0,0 +1,50 @@
+"""
+Micro-benchmark: cost of the always-on instrumentation, i.e. one `timed()`
+stage (two perf_counter calls, a histogram observation and the request
+trace update) and a bare histogram observation, against an empty block.
+
+Run from the backend directory:
+    python -m benchmarks.bench_metrics_overhead
+"""
+import time
+
+from app.utils.metrics import METRICS, STAGE_SECONDS, request_trace, timed
+
+N_CALLS = 200_000
+
+
+def per_call_ns(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(N_CALLS):
+        fn()
+    return (time.perf_counter() - start) / N_CALLS * 1e9
+
+
+def main():
+    def empty():
+        pass
+
+    def stage():
+        with timed("bench"):
+            pass
+
+    def traced_stage():
+        with request_trace():
+            with timed("bench"):
+                pass
+
+    baseline = per_call_ns(empty)
+    rows = [
+        ("histogram observe", per_call_ns(lambda: STAGE_SECONDS.observe(0.001, "bench")) - baseline),
+        ("timed() stage", per_call_ns(stage) - baseline),
+        ("timed() + request trace", per_call_ns(traced_stage) - baseline),
+    ]
+    METRICS.enabled = False
+    rows.append(("timed() with metrics disabled", per_call_ns(stage) - baseline))
+
+    for name, ns in rows:
+        print(f"{name:32s} {ns:8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
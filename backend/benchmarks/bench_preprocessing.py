@@ -0,0 +1,84 @@
+"""
+Preprocessing benchmark and equivalence check: the original row-wise
+`.apply` cleaning against the vectorized clean_recipe_data, serial and
+sharded across a process pool.
+
+Every variant must produce a frame identical to the row-wise reference;
+the script exits with an assertion error otherwise. The same equivalence is
+checked on small synthetic rows by tests/test_recipe_preprocessor.py.
+Run from the backend directory with the raw CSV in place:
+    python -m benchmarks.bench_preprocessing [max_rows]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import pandas as pd
+
+from app.utils.config_loader import load_config
+from app.utils.helper import (
+    to_snake_case,
+    parse_r_list_string,
+    clean_string_list,
+    combine_ingredients_with_quantities,
+    parse_iso_duration
+)
+from app.utils.recipe_preprocessor import load_recipe_data, clean_recipe_data
+
+
+def reference_clean_recipe_data(df: pd.DataFrame) -> pd.DataFrame:
+    """The serial, row-wise cleaning this module replaced (without its debug prints)."""
+    df.columns = [to_snake_case(col) for col in df.columns]
+    df.drop_duplicates(inplace=True)
+    df.dropna(subset=['recipe_ingredient_parts', 'recipe_instructions'], inplace=True)
+    df['recipe_ingredient_quantities'] = df['recipe_ingredient_quantities'].fillna('[]')
+    df['ingredients_raw'] = df['recipe_ingredient_parts'].apply(parse_r_list_string)
+    df['ingredients_cleaned'] = df['ingredients_raw'].apply(clean_string_list)
+    df['ingredients_with_quantities'] = df.apply(
+        lambda row: combine_ingredients_with_quantities(
+            row['recipe_ingredient_quantities'], row['ingredients_raw']
+        ),
+        axis=1
+    )
+    df['recipe_instructions'] = df['recipe_instructions'].apply(parse_r_list_string)
+    df['keywords'] = df['keywords'].apply(parse_r_list_string)
+    if 'date_published' in df.columns:
+        df['date_published'] = pd.to_datetime(df['date_published'], errors='coerce')
+    df['review_count'] = df['review_count'].fillna(0).astype(int)
+    df['aggregated_rating'] = df['aggregated_rating'].fillna(0.0).astype(float)
+    df['cook_time'] = df['cook_time'].apply(parse_iso_duration)
+    df['prep_time'] = df['prep_time'].apply(parse_iso_duration)
+    df['total_time'] = df['total_time'].apply(parse_iso_duration)
+    return df
+
+
+def timed(clean, raw: pd.DataFrame):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = clean(raw.copy())
+    return cleaned, time.perf_counter() - start
+
+
+def main():
+    config = load_config()
+    raw = load_recipe_data(config["paths"]["recipe_data"])
+    if len(sys.argv) > 1:
+        raw = raw.head(int(sys.argv[1]))
+
+    reference, reference_secs = timed(reference_clean_recipe_data, raw)
+    print(f"{len(raw)} raw rows -> {len(reference)} cleaned rows")
+    print(f"{'variant':12s} {'seconds':>8s} {'speedup':>8s}")
+    print(f"{'row-wise':12s} {reference_secs:8.2f} {1.0:8.1f}")
+
+    variants = {"vectorized": 1, "parallel": os.cpu_count() or 1}
+    for name, workers in variants.items():
+        cleaned, secs = timed(lambda df: clean_recipe_data(df, workers=workers), raw)
+        pd.testing.assert_frame_equal(cleaned, reference)
+        print(f"{name:12s} {secs:8.2f} {reference_secs / secs:8.1f}")
+
+    print("All variants match the row-wise output.")
+
+
+if __name__ == "__main__":
+    main()
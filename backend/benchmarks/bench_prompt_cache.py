@@ -0,0 +1,79 @@
+"""
+Prompt-cache benchmark: time-to-first-token per turn of multi-turn
+conversations, with llama.cpp re-evaluating the whole prompt every time
+versus reusing cached KV state for the longest matching token prefix.
+
+Two conversations are interleaved, as on a shared server, so the live
+context of the runner never matches the next prompt on its own.
+Run from the backend directory with the GGUF model in place:
+    python -m benchmarks.bench_prompt_cache
+"""
+import time
+import numpy as np
+
+from app.utils.config_loader import load_config
+from app.utils.llm_model import LLMRunner, SharedRAMCache
+from app.utils.prompt import construct_prompt, generate_intent_instructions, BASE_SYSTEM_PROMPT
+
+CONVERSATIONS = [
+    [
+        "What can I make with chicken, rice and garlic?",
+        "Tell me more about the first one",
+        "How long does it take?",
+        "Can I make it vegetarian?",
+    ],
+    [
+        "Suggest a quick vegan dinner",
+        "What ingredients do I need for the curry?",
+        "What's the next step after frying the onions?",
+        "How many calories is that?",
+    ],
+]
+
+CONTEXT = [{"name": "Garlic Chicken Rice", "ingredients_with_quantities": ["1 lb chicken", "2 cups rice", "4 cloves garlic"],
+            "recipe_instructions": ["Cook rice.", "Brown chicken with garlic.", "Combine and serve."],
+            "calories": 540.0, "total_time": "00:45"}]
+
+
+def run(runner: LLMRunner, reset_each_turn: bool):
+    histories = [[] for _ in CONVERSATIONS]
+    ttfts = {turn: [] for turn in range(len(CONVERSATIONS[0]))}
+
+    for turn in range(len(CONVERSATIONS[0])):
+        for conversation, history in zip(CONVERSATIONS, histories):
+            message = conversation[turn]
+            history.append({"role": "user", "content": message})
+            prompt = construct_prompt(
+                system_prompt=BASE_SYSTEM_PROMPT.strip(),
+                retrieved_chunks=CONTEXT,
+                chat_history=history,
+                latest_user_message=message,
+                instructions=generate_intent_instructions(message)
+            )
+            if reset_each_turn:
+                runner.model.reset()
+
+            start = time.perf_counter()
+            first_token_at = None
+            answer = ""
+            for token in runner.stream_response(prompt):
+                first_token_at = first_token_at or time.perf_counter()
+                answer += token
+            ttfts[turn].append((first_token_at - start) * 1000)
+            history.append({"role": "assistant", "content": answer})
+
+    return {turn: np.mean(values) for turn, values in ttfts.items()}
+
+
+def main():
+    config = load_config()
+    baseline = run(LLMRunner(config), reset_each_turn=True)
+    cached = run(LLMRunner(config, prompt_cache=SharedRAMCache(4 * 1024 ** 3)), reset_each_turn=True)
+
+    print(f"{'turn':>4s} {'no cache ms':>12s} {'prefix cache ms':>16s}")
+    for turn in baseline:
+        print(f"{turn + 1:4d} {baseline[turn]:12.0f} {cached[turn]:16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Prompt-lookup decoding benchmark: decode tokens/sec on recipe-expansion
+prompts (full recipes in the context, the user asking for all ingredients
+and steps) with plain decoding versus llm.prompt_lookup drafting, plus a
+check that the greedy output is unchanged.
+
+Both runners decode greedily (temperature 0), so verified drafting must
+give the same text; a mismatch is reported per prompt (batched and single
+token evaluation can round differently, so a rare late divergence is
+possible but should not be common).
+Run from the backend directory with the GGUF model and recipe store in place:
+    python -m benchmarks.bench_prompt_lookup [num_prompts] [num_pred_tokens]
+"""
+import sys
+import time
+
+from app.core.startup import load_recipe_store
+from app.utils.config_loader import load_config
+from app.utils.llm_model import LLMRunner, STOP_SEQUENCES, get_llm_config
+from app.utils.prompt import assemble_prompt, match_prompt_addons, instructions_for, BASE_SYSTEM_PROMPT
+
+MESSAGE = "Show me the full recipe for {name}, with every ingredient and all the steps."
+
+
+def expansion_prompts(config, runner: LLMRunner, count: int) -> list:
+    """Prompts for the first `count` recipes that have ingredients and instructions."""
+    store = load_recipe_store(config)
+    prompts = []
+    for faiss_index in store.ids[:count * 4].tolist():
+        recipe = store.take([faiss_index])[0]
+        if recipe is None or not len(recipe.get("recipe_instructions") or []) or not len(recipe.get("ingredients_with_quantities") or []):
+            continue
+        message = MESSAGE.format(name=recipe["name"])
+        prompt, _ = assemble_prompt(
+            system_prompt=BASE_SYSTEM_PROMPT.strip(),
+            instructions=instructions_for(match_prompt_addons(message.lower())),
+            retrieved_recipes=[recipe],
+            chat_history=[],
+            latest_user_message=message,
+            intent="specific_recipe",
+            tokenizer=runner,
+            budget=config.get("prompt")
+        )
+        prompts.append((recipe["name"], prompt))
+        if len(prompts) == count:
+            break
+    return prompts
+
+
+def greedy_decode(runner: LLMRunner, prompt: str):
+    """(text, completion tokens, decode tokens/sec) for one greedy generation from a fresh context."""
+    runner.model.reset()
+    pieces, first, last = [], None, None
+    for chunk in runner.model(prompt=runner.truncate_prompt(prompt), max_tokens=runner.max_tokens, temperature=0.0, stream=True,
+                              stop=STOP_SEQUENCES):
+        last = time.perf_counter()
+        first = first or last
+        pieces.append(chunk["choices"][0]["text"])
+    tokens = len(pieces)
+    return "".join(pieces), tokens, (tokens - 1) / (last - first) if tokens > 1 and last > first else 0.0
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    config = load_config()
+    lookup = {**get_llm_config(config)["prompt_lookup"], "enabled": True}
+    if len(sys.argv) > 2:
+        lookup["num_pred_tokens"] = int(sys.argv[2])
+    lookup_config = {**config, "llm": {**(config.get("llm") or {}), "prompt_lookup": lookup}}
+
+    baseline = LLMRunner({**config, "llm": {**(config.get("llm") or {}), "prompt_lookup": {"enabled": False}}})
+    drafted = LLMRunner(lookup_config)
+    prompts = expansion_prompts(config, baseline, count)
+
+    print(f"prompt-lookup: num_pred_tokens={lookup['num_pred_tokens']}, max_ngram_size={lookup['max_ngram_size']}")
+    print(f"{'recipe':32s} {'tokens':>6s} {'plain tok/s':>11s} {'lookup tok/s':>12s} {'speed-up':>8s} {'same':>5s}")
+    plain_total = drafted_total = 0.0
+    identical = 0
+    for name, prompt in prompts:
+        plain_text, tokens, plain_rate = greedy_decode(baseline, prompt)
+        drafted_text, _, drafted_rate = greedy_decode(drafted, prompt)
+        same = plain_text == drafted_text
+        identical += same
+        plain_total += plain_rate
+        drafted_total += drafted_rate
+        print(f"{name[:32]:32s} {tokens:6d} {plain_rate:11.1f} {drafted_rate:12.1f} "
+              f"{drafted_rate / max(plain_rate, 1e-9):7.2f}x {'yes' if same else 'NO':>5s}")
+
+    if prompts:
+        print(f"\nmean decode tok/s: {plain_total / len(prompts):.1f} plain, {drafted_total / len(prompts):.1f} with prompt lookup")
+        print(f"identical output : {identical}/{len(prompts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Startup benchmark: load time and summed memory of N worker processes for
+the baseline startup and the current memory-mapped one.
+
+Both fixtures are built from the first `rows` rows of the cleaned pickle:
+- baseline: the pickle in its original format, with the three embedding
+  columns as per-row lists of floats, and IndexFlatL2 files. Each worker
+  loads the whole DataFrame, keeps the `set_index("faiss_index")` copy the
+  old FAISSHandler made and reads every index into memory.
+- mmap: the recipe store with its saved attribute and ingredient
+  indexes, and id-mapped indexes of the configured type. Each worker
+  memory-maps them (faiss.mmap forced on) and builds FAISSHandler.
+The embedding values are random; only their sizes matter here.
+
+All N workers of a mode are alive together when memory is read, as under
+`uvicorn --workers N`. Memory is the summed PSS from
+/proc/<pid>/smaps_rollup (Linux), so pages shared through the page cache
+count once overall. An "imports only" row gives the interpreter and library
+floor. Run from the backend directory after preparing data:
+    python -m benchmarks.bench_startup [workers] [rows]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import faiss
+
+from app.utils.config_loader import load_config
+from app.utils.faiss_handler import EMBEDDING_COLUMNS, MMAP_IO_FLAGS, build_recipe_faiss_indexes, save_store_indexes
+from app.utils.recipe_store import RecipeStore
+
+LOADERS = {
+    "imports only": "",
+    "baseline (pickle + lists + read_index)": """
+df = pd.read_pickle(os.path.join(fixture, "legacy.pkl"))
+indexed = df.set_index("faiss_index")
+indexes = [faiss.read_index(os.path.join(fixture, "legacy_indexes", f"{col}.index"))
+           for col in EMBEDDING_COLUMNS.values()]
+""",
+    "mmap (recipe store + IO_FLAG_MMAP)": """
+config["paths"]["faiss_index_dir"] = os.path.join(fixture, "indexes")
+config["faiss"] = {**(config.get("faiss") or {}), "mmap": True}
+handler = FAISSHandler(config, RecipeStore.load(os.path.join(fixture, "store"), mmap=True))
+""",
+}
+
+WORKER = """
+import os, sys, json, time
+import pandas as pd, faiss
+from app.utils.config_loader import load_config
+from app.utils.faiss_handler import FAISSHandler, EMBEDDING_COLUMNS
+from app.utils.recipe_store import RecipeStore
+
+config, fixture = load_config(), sys.argv[1]
+start = time.perf_counter()
+{loader}
+print(json.dumps({{"seconds": time.perf_counter() - start}}), flush=True)
+sys.stdin.readline()
+"""
+
+
+def memory_mb(pid: int) -> dict:
+    """PSS and RSS of a process in MB, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Pss", "Rss"):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+
+def build_fixtures(config, rows: int, fixture: str) -> tuple:
+    """Write the baseline-format pickle and flat indexes, and the current store and indexes, for `rows` rows."""
+    df = pd.read_pickle(config["paths"]["cleaned_data_pkl"]).head(rows).reset_index(drop=True)
+    df = df.drop(columns=list(EMBEDDING_COLUMNS.values()), errors="ignore")
+    df["faiss_index"] = df.index
+
+    first_index = os.path.join(config["paths"]["faiss_index_dir"], f"{next(iter(EMBEDDING_COLUMNS.values()))}.index")
+    dim = faiss.read_index(first_index, MMAP_IO_FLAGS).d
+    rng = np.random.default_rng(0)
+    embeddings = {col: rng.random((len(df), dim), dtype=np.float32) for col in EMBEDDING_COLUMNS.values()}
+
+    # Baseline: vectors as list columns in the pickle, positional IndexFlatL2 files
+    legacy_dir = os.path.join(fixture, "legacy_indexes")
+    os.makedirs(legacy_dir)
+    legacy = df.copy()
+    for col, matrix in embeddings.items():
+        legacy[col] = [row.tolist() for row in matrix]
+        index = faiss.IndexFlatL2(dim)
+        index.add(matrix)
+        faiss.write_index(index, os.path.join(legacy_dir, f"{col}.index"))
+    legacy.to_pickle(os.path.join(fixture, "legacy.pkl"))
+    del legacy
+
+    # Current: recipe store plus indexes of the configured type
+    index_config = {
+        **config,
+        "paths": {**config["paths"], "faiss_index_dir": os.path.join(fixture, "indexes")},
+        "faiss": {**(config.get("faiss") or {}), "recall_report": False},
+    }
+    build_recipe_faiss_indexes(df, embeddings, index_config)
+    store = RecipeStore.from_dataframe(df)
+    store.save(os.path.join(fixture, "store"))
+    save_store_indexes(store, os.path.join(fixture, "store"))
+    return len(df), dim
+
+
+def run_workers(loader: str, fixture: str, workers: int) -> dict:
+    """Start `workers` processes, wait until all have loaded, then read their memory together."""
+    script = WORKER.format(loader=loader)
+    procs = [
+        subprocess.Popen([sys.executable, "-c", script, fixture],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        seconds = [json.loads(proc.stdout.readline())["seconds"] for proc in procs]
+        memory = [memory_mb(proc.pid) for proc in procs]
+    finally:
+        for proc in procs:
+            proc.stdin.close()
+            proc.wait()
+    return {
+        "seconds": max(seconds),
+        "pss_mb": sum(m["pss"] for m in memory),
+        "rss_mb": sum(m["rss"] for m in memory),
+    }
+
+
+def main():
+    config = load_config()
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with tempfile.TemporaryDirectory() as fixture:
+        start = time.perf_counter()
+        rows, dim = build_fixtures(config, rows, fixture)
+        print(f"{rows} rows, dim {dim}, fixtures built in {time.perf_counter() - start:.1f} s; {workers} workers")
+        print(f"{'mode':40s} {'load s (max)':>12s} {'PSS MB (sum)':>13s} {'RSS MB (sum)':>13s}")
+        for name, loader in LOADERS.items():
+            result = run_workers(loader, fixture, workers)
+            print(f"{name:40s} {result['seconds']:12.2f} {result['pss_mb']:13.1f} {result['rss_mb']:13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Load test: query embedding latency and throughput with and without the
+micro-batching EmbeddingBatcher, at 1, 8 and 32 concurrent clients.
+
+Clients are threads, like the FastAPI threadpool serving sync handlers.
+Run from the backend directory:
+    python -m benchmarks.load_test_embedding
+"""
+import threading
+import time
+import numpy as np
+
+from app.utils.config_loader import load_config
+from app.utils.embedder import load_embedding_model, embed_text
+from app.utils.embedding_batcher import EmbeddingBatcher
+
+CONCURRENCY_LEVELS = [1, 8, 32]
+REQUESTS_PER_CLIENT = 50
+
+QUERIES = [
+    "quick chicken dinner", "what can I make with eggs, flour and milk",
+    "vegan curry recipe", "how to make lasagna", "gluten free dessert ideas",
+    "high protein breakfast", "easy pasta recipe", "recipe for banana bread",
+]
+
+
+def run_clients(embed, concurrency: int):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(client_id: int):
+        local = []
+        for i in range(REQUESTS_PER_CLIENT):
+            # Unique text per request so nothing is served from a cache
+            text = f"{QUERIES[i % len(QUERIES)]} #{client_id}-{i}"
+            start = time.perf_counter()
+            embed(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return np.percentile(latencies_ms, 50), np.percentile(latencies_ms, 99), len(latencies) / elapsed
+
+
+def main():
+    config = load_config()
+    model = load_embedding_model(config)
+    batching = config["embedding"].get("batching") or {}
+    batcher = EmbeddingBatcher(
+        model,
+        max_batch_size=batching.get("max_batch_size", 32),
+        max_wait_ms=batching.get("max_wait_ms", 2.0)
+    )
+
+    modes = {
+        "direct": lambda text: embed_text(text, model),
+        "batched": lambda text: embed_text(text, model, batcher=batcher),
+    }
+
+    embed_text("warm up", model)
+    print(f"{'mode':8s} {'clients':>7s} {'p50 ms':>9s} {'p99 ms':>9s} {'req/s':>9s}")
+    for concurrency in CONCURRENCY_LEVELS:
+        for name, embed in modes.items():
+            p50, p99, throughput = run_clients(embed, concurrency)
+            print(f"{name:8s} {concurrency:7d} {p50:9.1f} {p99:9.1f} {throughput:9.1f}")
+
+    print(f"batcher: {batcher.texts} texts in {batcher.batches} batches")
+    batcher.close()
+
+
+if __name__ == "__main__":
+    main()
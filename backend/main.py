@@ -1,9 +1,11 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.core.startup import init_dependencies
+from app.core.startup import init_dependencies, refresh_faiss_handler_in_background
 from app.api.data_preparation import router as data_router 
 from app.api.chat import router as chat_router
+from app.api.sessions import router as sessions_router
+from app.api.metrics import router as metrics_router
 
 origins = [
     "http://localhost:3000",        
@@ -25,8 +27,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(chat_router, prefix="/chat")
+async def pick_up_corpus_changes():
+    """Reload the recipe corpus in the background if another worker changed it; one stat call otherwise."""
+    refresh_faiss_handler_in_background()
+
+app.include_router(chat_router, prefix="/chat", dependencies=[Depends(pick_up_corpus_changes)])
+app.include_router(sessions_router, prefix="/sessions", dependencies=[Depends(pick_up_corpus_changes)])
 app.include_router(data_router, prefix="/data")
+app.include_router(metrics_router)
 
 @app.get("/")
 def root():
@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.ingredient_index import TOKEN_PATTERN, IngredientIndex, normalize_token
+from app.utils.recipe_store import RecipeStore
+
+STAPLES = ["salt", "butter", "garlic", "onion", "olive oil", "eggs"]   # dense: bitmaps
+RARE = ["saffron", "tomatoes", "chicken breast", "chicken thighs", "fresh basil", "rice",
+        "lemon", "capers", "anchovy", "berries", "soy sauce", "ginger", "red onion", "cherry"]
+
+QUERIES = [
+    "chicken, rice and garlic",
+    "I have salt, butter, eggs",                 # dense terms only
+    "tomato, basil, saffron, lemon",             # sparse terms only
+    "red onion and chicken breast",              # multi-word ingredients: all words must match
+    "eggs, berry, capers, anchovies, onion",     # plurals folded
+    "garlic",
+    "unicorn, dragonfruit",                      # nothing known
+]
+
+
+def make_store(n_rows: int = 2000):
+    rng = np.random.default_rng(0)
+    vocabulary = np.array(STAPLES + RARE)
+    weights = np.r_[np.full(len(STAPLES), 0.94 / len(STAPLES)), np.full(len(RARE), 0.06 / len(RARE))]
+    lists = [list(rng.choice(vocabulary, size=rng.integers(1, 8), p=weights)) for _ in range(n_rows)]
+    lists[5] = []
+    # Ids are not positions, as after deletes
+    ids = np.arange(n_rows) * 2 + 1
+    return RecipeStore.from_dataframe(pd.DataFrame({"faiss_index": ids, "ingredients_cleaned": lists}))
+
+
+def brute_force(index: IngredientIndex, store: RecipeStore, text: str, top_k: int, allowed_ids=None):
+    """Coverage of every recipe, then best first: coverage, fewer ingredients, store order."""
+    query = index.query_terms(text)
+    if not query:
+        return [], []
+    ranked = []
+    for position, (faiss_id, ingredients) in enumerate(zip(store.ids, store.column("ingredients_cleaned"))):
+        if allowed_ids is not None and faiss_id not in allowed_ids:
+            continue
+        terms = {index.vocabulary.get(normalize_token(word))
+                 for item in ingredients for word in re.findall(TOKEN_PATTERN, item.lower())}
+        covered = sum(set(term_ids) <= terms for term_ids in query)
+        if covered:
+            ranked.append((-covered / len(query), len(ingredients), position, faiss_id))
+    ranked.sort()
+    return [r[3] for r in ranked[:top_k]], [-r[0] for r in ranked[:top_k]]
+
+
+@pytest.fixture(scope="module")
+def store():
+    return make_store()
+
+
+@pytest.fixture(scope="module")
+def index(store):
+    return IngredientIndex(store)
+
+
+def test_saved_index_is_memory_mapped(tmp_path, index, store):
+    store.save(tmp_path)
+    index.save(tmp_path)
+    loaded = IngredientIndex(RecipeStore.load(tmp_path))
+    assert isinstance(loaded.bitmaps, np.memmap) and loaded.vocabulary == index.vocabulary
+    for text in QUERIES:
+        for got, expected in zip(loaded.search(text, top_k=10), index.search(text, top_k=10)):
+            np.testing.assert_array_equal(got, expected)
+
+
+def test_containers(index):
+    dense = {term for term, term_id in index.vocabulary.items() if index.dense_slots[term_id] >= 0}
+    assert {"salt", "butter", "garlic"} <= dense and "saffron" not in dense
+
+
+@pytest.mark.parametrize("text", QUERIES)
+@pytest.mark.parametrize("top_k", [1, 10, 1000])
+def test_matches_brute_force(index, store, text, top_k):
+    ids, coverage = index.search(text, top_k=top_k)
+    expected_ids, expected_coverage = brute_force(index, store, text, top_k)
+    assert ids.tolist() == expected_ids
+    np.testing.assert_allclose(coverage, expected_coverage, rtol=1e-6)
+
+
+@pytest.mark.parametrize("text", QUERIES)
+def test_matches_brute_force_with_allowed_ids(index, store, text):
+    rng = np.random.default_rng(1)
+    for allowed in (np.sort(rng.choice(store.ids, 60, replace=False)), np.zeros(0, dtype=np.int64)):
+        ids, coverage = index.search(text, top_k=25, allowed_ids=allowed)
+        expected_ids, expected_coverage = brute_force(index, store, text, 25, set(allowed.tolist()))
+        assert ids.tolist() == expected_ids
+        np.testing.assert_allclose(coverage, expected_coverage, rtol=1e-6)
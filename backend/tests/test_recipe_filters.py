@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.recipe_filters import (
+    LOW_CALORIE_LIMIT, QUICK_MINUTES, TOP_RATED_MIN, RecipeAttributeIndex, parse_recipe_filters
+)
+from app.utils.recipe_store import RecipeStore
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Something quick for dinner", {"max_minutes": QUICK_MINUTES}),
+    ("Pasta under 300 calories", {"max_calories": 300.0}),
+    ("vegan curry", {"diets": ["vegan"]}),
+    ("Top rated lasagna", {"min_rating": TOP_RATED_MIN}),
+    ("Vegan dinner under 1.5 hours with at least 4 stars", {"max_minutes": 90.0, "min_rating": 4.0, "diets": ["vegan"]}),
+    ("quick soup in 20 mins", {"max_minutes": 20.0}),         # an explicit bound wins over "quick"
+    ("low calorie gluten-free snack", {"max_calories": LOW_CALORIE_LIMIT, "diets": ["gluten_free"]}),
+    ("I have chicken and rice", {}),
+])
+def test_parse_recipe_filters(message, expected):
+    assert parse_recipe_filters(message) == expected
+
+
+def make_store():
+    df = pd.DataFrame({
+        # Ids are not positions, as after deletes
+        "faiss_index": [10, 3, 7, 42, 5, 8],
+        "total_time": ["00:25", "01:30", None, "00:10", "00:30", "bad"],
+        "calories": [250.0, 800.0, 150.0, np.nan, 300.0, 100.0],
+        "aggregated_rating": [4.8, 5.0, 3.0, 4.5, 0.0, 4.9],
+        "recipe_category": ["Vegan", "Chicken", "Vegetable", "Dessert", "vegan", "Chicken"],
+        "keywords": [["Easy"], ["Very Low Carbs"], ["Vegan", "< 30 Mins"], [], None, ["Vegetarian"]],
+    })
+    return RecipeStore.from_dataframe(df)
+
+
+def make_index():
+    return RecipeAttributeIndex(make_store())
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({}, None),
+    ({"max_minutes": 30}, [5, 10, 42]),                       # missing and malformed times never match
+    ({"max_calories": 300}, [5, 7, 8, 10]),                   # NaN calories never match
+    ({"min_rating": TOP_RATED_MIN}, [3, 8, 10, 42]),
+    ({"diets": ["vegan"]}, [5, 7, 10]),                       # keyword or category, any case
+    ({"diets": ["vegetarian"]}, [5, 7, 8, 10]),
+    ({"diets": ["vegan"], "max_minutes": 30, "min_rating": 4.5}, [10]),
+    ({"diets": ["kosher"]}, None),                            # no recipe is tagged: the diet is ignored
+])
+def test_eligible_ids(filters, expected):
+    ids = make_index().eligible_ids(filters)
+    assert (ids is None and expected is None) or ids.tolist() == expected
+
+
+def test_saved_index_is_memory_mapped(tmp_path):
+    store = make_store()
+    store.save(tmp_path)
+    RecipeAttributeIndex(store).save(tmp_path)
+
+    loaded = RecipeAttributeIndex(RecipeStore.load(tmp_path))
+    assert isinstance(loaded.keyword_bits, np.memmap)
+    for filters in ({"max_minutes": 30}, {"diets": ["vegan"], "min_rating": 4.5}, {"max_calories": 300}):
+        assert loaded.eligible_ids(filters).tolist() == make_index().eligible_ids(filters).tolist()
+
+    # Rewriting the store drops the saved index; it is built again, not read for other rows
+    RecipeStore(store.ids[:3], {name: values[:3] for name, values in store.columns.items()}).save(tmp_path)
+    rebuilt = RecipeAttributeIndex(RecipeStore.load(tmp_path))
+    assert not isinstance(rebuilt.keyword_bits, np.memmap)
+    assert rebuilt.eligible_ids({"max_calories": 300}).tolist() == [7, 10]
+
+
+@pytest.mark.parametrize("factory", ["IDMap2,Flat", "IVF4,Flat", "IDMap2,HNSW8,Flat"])
+def test_id_filter_restricts_search(factory):
+    import faiss
+    from app.utils.recipe_filters import IDFilter
+
+    rng = np.random.default_rng(0)
+    vectors = rng.random((200, 8), dtype=np.float32)
+    ids = np.arange(200, dtype=np.int64) * 3
+    index = faiss.index_factory(8, factory)
+    index.train(vectors)
+    index.add_with_ids(vectors, ids)
+    if factory.startswith("IVF"):
+        faiss.ParameterSpace().set_index_parameter(index, "nprobe", 4)
+
+    # Ids above the largest allowed one must not slip through either
+    allowed = np.sort(rng.choice(ids[:100], 20, replace=False))
+    id_filter = IDFilter(allowed)
+    _, found = index.search(vectors[:5], 10, params=id_filter.params_for(index))
+    found = found[found >= 0]
+    assert len(found) and np.isin(found, allowed).all()
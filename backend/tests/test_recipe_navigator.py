@@ -0,0 +1,94 @@
+import math
+
+import pytest
+
+from app.utils.recipe_navigator import answer_from_recipe, choose_active_recipe
+
+RECIPE = {
+    "faiss_index": 7,
+    "name": "Garlic Rice",
+    "recipe_instructions": ["Rinse the rice.", "Fry the garlic.", "Add water and simmer.", "Fluff and serve."],
+    "calories": 412.36,
+    "protein_content": math.nan,
+    "total_time": "01:05",
+    "cook_time": None,
+    "recipe_servings": math.nan,
+    "recipe_yield": "4 bowls",
+    "ingredients_with_quantities": ["1 cup rice", "3 cloves garlic"],
+}
+
+
+def answer(message: str, step=None, intent="unclear", recipe=RECIPE):
+    return answer_from_recipe(message.lower(), intent, lambda: recipe, step)
+
+
+@pytest.mark.parametrize("message, step, expected_step, text", [
+    ("next", None, 1, "**Step 1 of 4:** Rinse the rice."),
+    ("what's next?", 2, 3, "**Step 3 of 4:** Add water and simmer."),
+    ("go back", 3, 2, "**Step 2 of 4:** Fry the garlic."),
+    ("previous step", 1, 1, "This is the first step."),          # clamped at the first step
+    ("repeat that", 2, 2, "**Step 2 of 4:**"),
+    ("start over from the top", 3, 1, "**Step 1 of 4:**"),
+    ("step 3", None, 3, "**Step 3 of 4:**"),
+    ("go to the second step", 4, 2, "**Step 2 of 4:**"),
+    ("last step", 1, 4, "That's the final step."),
+    ("next", 3, 4, "That's the final step."),
+    ("next", 4, 4, "That was the last step of **Garlic Rice**"),  # past the end stays on the last step
+    ("step 9", 2, 2, "only has 4 steps"),                        # out of range keeps the position
+    ("step 0", None, None, "only has 4 steps"),
+])
+def test_step_navigation(message, step, expected_step, text):
+    reply = answer(message, step)
+    assert reply["kind"] == "step"
+    assert reply["step"] == expected_step
+    assert text in reply["text"]
+
+
+def test_facts():
+    reply = answer("how many calories?", step=2)
+    assert reply == {"kind": "fact", "text": "**Garlic Rice**\n- Calories: 412.4 kcal", "step": 2}
+    assert "Total time: 1 hour 5 minutes" in answer("how long does it take to make?")["text"]
+    assert "Servings: 4 bowls" in answer("how many servings?")["text"]    # falls back to recipe_yield
+    assert "- 3 cloves garlic" in answer("what ingredients do i need")["text"]
+
+
+@pytest.mark.parametrize("message", [
+    "how much protein?",           # NaN in the row
+    "what's the cook time?",       # None in the row
+    "calories and protein?",       # one of several facts missing
+])
+def test_missing_fact_falls_back_to_llm(message):
+    assert answer(message) is None
+
+
+def test_falls_back_to_llm():
+    assert answer("next", intent="recipe_generation") is None          # intent outside the fast path
+    assert answer("any other vegan recipes with more calories?") is None  # a new search, not a fact
+    assert answer("why do I fry the garlic first?") is None
+    assert answer("next", recipe=None) is None                          # active recipe no longer stored
+    assert answer("next", recipe={**RECIPE, "recipe_instructions": []}) is None
+    looked_up = []
+    answer_from_recipe("tell me a joke", "unclear", lambda: looked_up.append(1), None)
+    assert not looked_up                                                # no lookup for unanswerable messages
+
+
+RECIPES = [{"faiss_index": 11, "name": "Garlic Rice"}, {"faiss_index": 12, "name": "Lemon Chicken"},
+           {"faiss_index": 13, "name": "Tofu Stir Fry"}]
+
+
+@pytest.mark.parametrize("message, intent, current, expected", [
+    ("let's make the second one", "unclear", None, 12),
+    ("recipe 3 please", "unclear", 11, 13),
+    ("the last one", "unclear", 11, 13),
+    ("i'll cook the lemon chicken", "unclear", 11, 12),
+    ("show me garlic rice", "specific_recipe", 12, 11),
+    ("something with tofu", "ingredient_search", None, 11),   # nothing active yet: top hit
+    ("something with tofu", "ingredient_search", 12, 12),    # keep cooking the current one
+    ("recipe 5", "unclear", 12, 12),                          # out of range
+])
+def test_choose_active_recipe(message, intent, current, expected):
+    assert choose_active_recipe(message, intent, RECIPES, current) == expected
+
+
+def test_choose_active_recipe_without_results():
+    assert choose_active_recipe("the first one", "unclear", [], 12) == 12
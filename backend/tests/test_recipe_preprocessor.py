@@ -0,0 +1,79 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils import recipe_preprocessor
+from app.utils.recipe_preprocessor import clean_recipe_data
+from benchmarks.bench_preprocessing import reference_clean_recipe_data
+
+NAN = np.nan
+
+
+def raw_recipes() -> pd.DataFrame:
+    """A few Food.com-style raw rows covering the awkward values of each parsed column."""
+    rows = [
+        # RecipeIngredientParts, RecipeIngredientQuantities, RecipeInstructions, Keywords, CookTime, PrepTime, TotalTime
+        ('c("chicken", "rice", "garlic")', 'c("1", "2", "3")', 'c("Mix.", "Bake.")', 'c("Easy")', "PT30M", "PT15M", "PT45M"),
+        ('c("tofu", "soy sauce")', NAN, 'c("Fry.")', "c()", NAN, "PT5M", "P1DT2H"),
+        ('c("flour", "", "Eggs")', 'c("1/2", NA, "2")', 'c("Whisk.", "Fold.")', NAN, "PT100H5M", "PT", "PT100H5M"),
+        ('c("pasta")', "c()", 'c("Boil.")', 'c("Quick", "< 30 Mins")', "2 hours", "PTxM", "PT1H"),
+        ("c()", 'c("1")', 'c("Nothing to do.")', 'c("Odd")', "PT2H", "", "  PT1H20M  "),
+        ('"basil"', 'c("1 bunch")', '"Chop."', 'c("Fresh")', 45, "PT0M", "PT2H15M"),
+        (NAN, 'c("1")', 'c("Dropped: no ingredients.")', 'c("Gone")', "PT1H", "PT1H", "PT2H"),
+        ('c("salt")', 'c("1 pinch")', NAN, 'c("Gone")', "PT1M", "PT1M", "PT2M"),
+    ]
+    columns = [
+        "RecipeIngredientParts", "RecipeIngredientQuantities", "RecipeInstructions", "Keywords",
+        "CookTime", "PrepTime", "TotalTime"
+    ]
+    df = pd.DataFrame(rows, columns=columns)
+    df.insert(0, "RecipeId", np.arange(1, len(df) + 1))
+    df.insert(1, "Name", [f"Dish {i}" for i in range(len(df))])
+    df["DatePublished"] = ["2005-01-01T00:00:00Z", "not a date"] + ["2010-06-15T12:00:00Z"] * (len(df) - 2)
+    df["AggregatedRating"] = [4.5, NAN, 3.0, NAN, 5.0, 1.0, 2.0, 2.5]
+    df["ReviewCount"] = [10, NAN, 2, 0, NAN, 1, 3, 4]
+    # An exact duplicate row, dropped by both implementations
+    return pd.concat([df, df.iloc[[0]]], ignore_index=True)
+
+
+def quietly(clean, df: pd.DataFrame) -> pd.DataFrame:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return clean(df)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return quietly(reference_clean_recipe_data, raw_recipes())
+
+
+def test_vectorized_matches_row_wise(reference):
+    cleaned = quietly(lambda df: clean_recipe_data(df, workers=1), raw_recipes())
+    pd.testing.assert_frame_equal(cleaned, reference)
+
+
+def test_sharded_matches_row_wise(reference, monkeypatch):
+    # Shard even these few rows across processes
+    monkeypatch.setattr(recipe_preprocessor, "MIN_ROWS_PER_WORKER", 1)
+    cleaned = quietly(lambda df: clean_recipe_data(df, workers=3), raw_recipes())
+    pd.testing.assert_frame_equal(cleaned, reference)
+
+
+def test_edge_values(reference):
+    by_id = reference.set_index("recipe_id")
+    assert 7 not in by_id.index and 8 not in by_id.index        # missing ingredient parts / instructions
+    assert len(reference) == 6                                    # duplicate dropped too
+    assert by_id.loc[2, "keywords"] == []                         # c()
+    assert by_id.loc[3, "keywords"] == []                         # NaN
+    assert by_id.loc[2, "ingredients_with_quantities"] == []      # NaN quantities
+    assert by_id.loc[3, "ingredients_cleaned"] == ["flour", "eggs"]
+    assert by_id.loc[2, "cook_time"] is None                      # NaN duration
+    assert by_id.loc[2, "total_time"] is None                     # P1DT2H has a day part, not PT...
+    assert by_id.loc[3, "cook_time"] == "100:05"                  # PT100H5M
+    assert by_id.loc[3, "prep_time"] == "00:00"                   # bare PT
+    assert by_id.loc[4, "cook_time"] is None                      # "2 hours"
+    assert by_id.loc[6, "cook_time"] is None                      # a number, not a string
+    assert by_id.loc[5, "total_time"] == "01:20"                  # surrounding whitespace
+    assert by_id.loc[2, "review_count"] == 0 and by_id.loc[2, "aggregated_rating"] == 0.0
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import pytest
+
+from app.utils.response_cache import ResponseCache
+
+pytest.importorskip("llama_cpp")
+from app.utils.llm_worker import GenerationJob
+
+IDLE_SECONDS = 0.05
+
+
+def emit_tokens(job, *tokens):
+    for token in tokens:
+        job.stats["completion_tokens"] = job.stats.get("completion_tokens", 0) + 1
+        job.emit("token", token)
+
+
+async def settle():
+    """Let the cache's driver forward everything emitted so far."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def finish(job, flight, *readers):
+    for reader in readers:
+        await reader.aclose()
+    job.finished = True
+    job.emit("done", {})
+    await flight.task
+
+
+def test_stalled_coalesced_reader_triggers_idle_stop():
+    async def scenario():
+        job = GenerationJob("prompt", asyncio.get_running_loop(), position=0)
+        job.started_at = time.perf_counter()
+        cache = ResponseCache()
+        flight, joined = cache.coalesce("key", "context", None, lambda: job)
+        assert cache.coalesce("key", "context", None, lambda: None) == (flight, True)
+
+        first, second = flight.stream(), flight.stream()
+        emit_tokens(job, "a ", "b ", "c ")
+        await settle()
+        assert await first.__anext__() == ("token", "a ")
+        assert await first.__anext__() == ("token", "b ")
+        assert await second.__anext__() == ("token", "a ")
+
+        # The cache has forwarded every chunk, but the furthest reader only took two
+        assert (job.read_chunks, job.delivered_tokens) == (2, 2)
+        assert not job.should_stop(None, IDLE_SECONDS)
+
+        time.sleep(IDLE_SECONDS * 2)
+        assert job.should_stop(None, IDLE_SECONDS)
+        assert job.stop_reason == "idle"
+        assert job.wasted_tokens() == 1
+        await finish(job, flight, first, second)
+
+    asyncio.run(scenario())
+
+
+def test_coalesced_readers_keep_generation_alive():
+    async def scenario():
+        job = GenerationJob("prompt", asyncio.get_running_loop(), position=0)
+        job.started_at = time.perf_counter()
+        flight, _ = ResponseCache().coalesce("key", "context", None, lambda: job)
+
+        reader = flight.stream()
+        emit_tokens(job, "a ")
+        await settle()
+        time.sleep(IDLE_SECONDS * 2)
+        assert await reader.__anext__() == ("token", "a ")
+        assert not job.should_stop(None, IDLE_SECONDS)
+        assert job.wasted_tokens() == 0
+        await finish(job, flight, reader)
+
+    asyncio.run(scenario())